@@ -6,6 +6,9 @@ from mininet.cli import CLI
 from mininet.log import setLogLevel
 import time
 import subprocess
+import matplotlib
+# Pas d'affichage : la validation tourne sur la machine Mininet, sans serveur graphique
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from openpyxl import Workbook
 
@@ -68,7 +71,7 @@ class ExcelSaver:
         plt.ylabel("Measured Bandwidth (Mo)")
         plt.grid(True)
         plt.savefig("bandwidth_results.png")
-        plt.show()
+        plt.close()
 
 class Main:
     @staticmethod
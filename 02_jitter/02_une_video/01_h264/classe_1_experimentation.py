@@ -1,4 +1,5 @@
 import os
+import sys
 import re
 from mininet.topo import Topo
 from mininet.net import Mininet
@@ -7,6 +8,8 @@ from mininet.cli import dumpNodeConnections, CLI
 from mininet.log import setLogLevel
 from mininet.link import TCLink
 import time
+import random
+import json
 import subprocess
 import requests  # Pour envoyer des requêtes au contrôleur
 import threading
@@ -18,6 +21,11 @@ from openpyxl.drawing.image import Image
 from typing import Dict, List, Tuple
 from openpyxl import Workbook
 
+# Outils communs à toutes les expérimentations (qos_direct.py, ...)
+CHEMIN_OUTILS = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'outils'))
+sys.path.insert(0, CHEMIN_OUTILS)
+from balayage_adaptatif import BalayageAdaptatif, mesurer_repertoire
+
 
 class VideoInput:
     def __init__(self):
@@ -104,6 +112,95 @@ class NetworkTopology(Topo):
         pass
 
 class VideoStreamingClient:
+    # Calcul des métriques QoS pendant la capture (outils/qos_direct.py) : <capture>.qos.csv/.json
+    # mis à jour chaque seconde et <capture>.qos.txt prêt dès la fin du flux. Mêmes définitions
+    # (analyse_tcp.py) que qos_script_calcul.sh en phase 2 : les deux résultats ne diffèrent que
+    # si la socket AF_PACKET et tshark n'ont pas vu exactement les mêmes paquets
+    QOS_DIRECT = False
+    # Nombre de fenêtres d'une seconde sans trafic après lequel le flux est déclaré interrompu
+    QOS_DIRECT_ARRET_SI_VIDE = 5
+    # Profil de capture : "complet" (tshark, trames entières), "entetes" (dumpcap, en-têtes
+    # seulement et filtre BPF sur la paire serveur/client et le port vidéo) ou "anneau" (segments)
+    MODE_CAPTURE = "complet"
+    # 96 octets couvrent Ethernet + IPv4 + TCP avec options : toutes les métriques QoS restent calculables
+    SNAPLEN_ENTETES = 96
+    TAILLE_BUFFER_CAPTURE_MO = 64
+    # Profil "anneau" : dumpcap change de fichier selon ce critère (duration:N secondes ou filesize:N ko),
+    # les segments fermés sont analysés au fil de l'eau par outils/qos_segments.py ; <capture>.segments.txt
+    # est identique au résultat de qos_script_calcul.sh (analyse_tcp.py) sur la capture fusionnée
+    ROTATION_ANNEAU = "duration:10"
+    # Réunit les segments dans le fichier de capture habituel à la fin du flux (phase 2 inchangée), puis les
+    # supprime : la capture n'occupe pas deux fois le disque. False garde les seuls segments
+    FUSION_ANNEAU = True
+
+    @staticmethod
+    def commande_capture(server, client, port, nom_interface_attendu, nom_fichier):
+        if VideoStreamingClient.MODE_CAPTURE == "anneau":
+            # dumpcap nomme les segments <nom>_<numéro>_<date>.pcapng
+            return f'dumpcap -q -i "{nom_interface_attendu}" -b {VideoStreamingClient.ROTATION_ANNEAU} -w "{nom_fichier}" &'
+        if VideoStreamingClient.MODE_CAPTURE == "entetes":
+            filtre = f"host {server.IP()} and host {client.IP()} and tcp port {port}"
+            return (f'dumpcap -q -i "{nom_interface_attendu}" -s {VideoStreamingClient.SNAPLEN_ENTETES} '
+                    f'-B {VideoStreamingClient.TAILLE_BUFFER_CAPTURE_MO} -f "{filtre}" -w "{nom_fichier}" &')
+        return f'tshark -i "{nom_interface_attendu}" -w "{nom_fichier}" &'
+
+    @staticmethod
+    def segments_anneau(nom_fichier):
+        return f"{os.path.splitext(nom_fichier)[0]}_*.pcapng"
+
+    @staticmethod
+    def demarrer_analyse_anneau(server, client, port, nom_fichier):
+        if VideoStreamingClient.MODE_CAPTURE != "anneau":
+            return
+        analyse = os.path.join(CHEMIN_OUTILS, 'qos_segments.py')
+        client.cmd(f'python3 "{analyse}" --suivre --serveur {server.IP()} --client {client.IP()} --port {port} '
+                   f'--sortie "{nom_fichier}.segments" "{VideoStreamingClient.segments_anneau(nom_fichier)}" > /dev/null 2>&1 &')
+        return client.lastPid
+
+    @staticmethod
+    def terminer_capture_anneau(client, pid_capture, pid_analyse, nom_fichier):
+        if VideoStreamingClient.MODE_CAPTURE != "anneau":
+            return
+        # SIGINT au dumpcap de ce flux : il ferme proprement le dernier segment. Sa fin est attendue avant
+        # que qos_segments.py analyse ce segment et écrive le résumé (SIGTERM), puis avant mergecap
+        client.cmd(f'kill -INT {pid_capture}')
+        client.cmd(f'timeout 10 tail --pid={pid_capture} -f /dev/null')
+        client.cmd(f'kill -TERM {pid_analyse}')
+        client.cmd(f'timeout 10 tail --pid={pid_analyse} -f /dev/null')
+        if VideoStreamingClient.FUSION_ANNEAU:
+            segments = VideoStreamingClient.segments_anneau(nom_fichier)
+            client.cmd(f'mergecap -w "{nom_fichier}" {segments} && rm -f {segments}')
+
+    @staticmethod
+    def demarrer_qos_direct(server, client, port, nom_interface_attendu, nom_fichier):
+        if not VideoStreamingClient.QOS_DIRECT:
+            return
+        analyse = os.path.join(CHEMIN_OUTILS, 'qos_direct.py')
+        client.cmd(f'python3 "{analyse}" --interface "{nom_interface_attendu}" --serveur {server.IP()} --client {client.IP()} '
+                   f'--port {port} --sortie "{nom_fichier}.qos" --arret-si-vide {VideoStreamingClient.QOS_DIRECT_ARRET_SI_VIDE} > /dev/null 2>&1 &')
+
+    @staticmethod
+    def arreter_qos_direct(client, nom_interface_attendu):
+        if VideoStreamingClient.QOS_DIRECT:
+            # SIGTERM : qos_direct.py clôt la dernière fenêtre et écrit le résumé .qos.txt
+            client.cmd(f'pkill -TERM -f "qos_direct.py --interface {nom_interface_attendu}"')
+
+    @staticmethod
+    def attendre_fin_capture(nom_fichier, duree):
+        # Attend duree secondes, ou moins si l'analyse en direct a déclaré le flux interrompu
+        fin = time.time() + duree
+        while time.time() < fin:
+            if VideoStreamingClient.QOS_DIRECT:
+                try:
+                    with open(f"{nom_fichier}.qos.json") as f:
+                        etat = json.load(f).get('etat')
+                except (OSError, ValueError):
+                    etat = None
+                if etat == 'interrompu':
+                    print(f"Flux interrompu d'après l'analyse en direct de {nom_fichier}, fin de l'attente.")
+                    return
+            time.sleep(1)
+
     @staticmethod
     def start_streaming(server, client, port, nginx_config, video_url, nom_interface_attendu, protocole, codec, perturbation, nombre_hotes, bw, jitter):
         nom_repertoire = f"chunks-{server}_{client}_bbb_{codec}_{protocole}_hotes_{nombre_hotes}_{perturbation}_{bw}"
@@ -125,9 +222,15 @@ class VideoStreamingClient:
         server.cmd(f'nginx -c {nginx_config}')
         fichier_sortie = os.path.join(nom_repertoire, "chunk_%03d.ts")
         client.cmd(f'ffmpeg -i "{video_url}" -c copy -f segment -segment_time 2 -segment_wrap 32 "{fichier_sortie}" &')
-        client.cmd(f'tshark -i "{nom_interface_attendu}" -w "{nom_fichier}" &')
+        client.cmd(VideoStreamingClient.commande_capture(server, client, port, nom_interface_attendu, nom_fichier))
+        # PID de la capture, relevé par Mininet pour une commande lancée en arrière-plan (&)
+        pid_capture = client.lastPid
+        VideoStreamingClient.demarrer_qos_direct(server, client, port, nom_interface_attendu, nom_fichier)
+        pid_analyse = VideoStreamingClient.demarrer_analyse_anneau(server, client, port, nom_fichier)
         client.cmd(f'ffplay -autoexit {video_url}')
-        time.sleep(30)
+        VideoStreamingClient.attendre_fin_capture(nom_fichier, 30)
+        VideoStreamingClient.arreter_qos_direct(client, nom_interface_attendu)
+        VideoStreamingClient.terminer_capture_anneau(client, pid_capture, pid_analyse, nom_fichier)
         # Nettoyer la configuration tc après la simulation
         client.cmd(f'tc qdisc del dev {nom_interface_attendu} root')         
         print(f"Les chunks ont été téléchargés avec succès dans {nom_repertoire}.")
@@ -281,12 +384,12 @@ class ExcelSaver:
 
 class DataOrganizer:
     @staticmethod
-    def createDataExperimentDirectory(move_data_bash_script_path):
+    def createDataExperimentDirectory(move_data_bash_script_path, repertoire='.'):
         # Préparer la commande bash
         bash_command = f"bash {move_data_bash_script_path}"
         
         # Exécuter la commande bash
-        process = subprocess.Popen(bash_command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        process = subprocess.Popen(bash_command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=repertoire)
         stdout, stderr = process.communicate()
         
         if process.returncode == 0:
@@ -354,6 +457,62 @@ class DataOrganizer:
 
 
 class Main:
+    # Répétitions de chaque valeur de perturbation (1 : balayage habituel). Au-delà, les exécutions
+    # (répétition, valeur) sont tirées dans un ordre aléatoire sur la même topologie Mininet, et les
+    # données de la répétition r vont dans repetitions/r<r>/ (phase 2 : outils/repetitions.py phase2)
+    REPETITIONS = 1
+    # Graine du tirage de l'ordre ; None pour en tirer une (affichée pour pouvoir rejouer l'ordre)
+    GRAINE_ORDRE = None
+    # Balayage adaptatif (outils/balayage_adaptatif.py) : nombre total d'exécutions, None pour la grille
+    # PERTURBATION_NUMBERS telle quelle. La grille est mesurée d'abord, puis les intervalles où
+    # METRIQUE_ADAPTATIVE (bitrate, packet_loss, average_latency, average_jitter) varie le plus sont coupés en deux
+    BUDGET_ADAPTATIF = None
+    METRIQUE_ADAPTATIVE = "bitrate"
+
+    @staticmethod
+    def plan_balayage(perturbation_numbers, perturbation, nombre_hotes):
+        # [(répétition, valeur)]
+        if Main.BUDGET_ADAPTATIF:
+            # Une seule répétition ; chaque valeur est choisie d'après la mesure des précédentes
+            balayage = BalayageAdaptatif(perturbation_numbers, Main.BUDGET_ADAPTATIF)
+            return ((0, valeur) for valeur in balayage.valeurs(lambda valeur: Main.mesure_adaptative(perturbation, nombre_hotes, valeur)))
+        plan = [(repetition, valeur) for repetition in range(Main.REPETITIONS) for valeur in perturbation_numbers]
+        if Main.REPETITIONS > 1:
+            graine = Main.GRAINE_ORDRE if Main.GRAINE_ORDRE is not None else random.randrange(2 ** 32)
+            random.Random(graine).shuffle(plan)
+            print(f"{len(plan)} exécutions ({Main.REPETITIONS} répétitions), ordre tiré avec la graine {graine}")
+        return plan
+
+    @staticmethod
+    def repertoire_repetition(repetition):
+        return os.path.join('repetitions', f'r{repetition}') if Main.REPETITIONS > 1 else '.'
+
+    @staticmethod
+    def ouvrir_campagne():
+        # Identifiant de la campagne, relu par la phase 2 (resultats.repetition_courante) : relancer la phase 2
+        # remplace les runs de chaque répétition dans l'entrepôt au lieu de s'y ajouter
+        if Main.REPETITIONS > 1:
+            os.makedirs('repetitions', exist_ok=True)
+            with open(os.path.join('repetitions', 'campagne.txt'), 'w') as f:
+                f.write(time.strftime('%Y%m%dT%H%M%S') + '\n')
+
+    @staticmethod
+    def mesure_adaptative(perturbation, nombre_hotes, valeur):
+        repertoire = os.path.join(Main.repertoire_repetition(0), f"end_exp_{perturbation}_{valeur}")
+        mesure = mesurer_repertoire(repertoire, f"_hotes_{nombre_hotes}_{perturbation}_{valeur}.pcapng", Main.METRIQUE_ADAPTATIVE)
+        print(f"Balayage adaptatif : {Main.METRIQUE_ADAPTATIVE} = {mesure:.6g} pour {perturbation} {valeur} avec {nombre_hotes} hôtes")
+        return mesure
+
+    @staticmethod
+    def parametre_associe(perturbation_numbers, parametres, valeur):
+        # Paramètre donné pour chaque valeur de la grille (gigue, burst, ...), interpolé pour une valeur
+        # ajoutée par le balayage adaptatif
+        if valeur in perturbation_numbers:
+            return parametres[perturbation_numbers.index(valeur)]
+        ordre = np.argsort(perturbation_numbers)
+        parametre = float(np.interp(valeur, np.array(perturbation_numbers)[ordre], np.array(parametres)[ordre]))
+        return round(parametre) if all(isinstance(p, int) for p in parametres) else parametre
+
     @staticmethod
     def main():
         setLogLevel('info')
@@ -365,6 +524,7 @@ class Main:
         net = setup_script.setup_controller_connection()
         net.start()
         dumpNodeConnections(net.hosts)
+        Main.attendre_reseau_pret(len(net.switches))
         data_experiment = "data_experiment"
         repertoire_data = "repertoire_data"
         servers = video_input.get_servers()
@@ -384,6 +544,7 @@ class Main:
         jitters = video_input.get_jitters_numbers()
 
         j = 0
+        Main.ouvrir_campagne()
         for number in HOST_NUMBERS:
             k = number // 2
             servers_experiment = servers[:k]
@@ -394,8 +555,8 @@ class Main:
             nom_interface_attendus_experiment = nom_interface_attendus[:k]
             nombre_use_hotes = number           
             
-            for i, bw in enumerate(PERTURBATION_NUMBERS):
-                jitter = jitters[i]                        
+            for repetition, bw in Main.plan_balayage(PERTURBATION_NUMBERS, perturbation, nombre_use_hotes):
+                jitter = Main.parametre_associe(PERTURBATION_NUMBERS, jitters, bw)                        
                 print(f"\n Testing with delay: {bw} ms and jitter {jitter} ms \n")
                 net.configLinkStatus('s1', 's2', 'down')
                 net.addLink('s1', 's2', cls=TCLink, delay=f'{bw}ms', jitter=f'{jitter}ms', use_htb=True)
@@ -419,9 +580,9 @@ class Main:
                 net.get(servers[0]).cmd(f'pkill nginx')
                 j += 1
                 print(f"fin du streaming numero {j} avec nombre d hôte {nombre_use_hotes} et la valeur de la {perturbation} : {bw}")
-                nom_repertoire2 = f"end_exp_{perturbation}_{bw}"
+                nom_repertoire2 = os.path.join(Main.repertoire_repetition(repetition), f"end_exp_{perturbation}_{bw}")
                 try:
-                    os.mkdir(nom_repertoire2)
+                    os.makedirs(nom_repertoire2)
                     print(f"Répertoire créé : {nom_repertoire2}")
                 except FileExistsError:
                     print(f"Répertoire créé : {nom_repertoire2}")
@@ -437,7 +598,8 @@ class Main:
         
         # Créer le répertoire data_experiment en exécutant le script bash
         
-        DataOrganizer.createDataExperimentDirectory(move_data_bash_script_path)
+        for repetition in range(Main.REPETITIONS):
+            DataOrganizer.createDataExperimentDirectory(move_data_bash_script_path, Main.repertoire_repetition(repetition))
                 
         print("Opération terminée - message depuis Main : les répertoires et leur contenu ont été copiés vers 'data_experiment'. \n")
         
@@ -461,6 +623,22 @@ class Main:
         CLI(net)
         net.stop()
                
+    @staticmethod
+    def attendre_reseau_pret(nombre_switches, timeout=30):
+        # Attend que le contrôleur ait confirmé (OFPBarrierReply) les meters et flux par défaut de chaque switch
+        debut = time.time()
+        while time.time() - debut < timeout:
+            try:
+                reponse = requests.get('http://127.0.0.1:8080/qos/ready', params={'timeout': 5}, timeout=10).json()
+                if reponse['ready'] and len(reponse['datapaths']) >= nombre_switches:
+                    print(f"Réseau prêt : {len(reponse['datapaths'])} switches configurés.")
+                    return True
+            except (requests.RequestException, ValueError, KeyError):
+                pass
+            time.sleep(0.2)
+        print(f"Attention : le contrôleur n'a pas confirmé la configuration des switches après {timeout}s.")
+        return False
+
     @staticmethod
     def trouver_fichier_par_extension(directory, extension):
         repertoire_courant = os.path.abspath(os.getcwd())
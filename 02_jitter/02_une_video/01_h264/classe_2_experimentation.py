@@ -1,4 +1,5 @@
 import os
+import math
 import re
 from mininet.topo import Topo
 from mininet.net import Mininet
@@ -10,12 +11,22 @@ import time
 import subprocess
 import threading
 import shutil
+import sys
 import openpyxl
 import numpy as np
-import matplotlib.pyplot as plt
 from openpyxl.drawing.image import Image
 from typing import Dict, List, Tuple
 from openpyxl import Workbook
+from openpyxl.chart import Reference, ScatterChart, Series
+
+# Outils partagés par les expérimentations (analyse TCP, séries temporelles QoS, ...)
+CHEMIN_OUTILS = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'outils'))
+# Expérience courante, relative à la racine du dépôt : clé de l'entrepôt de résultats (outils/resultats.py)
+EXPERIENCE = os.path.relpath(os.path.dirname(os.path.abspath(__file__)), os.path.dirname(CHEMIN_OUTILS))
+sys.path.insert(0, CHEMIN_OUTILS)
+from resultats import EntrepotResultats, repetition_courante
+from traceur import Trace, tracer_lot
+from qoe_numpy import calculer_qoe
 
 
 class VideoInput:
@@ -129,6 +140,16 @@ class VideoStreamingClient:
         print(f"La capture a été arrêtée et le fichier {nom_fichier} est maintenant fermé.")
 
 class QoSMetricsCollector:
+    # Séries temporelles par fenêtre (outils/series_qos.py), durée en secondes de 0.1 à 5 ;
+    # None pour ne calculer que les valeurs moyennes
+    FENETRE_SERIES = None
+    SERIES_PAR_METRIQUE = {
+        "bitrate": "debit_mbps",
+        "packet_loss": "perte_pct",
+        "average_latency": "latence_ms",
+        "average_jitter": "gigue_ms"
+    }
+
     def __init__(self, data_pcapng_files: Dict[str, Dict[int, str]], bash_script_path: str):
         self.data_pcapng_files = data_pcapng_files
         self.bash_script_path = bash_script_path
@@ -136,6 +157,7 @@ class QoSMetricsCollector:
         self.data_qos_files_packet_loss = {}
         self.data_qos_files_average_latency = {}
         self.data_qos_files_average_jitter = {}
+        self.data_qos_series = {}
         self.lock = threading.Lock()
 
     def _get_ip_address(self, key: str, is_server: bool) -> str:
@@ -146,27 +168,56 @@ class QoSMetricsCollector:
             ip_num = hY[1:]
         return f"10.1.1.{ip_num}"
 
-    def calculate_metrics_for_pcapng(self, file_path, ip_src, ip_dst) -> Tuple[float, float, float, float]:
-        bash_command = f"bash {self.bash_script_path} {file_path} {ip_src} {ip_dst}"
-        result = subprocess.run(bash_command, shell=True, capture_output=True, text=True)
-        output = result.stdout.strip()
+    @staticmethod
+    def _parse_metrics(output):
         pattern = r"bitrate: (\d+[\.,]?\d*) packet_loss: (\d+[\.,]?\d*) average_latency: (\d+[\.,]?\d*) average_jitter: (\d+[\.,]?\d*)"
         match = re.search(pattern, output)
         if not match:
-            print("Erreur: Impossible de trouver les métriques dans la sortie du script bash.")
-            return (0.0, 0.0, 0.0, 0.0)
+            return None
         return (float(match.group(1).replace(',', '.')),
                 float(match.group(2).replace(',', '.')),
                 float(match.group(3).replace(',', '.')),
                 float(match.group(4).replace(',', '.')))
 
+    def calculate_metrics_for_pcapng(self, file_path, ip_src, ip_dst) -> Tuple[float, float, float, float]:
+        bash_command = f"bash {self.bash_script_path} {file_path} {ip_src} {ip_dst}"
+        result = subprocess.run(bash_command, shell=True, capture_output=True, text=True)
+        metrics = self._parse_metrics(result.stdout.strip())
+        if metrics is None:
+            print("Erreur: Impossible de trouver les métriques dans la sortie du script bash.")
+            return (0.0, 0.0, 0.0, 0.0)
+        return metrics
+
+    def calculate_series_for_pcapng(self, file_path, ip_src, ip_dst):
+        # Un seul passage sur la capture (series_qos.py) : (moyennes, séries), ou None en cas d'échec
+        chemin_series = f"{file_path}.series_{round(self.FENETRE_SERIES * 1000)}ms.npz"
+        commande = ["python3", os.path.join(CHEMIN_OUTILS, "series_qos.py"), file_path, "--serveur", ip_src,
+                    "--client", ip_dst, "--fenetre", str(self.FENETRE_SERIES), "--sortie", chemin_series]
+        result = subprocess.run(commande, capture_output=True, text=True)
+        metrics = self._parse_metrics(result.stdout)
+        if result.returncode != 0 or metrics is None or not os.path.exists(chemin_series):
+            print(f"Erreur: séries temporelles non calculées pour {file_path}. {result.stderr.strip()}")
+            return None
+        with np.load(chemin_series) as series:
+            return metrics, {nom: series[nom] for nom in series.files}
+
+    def series_metrique(self, metrique):
+        # {paire: {valeur de perturbation: (temps_s, valeurs)}}, vide si FENETRE_SERIES vaut None
+        colonne = self.SERIES_PAR_METRIQUE[metrique]
+        return {key: {resolution: (series['temps_s'], series[colonne]) for resolution, series in sorted(series_par_resolution.items())}
+                for key, series_par_resolution in self.data_qos_series.items()}
+
     def calculate_qos_metrics(self, key):
         ip_src = self._get_ip_address(key, True)
         ip_dst = self._get_ip_address(key, False)
         resolutions = sorted(self.data_pcapng_files[key].keys())
         for resolution in resolutions:
             file_path = self.data_pcapng_files[key][resolution]
-            metrics = self.calculate_metrics_for_pcapng(file_path, ip_src, ip_dst)
+            resultat = self.calculate_series_for_pcapng(file_path, ip_src, ip_dst) if self.FENETRE_SERIES else None
+            if resultat is not None:
+                metrics, series = resultat
+            else:
+                metrics, series = self.calculate_metrics_for_pcapng(file_path, ip_src, ip_dst), None
             with self.lock:
                 if key not in self.data_qos_files_bitrate:
                     self.data_qos_files_bitrate[key] = {}
@@ -177,6 +228,8 @@ class QoSMetricsCollector:
                 self.data_qos_files_packet_loss[key][resolution] = metrics[1]
                 self.data_qos_files_average_latency[key][resolution] = metrics[2]
                 self.data_qos_files_average_jitter[key][resolution] = metrics[3]
+                if series is not None:
+                    self.data_qos_series.setdefault(key, {})[resolution] = series
 
     def run(self):
         threads = []
@@ -189,22 +242,57 @@ class QoSMetricsCollector:
         return (self.data_qos_files_bitrate, self.data_qos_files_packet_loss, self.data_qos_files_average_latency, self.data_qos_files_average_jitter)
 
 class QoEMetricsCollector:
+    # Aperçu rapide (outils/apercu_qoe.py) : une fenêtre de APERCU_FENETRE_S secondes sur APERCU_PAS_IMAGES,
+    # atteinte par positionnement (-ss) sans décoder le reste de la vidéo, largeur et hauteur divisées par
+    # APERCU_REDUCTION ; valeurs enregistrées sous psnr_apercu / ssim_apercu ; 1 et 1 pour le calcul complet.
+    # Une fenêtre commence à un multiple de APERCU_PAS_IMAGES x APERCU_FENETRE_S secondes : avec une image
+    # clé toutes les APERCU_FENETRE_S secondes (segments HLS de 2 s), seules les images comparées sont décodées
+    APERCU_PAS_IMAGES = 1
+    APERCU_FENETRE_S = 2.0
+    APERCU_REDUCTION = 1
+    # Calcul complet limité à ces valeurs de perturbation (apercu_qoe.py trier) ; None pour toutes
+    VALEURS_COMPLETES = None
+    # "ffmpeg" : filtres psnr et ssim, valeur moyenne lue dans la sortie texte ; "numpy" (outils/qoe_numpy.py) :
+    # un décodage rawvideo pour les deux métriques, valeurs par image enregistrées comme séries
+    BACKEND_QOE = "ffmpeg"
+    # Backend numpy : SSIM sur Y, U et V comme « All: » du filtre ssim (False : luminance seule) et
+    # plages d'images de chaque vidéo calculées en parallèle
+    SSIM_CHROMA = True
+    TRAVAILLEURS_QOE = 1
+
     def __init__(self, data_video_files, chemin_video_serveur):
         self.data_video_files = data_video_files
         self.chemin_video_serveur = chemin_video_serveur
         self.data_video_files_psnr = {}
         self.data_video_files_ssim = {}
+        self.data_qoe_series = {}
         self.lock = threading.Lock()
 
     def calculate_metrics(self, key, videos):
         psnr_results = {}
         ssim_results = {}
+        series_results = {}
         for resolution, video_path in videos.items():
+            if not self.apercu() and self.VALEURS_COMPLETES is not None and resolution not in self.VALEURS_COMPLETES:
+                continue
+            if self.BACKEND_QOE == "numpy":
+                series_results[resolution] = calculer_qoe(self.chemin_video_serveur, video_path, self.SSIM_CHROMA, self.TRAVAILLEURS_QOE,
+                                                          self.APERCU_PAS_IMAGES, self.APERCU_REDUCTION, self.APERCU_FENETRE_S)
+                psnr_results[resolution] = series_results[resolution]['psnr']
+                ssim_results[resolution] = series_results[resolution]['ssim']
+                continue
             psnr_results[resolution] = self.calcul_psnr(self.chemin_video_serveur, video_path)
             ssim_results[resolution] = self.calcul_ssim(self.chemin_video_serveur, video_path)
         with self.lock:
             self.data_video_files_psnr[key] = psnr_results
             self.data_video_files_ssim[key] = ssim_results
+            if series_results:
+                self.data_qoe_series[key] = series_results
+
+    def series_metrique(self, metrique):
+        # {paire: {valeur de perturbation: (temps_s, valeurs par image)}}, vide avec le backend ffmpeg
+        return {key: {resolution: (resultat['temps_s'], resultat[f'{metrique}_images']) for resolution, resultat in sorted(resultats.items())}
+                for key, resultats in self.data_qoe_series.items()}
 
     def run(self):
         threads = []
@@ -216,60 +304,149 @@ class QoEMetricsCollector:
             thread.join()
         return self.data_video_files_psnr, self.data_video_files_ssim
 
+    @staticmethod
+    def apercu():
+        return QoEMetricsCollector.APERCU_PAS_IMAGES > 1 or QoEMetricsCollector.APERCU_REDUCTION > 1
+
+    @staticmethod
+    def filtre_qoe(filtre):
+        # Graphe -lavfi : même réduction pour la référence et la vidéo reçue
+        if QoEMetricsCollector.APERCU_REDUCTION <= 1:
+            return filtre
+        reduction = QoEMetricsCollector.APERCU_REDUCTION
+        echelle = f"scale=trunc(iw/{reduction}/2)*2:trunc(ih/{reduction}/2)*2:flags=area"
+        return f"[0:v]{echelle}[reference];[1:v]{echelle}[recue];[reference][recue]{filtre}"
+
+    def mesures_fenetres(self, video_path_1, video_path_2, filtre, motif):
+        # [(valeur moyenne, images comparées)] : toute la vidéo, ou chaque fenêtre d'aperçu jusqu'à la fin de la plus courte
+        mesures = []
+        debut = 0.0
+        while True:
+            positionnement = []
+            if self.APERCU_PAS_IMAGES > 1:
+                positionnement = ["-ss", f"{debut:.3f}", "-t", f"{self.APERCU_FENETRE_S:.3f}"]
+            process = subprocess.run(["ffmpeg", *positionnement, "-i", video_path_1, *positionnement, "-i", video_path_2, "-lavfi", self.filtre_qoe(filtre), "-f", "null", "-"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            output = process.stderr.decode()
+            match = re.search(motif, output)
+            if not match:
+                return mesures
+            images = re.findall(r'frame=\s*(\d+)', output)
+            mesures.append((float(match.group(1)), int(images[-1]) if images else 1))
+            if self.APERCU_PAS_IMAGES <= 1:
+                return mesures
+            debut += self.APERCU_PAS_IMAGES * self.APERCU_FENETRE_S
+
     def calcul_psnr(self, video_path_1, video_path_2) -> float:
-        psnr_process = subprocess.run(["ffmpeg", "-i", video_path_1, "-i", video_path_2, "-lavfi", "psnr", "-f", "null", "-"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        psnr_output = psnr_process.stderr.decode()
-        psnr_match = re.search(r'average:(\d+\.\d+)', psnr_output)
-        if psnr_match:
-            return float(psnr_match.group(1))
-        else:
+        mesures = self.mesures_fenetres(video_path_1, video_path_2, "psnr", r'average:(\d+\.\d+)')
+        if not mesures:
             raise ValueError("Pas de valeur PSNR trouvée.")
+        if len(mesures) == 1:
+            return mesures[0][0]
+        # Comme « average: » du filtre psnr : PSNR de l'EQM moyenne sur les images de toutes les fenêtres
+        eqm = sum(images * 255 ** 2 / 10 ** (psnr / 10) for psnr, images in mesures) / sum(images for _, images in mesures)
+        return 10 * math.log10(255 ** 2 / eqm)
 
     def calcul_ssim(self, video_path_1, video_path_2) -> float:
-        ssim_process = subprocess.run(["ffmpeg", "-i", video_path_1, "-i", video_path_2, "-lavfi", "ssim", "-f", "null", "-"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        ssim_output = ssim_process.stderr.decode()
-        ssim_match = re.search(r'All:(\d+\.\d+)', ssim_output)
-        if ssim_match:
-            return float(ssim_match.group(1))
-        else:
+        mesures = self.mesures_fenetres(video_path_1, video_path_2, "ssim", r'All:(\d+\.\d+)')
+        if not mesures:
             raise ValueError("Pas de valeur SSIM trouvée.")
+        return sum(ssim * images for ssim, images in mesures) / sum(images for _, images in mesures)
 
 class ExcelSaver:
+    # Les résultats sont toujours enregistrés dans l'entrepôt en colonnes ; False pour ne pas produire les
+    # classeurs pendant l'expérience (export ultérieur : python3 outils/resultats.py excel --experience ...)
+    EXPORT_EXCEL = True
+    # "image" : figures PNG (dans images_*) incorporées aux feuilles Graph_* ;
+    # "natif" : graphiques Excel (openpyxl.chart) qui référencent les cellules, sans rendu ni fichier image
+    MODE_GRAPHIQUE = "image"
+    # Processus de tracé des figures PNG (outils/traceur.py) ; None pour utiliser tous les cœurs
+    TRAVAILLEURS_GRAPHIQUES = None
+
     @staticmethod
-    def save_metrics_to_excel(data_dict, dict_name, codec, profile, perturbation, protocole, nombre_hotes):
+    def _graphique_natif(titre, titre_x, titre_y, series, marqueurs=True):
+        # series : [(titre, Reference des ordonnées, Reference des abscisses)] ; nuage de points relié
+        # pour garder des abscisses proportionnelles aux valeurs, comme les figures PNG
+        graphique = ScatterChart()
+        graphique.title = titre
+        graphique.x_axis.title = titre_x
+        graphique.y_axis.title = titre_y
+        graphique.x_axis.delete = False
+        graphique.y_axis.delete = False
+        for titre_serie, ordonnees, abscisses in series:
+            serie = Series(ordonnees, abscisses, title=titre_serie)
+            serie.marker.symbol = 'circle' if marqueurs else 'none'
+            graphique.series.append(serie)
+        return graphique
+
+    @staticmethod
+    def save_metrics_to_excel(data_dict, dict_name, codec, profile, perturbation, protocole, nombre_hotes, series=None):
         from_dict_name = dict_name.split('_')[-1]
         excel_files_dir = f'excel_files_{codec}_{profile}_{from_dict_name}'
         os.makedirs(excel_files_dir, exist_ok=True)
         excel_file_path = os.path.join(excel_files_dir, f'resultats_{perturbation}_{protocole}_hotes_{nombre_hotes}_{codec}_{profile}_{from_dict_name}.xlsx')
-        workbook = Workbook()
-        workbook.save(excel_file_path)
+        natif = ExcelSaver.MODE_GRAPHIQUE == "natif"
         images_dir = os.path.join(excel_files_dir, f'images_{codec}_{profile}_{from_dict_name}')
-        os.makedirs(images_dir, exist_ok=True)
-        wb = openpyxl.load_workbook(excel_file_path)
-        sheet = wb.active
+        series = series or {}
+        titre = f'{perturbation} {protocole} avec {nombre_hotes} hotes codec {codec} profile {profile}'
+        if not natif:
+            # Toutes les figures du classeur tracées d'un coup, en parallèle et sans affichage
+            os.makedirs(images_dir, exist_ok=True)
+            traces = [Trace(os.path.join(images_dir, f'plot_{key}.png'), f'{titre} : {key}', f'{perturbation}',
+                            f'{from_dict_name}', [(key, *zip(*sorted(value_dict.items())))], 'o')
+                      for key, value_dict in data_dict.items()]
+            if len(data_dict) > 1:
+                traces.append(Trace(os.path.join(images_dir, 'plot_paires.png'), f'{titre} : toutes les paires',
+                                    f'{perturbation}', f'{from_dict_name}',
+                                    [(key, *zip(*sorted(value_dict.items()))) for key, value_dict in data_dict.items()], 'o'))
+            for key, series_par_valeur in series.items():
+                traces.append(Trace(os.path.join(images_dir, f'plot_serie_{key}.png'), f'{titre} : {key}', 'temps (s)',
+                                    f'{from_dict_name}', [(f'{perturbation} {valeur}', temps, valeurs)
+                                                          for valeur, (temps, valeurs) in sorted(series_par_valeur.items())], None))
+            tracer_lot(traces, ExcelSaver.TRAVAILLEURS_GRAPHIQUES)
+        # Classeur en écriture seule : lignes écrites au fil de l'eau, graphiques ajoutés à la création
+        # des feuilles et une seule sauvegarde à la fin
+        wb = Workbook(write_only=True)
+        sheet = wb.create_sheet(title='Sheet')
         headers = [f'{perturbation}'] + list(data_dict.keys())
         sheet.append(headers)
         all_keys = sorted(set().union(*(d.keys() for d in data_dict.values())))
         for key in all_keys:
-            row = [key] + [data_dict[column].get(key, '') for column in headers[1:]]
+            row = [key] + [data_dict[column].get(key) for column in headers[1:]]
             sheet.append(row)
-        wb.save(excel_file_path)
-        for index, (key, value_dict) in enumerate(data_dict.items(), start=1):
-            sheet_name = f'Graph_{key}'
-            wb.create_sheet(title=sheet_name)
-            new_sheet = wb[sheet_name]
-            plt.figure()
-            lists = sorted(value_dict.items())
-            x, y = zip(*lists)
-            plt.plot(x, y, marker='o')
-            plt.title(f'{perturbation} {protocole} avec {nombre_hotes} hotes codec {codec} profile {profile} : {key}')
-            plt.xlabel(f'{perturbation}')
-            plt.ylabel(f'{from_dict_name}')
-            image_path = os.path.join(images_dir, f'plot_{key}.png')
-            plt.savefig(image_path)
-            plt.close()
-            img = Image(image_path)
-            new_sheet.add_image(img, 'A1')
+        abscisses = Reference(sheet, min_col=1, min_row=2, max_row=len(all_keys) + 1)
+        courbes = [(key, Reference(sheet, min_col=index + 1, min_row=2, max_row=len(all_keys) + 1), abscisses)
+                   for index, key in enumerate(data_dict, start=1)]
+        for courbe in courbes:
+            key = courbe[0]
+            new_sheet = wb.create_sheet(title=f'Graph_{key}')
+            if natif:
+                new_sheet.add_chart(ExcelSaver._graphique_natif(f'{titre} : {key}', f'{perturbation}', f'{from_dict_name}', [courbe]), 'A1')
+            else:
+                new_sheet.add_image(Image(os.path.join(images_dir, f'plot_{key}.png')), 'A1')
+        # Toutes les paires superposées sur le même axe
+        if len(data_dict) > 1:
+            paires_sheet = wb.create_sheet(title='Graph_paires')
+            if natif:
+                paires_sheet.add_chart(ExcelSaver._graphique_natif(f'{titre} : toutes les paires', f'{perturbation}', f'{from_dict_name}', courbes), 'A1')
+            else:
+                paires_sheet.add_image(Image(os.path.join(images_dir, 'plot_paires.png')), 'A1')
+        # Séries temporelles optionnelles {paire: {valeur de perturbation: (temps_s, valeurs)}}
+        for key, series_par_valeur in series.items():
+            serie_sheet = wb.create_sheet(title=f'Serie_{key}')
+            valeurs = sorted(series_par_valeur.keys())
+            serie_sheet.append(['temps_s'] + [f'{perturbation}_{valeur}' for valeur in valeurs])
+            colonnes = [series_par_valeur[valeur][1].tolist() for valeur in valeurs]
+            temps = max((series_par_valeur[valeur][0].tolist() for valeur in valeurs), key=len)
+            for index, instant in enumerate(temps):
+                serie_sheet.append([instant] + [colonne[index] if index < len(colonne) else None for colonne in colonnes])
+            ancre = f'{openpyxl.utils.get_column_letter(len(valeurs) + 3)}1'
+            if natif:
+                temps_ref = Reference(serie_sheet, min_col=1, min_row=2, max_row=len(temps) + 1)
+                courbes_serie = [(f'{perturbation} {valeur}', Reference(serie_sheet, min_col=colonne + 2, min_row=2, max_row=len(temps) + 1), temps_ref)
+                                 for colonne, valeur in enumerate(valeurs)]
+                serie_sheet.add_chart(ExcelSaver._graphique_natif(f'{titre} : {key}', 'temps (s)', f'{from_dict_name}', courbes_serie, marqueurs=False), ancre)
+            else:
+                serie_sheet.add_image(Image(os.path.join(images_dir, f'plot_serie_{key}.png')), ancre)
         wb.save(excel_file_path)
 
 #########
@@ -396,6 +573,8 @@ class Main:
         perturbation = video_input.get_perturbation()
         nombre_hotes = video_input.get_nombre_hotes()
         profile = video_input.get_profile()
+        # Balayage adaptatif de la phase 1 (Main.BUDGET_ADAPTATIF) : valeurs réellement exécutées
+        PERTURBATION_NUMBERS = perturbation_numbers_deplacement = Main.valeurs_executees(data_experiment, perturbation, PERTURBATION_NUMBERS)
         
 ###*#   # Begin part 2 experiment. 
 
@@ -422,6 +601,7 @@ class Main:
         )
         bash_script_path = Main.trouver_fichier_par_extension("bash_file", ".sh")
         calculatorQoSmetrics = QoSMetricsCollector(data_files, bash_script_path)
+        #QoSMetricsCollector.FENETRE_SERIES = 0.5
         dict_data_qos_files_bitrate, dict_data_qos_files_packet_loss, dict_data_qos_files_average_latency, dict_data_qos_files_average_jitter = calculatorQoSmetrics.run()
         data_qos_dicts = {
             "bitrate": dict_data_qos_files_bitrate,
@@ -435,10 +615,18 @@ class Main:
             "average_latency": "dict_name_qos_averageLatency",
             "average_jitter": "dict_name_qos_averageJitter"
         }
+        run_resultats = EntrepotResultats().nouveau_run(EXPERIENCE, perturbation, codec, profile, protocole, nombre_hotes,
+                                                         *repetition_courante())
         for key, value in data_qos_dicts.items():
-            data_qos_resultats = data_qos_dicts[key]
-            dict_name = data_qos_names[key]
-            ExcelSaver.save_metrics_to_excel(data_qos_resultats, dict_name, codec, profile, perturbation, protocole, nombre_hotes)
+            run_resultats.ajouter_metrique(key, value)
+            run_resultats.ajouter_series(key, calculatorQoSmetrics.series_metrique(key))
+        print("Résultats QoS enregistrés dans", run_resultats.ecrire("qos"))
+        if ExcelSaver.EXPORT_EXCEL:
+            for key, value in data_qos_dicts.items():
+                data_qos_resultats = data_qos_dicts[key]
+                dict_name = data_qos_names[key]
+                ExcelSaver.save_metrics_to_excel(data_qos_resultats, dict_name, codec, profile, perturbation, protocole, nombre_hotes,
+                                                 series=calculatorQoSmetrics.series_metrique(key))
         for actif_directory, perturbations_values in data_directories.items():
             for perturbation_value in perturbations_values:
                 thread = threading.Thread(target=Main.process_directory2, args=(perturbation_value, file_pattern, actif_directory, protocole, codec, perturbation, nombre_hotes, profile))
@@ -462,11 +650,26 @@ class Main:
             "psnr": "dict_name_qoe_psnr",
             "ssim": "dict_name_qoe_ssim"
         }
+        # Les valeurs d'aperçu restent séparées des valeurs complètes dans l'entrepôt et ne vont pas dans les classeurs
+        suffixe_qoe = "_apercu" if QoEMetricsCollector.apercu() else ""
         for key, value in data_qoe_dicts.items():
-            data_qoe_resultats = data_qoe_dicts[key]
-            dict_qoe_name = data_qoe_names[key]
-            ExcelSaver.save_metrics_to_excel(data_qoe_resultats, dict_qoe_name, codec, profile, perturbation, protocole, nombre_hotes)
+            run_resultats.ajouter_metrique(key + suffixe_qoe, value)
+            run_resultats.ajouter_series(key + suffixe_qoe, calculator.series_metrique(key))
+        print("Résultats QoE enregistrés dans", run_resultats.ecrire("qoe"))
+        if ExcelSaver.EXPORT_EXCEL and not QoEMetricsCollector.apercu():
+            for key, value in data_qoe_dicts.items():
+                data_qoe_resultats = data_qoe_dicts[key]
+                dict_qoe_name = data_qoe_names[key]
+                ExcelSaver.save_metrics_to_excel(data_qoe_resultats, dict_qoe_name, codec, profile, perturbation, protocole, nombre_hotes,
+                                                 series=calculator.series_metrique(key))
                
+    @staticmethod
+    def valeurs_executees(data_experiment, perturbation, perturbation_numbers):
+        # Valeurs des répertoires end_exp_<perturbation>_<valeur> ; la grille si aucun n'est trouvé
+        prefixe = f"end_exp_{perturbation}_"
+        valeurs = [int(nom[len(prefixe):]) for nom in os.listdir(data_experiment) if nom.startswith(prefixe) and nom[len(prefixe):].isdigit()] if os.path.isdir(data_experiment) else []
+        return sorted(valeurs) if valeurs else perturbation_numbers
+
     @staticmethod
     def trouver_fichier_par_extension(directory, extension):
         repertoire_courant = os.path.abspath(os.getcwd())
@@ -476,7 +679,8 @@ class Main:
             if os.path.exists(directory):
                 repertoire_specifie = os.path.abspath(directory)
             else:
-                repertoire_specifie = os.path.abspath(os.path.join(repertoire_courant, directory))
+                # Phase 2 lancée depuis repetitions/r<n>/ : scripts et vidéo de référence à côté de ce fichier
+                repertoire_specifie = os.path.join(os.path.dirname(os.path.abspath(__file__)), directory)
         fichiers = os.listdir(repertoire_specifie)
         for fichier in fichiers:
             if fichier.endswith(extension):
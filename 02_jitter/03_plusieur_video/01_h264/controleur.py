@@ -3,25 +3,308 @@ from ryu.controller import ofp_event
 from ryu.controller.handler import CONFIG_DISPATCHER, MAIN_DISPATCHER
 from ryu.controller.handler import set_ev_cls
 from ryu.ofproto import ofproto_v1_3
-from ryu.lib.packet import packet, ethernet, ether_types, in_proto, ipv4, tcp
+from ryu.lib.packet import packet, ethernet, ether_types, in_proto, ipv4, tcp, udp
 from ryu import cfg
+from ryu.lib import hub
 from ryu.app.wsgi import ControllerBase, WSGIApplication, route, Response
+import functools
 import json
 import time
 import threading
+import socket
+import struct
+from collections import namedtuple
+
+PacketHeader = namedtuple('PacketHeader', ['dst', 'src', 'ethertype', 'ip_src', 'ip_dst', 'ip_proto', 'src_port', 'dst_port'])
+
+class FastPacketParser:
+    """Extraction des en-têtes Ethernet/IPv4/TCP/UDP par offsets fixes, sans packet.Packet."""
+    ETH = struct.Struct('!6s6sH')
+    IPV4 = struct.Struct('!B5xHxB2x4s4s')
+    PORTS = struct.Struct('!HH')
+    VLAN_TYPES = (ether_types.ETH_TYPE_8021Q, ether_types.ETH_TYPE_8021AD)
+
+    @staticmethod
+    def parse(data):
+        # Retourne None pour les trames inhabituelles (VLAN, fragments, trames tronquées) :
+        # l'appelant bascule alors sur parse_full
+        if len(data) < 14:
+            return None
+        dst, src, ethertype = FastPacketParser.ETH.unpack_from(data, 0)
+        if ethertype in FastPacketParser.VLAN_TYPES:
+            return None
+        dst = dst.hex(':')
+        src = src.hex(':')
+        if ethertype != ether_types.ETH_TYPE_IP:
+            return PacketHeader(dst, src, ethertype, None, None, None, 0, 0)
+        if len(data) < 34:
+            return None
+        version_ihl, flags_frag, ip_proto, ip_src, ip_dst = FastPacketParser.IPV4.unpack_from(data, 14)
+        ihl = (version_ihl & 0x0F) * 4
+        if version_ihl >> 4 != 4 or ihl < 20 or flags_frag & 0x1FFF:
+            return None
+        ip_src = socket.inet_ntoa(ip_src)
+        ip_dst = socket.inet_ntoa(ip_dst)
+        if ip_proto == in_proto.IPPROTO_TCP or ip_proto == in_proto.IPPROTO_UDP:
+            if len(data) < 14 + ihl + 4:
+                return None
+            src_port, dst_port = FastPacketParser.PORTS.unpack_from(data, 14 + ihl)
+            return PacketHeader(dst, src, ethertype, ip_src, ip_dst, ip_proto, src_port, dst_port)
+        return PacketHeader(dst, src, ethertype, ip_src, ip_dst, ip_proto, 0, 0)
+
+    @staticmethod
+    def parse_full(data):
+        pkt = packet.Packet(data)
+        eth = pkt.get_protocols(ethernet.ethernet)[0]
+        if eth.ethertype != ether_types.ETH_TYPE_IP:
+            return PacketHeader(eth.dst, eth.src, eth.ethertype, None, None, None, 0, 0)
+        ip = pkt.get_protocol(ipv4.ipv4)
+        l4 = pkt.get_protocol(tcp.tcp) or pkt.get_protocol(udp.udp)
+        if l4 is None:
+            return PacketHeader(eth.dst, eth.src, eth.ethertype, ip.src, ip.dst, ip.proto, 0, 0)
+        return PacketHeader(eth.dst, eth.src, eth.ethertype, ip.src, ip.dst, ip.proto, l4.src_port, l4.dst_port)
+
+class LatencyHistogram:
+    """Histogramme log-linéaire des latences (8 sous-intervalles linéaires par puissance de 2), en microsecondes."""
+    SUB_BITS = 3
+    SUB_COUNT = 1 << SUB_BITS
+    LINEAR_LIMIT = 2 << SUB_BITS
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def _index(self, value):
+        if value < self.LINEAR_LIMIT:
+            return value
+        shift = value.bit_length() - self.SUB_BITS - 1
+        return self.LINEAR_LIMIT + (shift - 1) * self.SUB_COUNT + ((value >> shift) & (self.SUB_COUNT - 1))
+
+    def _upper_bound(self, index):
+        if index < self.LINEAR_LIMIT:
+            return index
+        shift = (index - self.LINEAR_LIMIT) // self.SUB_COUNT + 1
+        sub = (index - self.LINEAR_LIMIT) % self.SUB_COUNT
+        return ((self.SUB_COUNT + sub + 1) << shift) - 1
+
+    def record(self, value):
+        index = self._index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        if not self.count:
+            return 0
+        rank = q / 100.0 * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self._upper_bound(index), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean_us': self.total / self.count if self.count else 0,
+            'p50_us': self.percentile(50),
+            'p90_us': self.percentile(90),
+            'p99_us': self.percentile(99),
+            'max_us': self.max,
+            'buckets': {str(self._upper_bound(index)): n for index, n in sorted(self.buckets.items())}
+        }
+
+class ControllerStats:
+    """Compteurs d'événements, latences des handlers et messages OpenFlow émis par dpid."""
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started = time.time()
+        # nom -> [total, seconde courante, compteur de la seconde, pic par seconde]
+        self.events = {}
+        self.latencies = {}
+        # dpid -> {type de message: compteur}
+        self.messages = {}
+
+    def count_event(self, name):
+        now = int(time.time())
+        counters = self.events.get(name)
+        if counters is None:
+            counters = self.events[name] = [0, now, 0, 0]
+        counters[0] += 1
+        if counters[1] != now:
+            counters[1] = now
+            counters[2] = 0
+        counters[2] += 1
+        if counters[2] > counters[3]:
+            counters[3] = counters[2]
+
+    def record_latency(self, name, duration_ns):
+        histogram = self.latencies.get(name)
+        if histogram is None:
+            histogram = self.latencies[name] = LatencyHistogram()
+        histogram.record(duration_ns // 1000)
+
+    def count_message(self, datapath, msg):
+        if not self.enabled:
+            return
+        counters = self.messages.setdefault(datapath.id, {})
+        name = type(msg).__name__
+        counters[name] = counters.get(name, 0) + 1
+
+    def snapshot(self):
+        uptime = time.time() - self.started
+        return {
+            'enabled': self.enabled,
+            'uptime_s': uptime,
+            'events': {name: {'count': c[0], 'rate_per_s': c[0] / uptime if uptime else 0, 'peak_per_s': c[3]}
+                       for name, c in self.events.items()},
+            'latency': {name: h.to_dict() for name, h in self.latencies.items()},
+            'messages': {str(dpid): counters for dpid, counters in self.messages.items()}
+        }
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+def instrumented(name):
+    # Compte l'événement et mesure la durée du handler ; un simple test de booléen si désactivé
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(self, ev):
+            stats = self.stats
+            if not stats.enabled:
+                return handler(self, ev)
+            stats.count_event(name)
+            start = time.perf_counter_ns()
+            try:
+                return handler(self, ev)
+            finally:
+                stats.record_latency(name, time.perf_counter_ns() - start)
+        return wrapper
+    return decorator
+
+class MessageBatcher:
+    """Messages OpenFlow mis en file par datapath, envoyés en un seul write suivi d'un OFPBarrierRequest."""
+    def __init__(self, stats=None):
+        self.stats = stats if stats is not None else ControllerStats()
+        self.pending = {}
+        # (dpid, xid du barrier) -> hub.Event levé à la réception du OFPBarrierReply
+        self.barriers = {}
+        self.ready = {}
+
+    def queue(self, datapath, msg):
+        self.pending.setdefault(datapath.id, []).append(msg)
+
+    def flush(self, datapath):
+        msgs = self.pending.pop(datapath.id, [])
+        barrier = datapath.ofproto_parser.OFPBarrierRequest(datapath)
+        msgs.append(barrier)
+        bufs = []
+        for msg in msgs:
+            datapath.set_xid(msg)
+            msg.serialize()
+            bufs.append(msg.buf)
+            self.stats.count_message(datapath, msg)
+        event = hub.Event()
+        self.barriers[(datapath.id, barrier.xid)] = event
+        self.ready[datapath.id] = False
+        datapath.send(b''.join(bufs))
+        return event
+
+    def barrier_reply(self, dpid, xid):
+        event = self.barriers.pop((dpid, xid), None)
+        if event is None:
+            return False
+        if not any(key[0] == dpid for key in self.barriers):
+            self.ready[dpid] = True
+        event.set()
+        return True
+
+    def forget_datapath(self, dpid):
+        self.pending.pop(dpid, None)
+        for key in [key for key in self.barriers if key[0] == dpid]:
+            self.barriers.pop(key).set()
+        self.ready.pop(dpid, None)
+
+    def wait_ready(self, timeout):
+        deadline = time.monotonic() + timeout
+        for event in list(self.barriers.values()):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not event.wait(timeout=remaining):
+                break
+        return dict(self.ready)
 
 class FlowManager:
-    def __init__(self, datapaths):
+    PURGE_INTERVAL = 1024
+
+    def __init__(self, datapaths, stats=None):
         self.datapaths = datapaths
+        self.stats = stats if stats is not None else ControllerStats()
+        # (dpid, priority, match) -> (signature des instructions, expiration monotonic ou None)
+        self.installed_flows = {}
+        self._inserts_since_purge = 0
+        self.batcher = MessageBatcher(self.stats)
 
-    def add_flow(self, datapath, priority, match, actions, buffer_id=None, idle=0, hard=0):
+    def add_flow(self, datapath, priority, match, actions, buffer_id=None, idle=0, hard=0, batch=False):
+        key = self._flow_key(datapath, priority, match)
+        signature = str(actions)
+        now = time.monotonic()
+        if self._is_installed(key, signature, now):
+            return False
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
+        flags = ofproto.OFPFF_SEND_FLOW_REM if idle or hard else 0
         inst = [parser.OFPInstructionActions(ofproto.OFPIT_APPLY_ACTIONS, actions)]
         mod = parser.OFPFlowMod(datapath=datapath, priority=priority,
                                 idle_timeout=idle, hard_timeout=hard,
-                                match=match, instructions=inst)
-        datapath.send_msg(mod)
+                                match=match, instructions=inst, flags=flags)
+        if batch:
+            self.batcher.queue(datapath, mod)
+        else:
+            datapath.send_msg(mod)
+            self.stats.count_message(datapath, mod)
+        self._remember_flow(key, signature, idle, hard, now)
+        return True
+
+    def _flow_key(self, datapath, priority, match):
+        # Un OFPMatch construit ici est trié par identifiant OXM, OFPFlowRemoved.match garde l'ordre du switch
+        return (datapath.id, priority, frozenset(match.items()))
+
+    def _is_installed(self, key, signature, now):
+        cached = self.installed_flows.get(key)
+        if cached is None or cached[0] != signature:
+            return False
+        expiry = cached[1]
+        return expiry is None or expiry > now
+
+    def _remember_flow(self, key, signature, idle, hard, now):
+        # Un flux avec idle/hard timeout reste au moins min(idle, hard) secondes sur le switch
+        timeouts = [t for t in (idle, hard) if t]
+        expiry = now + min(timeouts) if timeouts else None
+        self.installed_flows[key] = (signature, expiry)
+        self._inserts_since_purge += 1
+        if self._inserts_since_purge >= self.PURGE_INTERVAL:
+            self._purge_expired(now)
+
+    def _purge_expired(self, now):
+        expired = [key for key, (_, expiry) in self.installed_flows.items()
+                   if expiry is not None and expiry <= now]
+        for key in expired:
+            del self.installed_flows[key]
+        self._inserts_since_purge = 0
+
+    def forget_flow(self, datapath, priority, match):
+        self.installed_flows.pop(self._flow_key(datapath, priority, match), None)
+
+    def forget_datapath(self, dpid):
+        for key in [key for key in self.installed_flows if key[0] == dpid]:
+            del self.installed_flows[key]
+        self.batcher.forget_datapath(dpid)
 
     def delete_flow(self, datapath, match):
         ofproto = datapath.ofproto
@@ -29,13 +312,18 @@ class FlowManager:
         mod = parser.OFPFlowMod(datapath=datapath, command=ofproto.OFPFC_DELETE,
                                 out_port=ofproto.OFPP_ANY, out_group=ofproto.OFPG_ANY,
                                 match=match)
+        fields = frozenset(match.items())
+        for key in [key for key in self.installed_flows
+                    if key[0] == datapath.id and fields.issubset(key[2])]:
+            del self.installed_flows[key]
         datapath.send_msg(mod)
+        self.stats.count_message(datapath, mod)
 
 class QoS:
-    def __init__(self, CONF, datapaths, logger):
+    def __init__(self, CONF, datapaths, logger, stats=None):
         self.CONF = CONF
         self.datapaths = datapaths
-        self.flow_manager = FlowManager(datapaths)
+        self.flow_manager = FlowManager(datapaths, stats)
         self.logger = logger
         self.qos_flows = []  # Liste pour suivre les configurations QoS
         self._start_monitoring()  # Lance la surveillance de la bande passante
@@ -77,39 +365,67 @@ class Controller(app_manager.RyuApp):
         self.mac_to_port = {}
         self.datapaths = {}
         self.CONF = cfg.CONF
-        self.qos = QoS(self.CONF, self.datapaths, self.logger)
+        self.CONF.register_opts([
+            cfg.IntOpt('STATS_ENABLED', default=0, help='Instrumentation du contrôleur'),
+            cfg.StrOpt('STATS_FILE', default='controller_stats.json', help='Fichier des statistiques écrit à l\'arrêt')
+        ])
+        self.stats = ControllerStats(self.CONF.STATS_ENABLED == 1)
+        self.qos = QoS(self.CONF, self.datapaths, self.logger, self.stats)
         wsgi = kwargs['wsgi']
         wsgi.register(QoSController, {'qos_api_app': self})
 
+    def close(self):
+        # Appelée par ryu-manager à l'arrêt
+        if self.stats.enabled:
+            self.stats.dump(self.CONF.STATS_FILE)
+            self.logger.info(f"Statistiques du contrôleur écrites dans {self.CONF.STATS_FILE}")
+
     @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
+    @instrumented('switch_features')
     def switch_features_handler(self, ev):
         datapath = ev.msg.datapath
         self.datapaths[datapath.id] = datapath
-        self.add_default_flow(datapath)
+        self.qos.flow_manager.forget_datapath(datapath.id)
+        self.add_default_flow(datapath, batch=True)
+        self.qos.flow_manager.batcher.flush(datapath)
 
-    def add_default_flow(self, datapath):
+    def add_default_flow(self, datapath, batch=False):
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
         match = parser.OFPMatch()
         actions = [parser.OFPActionOutput(ofproto.OFPP_CONTROLLER,
                                           ofproto.OFPCML_NO_BUFFER)]
-        self.qos.flow_manager.add_flow(datapath, 0, match, actions)
+        self.qos.flow_manager.add_flow(datapath, 0, match, actions, batch=batch)
+
+    @set_ev_cls(ofp_event.EventOFPBarrierReply, [CONFIG_DISPATCHER, MAIN_DISPATCHER])
+    @instrumented('barrier_reply')
+    def barrier_reply_handler(self, ev):
+        msg = ev.msg
+        self.qos.flow_manager.batcher.barrier_reply(msg.datapath.id, msg.xid)
+
+    @set_ev_cls(ofp_event.EventOFPFlowRemoved, MAIN_DISPATCHER)
+    @instrumented('flow_removed')
+    def flow_removed_handler(self, ev):
+        msg = ev.msg
+        self.qos.flow_manager.forget_flow(msg.datapath, msg.priority, msg.match)
 
     @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
+    @instrumented('packet_in')
     def packet_in_handler(self, ev):
         msg = ev.msg
         datapath = msg.datapath
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
         in_port = msg.match['in_port']
-        pkt = packet.Packet(msg.data)
-        eth = pkt.get_protocols(ethernet.ethernet)[0]
+        header = FastPacketParser.parse(msg.data)
+        if header is None:
+            header = FastPacketParser.parse_full(msg.data)
 
-        if eth.ethertype == ether_types.ETH_TYPE_LLDP:
+        if header.ethertype == ether_types.ETH_TYPE_LLDP:
             return
 
-        dst = eth.dst
-        src = eth.src
+        dst = header.dst
+        src = header.src
 
         if dst[:5] == "33:33":
             return
@@ -135,6 +451,7 @@ class Controller(app_manager.RyuApp):
         out = parser.OFPPacketOut(datapath=datapath, buffer_id=msg.buffer_id,
                                   in_port=in_port, actions=actions, data=data)
         datapath.send_msg(out)
+        self.stats.count_message(datapath, out)
 
 class QoSController(ControllerBase):
     def __init__(self, req, link, data, **config):
@@ -156,3 +473,21 @@ class QoSController(ControllerBase):
         except Exception as e:
             return Response(status=500, body=str(e))
 
+    @route('qos', '/qos/ready', methods=['GET'])
+    def network_ready(self, req, **kwargs):
+        # Long-polling : attend au plus `timeout` secondes les OFPBarrierReply en attente
+        try:
+            timeout = float(req.GET.get('timeout', 0))
+            ready = self.qos_api_app.qos.flow_manager.batcher.wait_ready(timeout)
+            body = json.dumps({
+                'ready': bool(ready) and all(ready.values()),
+                'datapaths': {str(dpid): state for dpid, state in ready.items()}
+            })
+            return Response(status=200, content_type='application/json', body=body)
+        except Exception as e:
+            return Response(status=500, body=str(e))
+
+    @route('qos', '/qos/stats', methods=['GET'])
+    def controller_stats(self, req, **kwargs):
+        body = json.dumps(self.qos_api_app.stats.snapshot())
+        return Response(status=200, content_type='application/json', body=body)
@@ -7,6 +7,9 @@ from mininet.log import setLogLevel
 import time
 import subprocess
 import requests  # Pour envoyer des requêtes au contrôleur
+import matplotlib
+# Pas d'affichage : la validation tourne sur la machine Mininet, sans serveur graphique
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 from openpyxl import Workbook
 
@@ -94,7 +97,7 @@ class ExcelSaver:
         plt.grid(True)
         plt.legend()
         plt.savefig("loss_results.png")
-        plt.show()
+        plt.close()
 
 
 class Main:
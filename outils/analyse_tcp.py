@@ -0,0 +1,388 @@
+"""Analyse TCP d'une capture : RTT, retransmissions, ACK dupliqués, segments hors séquence et perte.
+
+Remplace l'appariement impair/pair de qos_script_calcul.sh (qui prenait chaque couple de trames
+pour une requête/réponse et fixait lost_packets = 0) :
+    - RTT : chaque segment (données, SYN ou FIN) est indexé par son numéro de séquence de fin dans
+      une table de hachage ; l'ACK dont le numéro est égal donne un échantillon (algorithme de Karn :
+      les segments retransmis ne donnent pas d'échantillon) et libère les segments acquittés.
+    - retransmission : segment en deçà de la séquence maximale déjà vue dont l'identifiant IP est
+      postérieur à celui du segment qui le suit dans la séquence (l'original aurait été émis avant
+      lui) ; sinon c'est un segment réordonné, compté hors séquence. Si le segment suivant n'a pas
+      été vu, on compare à l'identifiant IP maximal, et si la pile n'incrémente pas l'identifiant IP,
+      un retard de plus de SEUIL_HORS_SEQUENCE tranche.
+    - ACK dupliqué : ACK sans données de même numéro et même fenêtre que le précédent, avec des
+      données encore en attente d'acquittement.
+    - perte : segments retransmis / segments de données, en %.
+
+Les RTT « réseau » sont ceux des segments émis par l'hôte où la capture est faite (le client dans
+les expérimentations) : l'autre sens ne mesure que le délai d'acquittement local.
+
+Ce module est la seule définition des métriques QoS : qos_direct.py (par fenêtre, pendant la
+capture), qos_segments.py (anneau dumpcap) et series_qos.py utilisent AnalyseurTCP, metriques()
+et ligne_bash(), et donnent donc les mêmes valeurs sur la même capture :
+    debit_mbps   octets des trames du flux / durée
+    perte_pct    segments de données retransmis / segments de données
+    latence_ms   RTT moyen des segments du client (SYN, requêtes GET), sinon de ceux du serveur
+    gigue_ms     variation moyenne des inter-arrivées des segments de données du serveur, hors
+                 pauses de plus de PAUSE_MAX entre deux segments HLS
+
+La gigue de l'ancien qos_script_calcul.sh (moyenne des |écarts| entre trames de rang pair du flux,
+dans les deux sens, soit en pratique la durée de la capture divisée par la moitié du nombre de
+trames) n'est pas une variation de délai : elle reste disponible dans la sortie JSON sous
+gigue_trames_paires_ms pour comparer avec les résultats antérieurs, mais average_jitter de
+--format bash est désormais gigue_ms.
+
+    python3 outils/analyse_tcp.py h1_h2.pcapng --serveur 10.1.1.1 --client 10.1.1.2
+    python3 outils/analyse_tcp.py h1_h2.pcapng --serveur 10.1.1.1 --client 10.1.1.2 --format bash
+"""
+import argparse
+import json
+import socket
+from array import array
+from collections import deque
+
+from lecteur_pcapng import decoder_tcp, lire_paquets
+
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_ACK = 0x10
+MODULO_SEQ = 1 << 32
+MODULO_ID = 1 << 16
+SEUIL_HORS_SEQUENCE = 0.003
+# Au-delà, l'écart entre deux segments de données est une pause entre deux segments HLS
+PAUSE_MAX = 0.5
+
+
+def apres(a, b, modulo):
+    """a est-il au-delà de b ou égal, en arithmétique de numéros de séquence ?"""
+    return ((a - b) % modulo) < modulo // 2
+
+
+def metriques(totaux, duree):
+    """Débit, perte, latence et gigue à partir des compteurs de AnalyseurTCP.totaux() (ou de leur différence)."""
+    if totaux['rtts_client']:
+        somme_rtt, rtts = totaux['somme_rtt_client'], totaux['rtts_client']
+    else:
+        somme_rtt, rtts = totaux['somme_rtt_serveur'], totaux['rtts_serveur']
+    segments = totaux['segments_donnees']
+    return {
+        'debit_mbps': totaux['octets'] * 8 / (duree * 1e6) if duree else 0.0,
+        'perte_pct': 100.0 * totaux['retransmissions'] / segments if segments else 0.0,
+        'latence_ms': 1000 * somme_rtt / rtts if rtts else 0.0,
+        'gigue_ms': 1000 * totaux['somme_gigue'] / totaux['gigues'] if totaux['gigues'] else 0.0,
+    }
+
+
+class ReleveTCP:
+    """Événements datés relevés au fil de l'analyse, en tableaux compacts (convertis en colonnes par series_qos.py)."""
+    __slots__ = ('ts', 'octets', 'ts_donnees', 'retransmis', 'descendant', 'ts_rtt', 'rtt', 'rtt_montant')
+
+    def __init__(self):
+        # Paquets du flux vidéo
+        self.ts = array('d')
+        self.octets = array('q')
+        # Segments de données : retransmis ou non, émis par le serveur ou par le client
+        self.ts_donnees = array('d')
+        self.retransmis = array('b')
+        self.descendant = array('b')
+        # Échantillons RTT, datés à l'ACK ; rtt_montant pour les segments émis par le client
+        self.ts_rtt = array('d')
+        self.rtt = array('d')
+        self.rtt_montant = array('b')
+
+
+# État TCP d'un sens, qui suit les raccords entre segments de capture (qos_segments.py), et compteurs additifs
+ETAT_FLUX = ('fin_max', 'id_max', 'temps_fin_max', 'en_attente', 'id_par_debut', 'ordre', 'dernier_ack',
+             'derniere_fenetre')
+COMPTEURS_FLUX = ('segments_donnees', 'octets_donnees', 'retransmissions', 'hors_sequence', 'dupacks', 'somme_rtt',
+                  'somme_carres_rtt', 'rtts')
+
+
+class FluxTCP:
+    """État d'un sens d'une connexion TCP."""
+    __slots__ = ('fin_max', 'id_max', 'temps_fin_max', 'en_attente', 'id_par_debut', 'ordre', 'dernier_ack', 'derniere_fenetre',
+                 'segments_donnees', 'octets_donnees', 'retransmissions', 'hors_sequence', 'dupacks',
+                 'somme_rtt', 'somme_carres_rtt', 'rtts', 'rtt_min', 'rtt_max')
+
+    def __init__(self):
+        self.fin_max = None
+        self.id_max = None
+        self.temps_fin_max = None
+        # fin de segment -> timestamp d'émission (None si retransmis : pas d'échantillon RTT)
+        self.en_attente = {}
+        # début de segment -> identifiant IP, pour les segments non encore acquittés
+        self.id_par_debut = {}
+        # (fin, début) dans l'ordre d'émission
+        self.ordre = deque()
+        self.dernier_ack = None
+        self.derniere_fenetre = None
+        self.segments_donnees = 0
+        self.octets_donnees = 0
+        self.retransmissions = 0
+        self.hors_sequence = 0
+        self.dupacks = 0
+        self.somme_rtt = 0.0
+        self.somme_carres_rtt = 0.0
+        self.rtts = 0
+        self.rtt_min = None
+        self.rtt_max = None
+
+    def etat(self):
+        """Copie comparable de l'état TCP, sans les compteurs."""
+        return (self.fin_max, self.id_max, self.temps_fin_max, dict(self.en_attente), dict(self.id_par_debut),
+                tuple(self.ordre), self.dernier_ack, self.derniere_fenetre)
+
+    def suite(self):
+        """Flux de même état TCP, compteurs à zéro."""
+        suite = FluxTCP()
+        for nom in ETAT_FLUX:
+            setattr(suite, nom, getattr(self, nom))
+        return suite
+
+    def fusionner(self, suite):
+        """Ajoute les compteurs de suite (analysée depuis l'état de self) et prend son état final."""
+        for nom in COMPTEURS_FLUX:
+            setattr(self, nom, getattr(self, nom) + getattr(suite, nom))
+        if suite.rtts:
+            self.rtt_min = suite.rtt_min if self.rtt_min is None else min(self.rtt_min, suite.rtt_min)
+            self.rtt_max = suite.rtt_max if self.rtt_max is None else max(self.rtt_max, suite.rtt_max)
+        for nom in ETAT_FLUX:
+            setattr(self, nom, getattr(suite, nom))
+
+    def emettre(self, ts, seq, longueur_seq, charge, id_ip):
+        fin = (seq + longueur_seq) % MODULO_SEQ
+        if charge > 0:
+            self.segments_donnees += 1
+            self.octets_donnees += charge
+        retransmis = False
+        if self.fin_max is None or apres(seq, self.fin_max, MODULO_SEQ):
+            self.fin_max = fin
+            self.temps_fin_max = ts
+        else:
+            id_suivant = self.id_par_debut.get(fin)
+            if id_suivant is not None and id_ip != id_suivant:
+                retransmis = apres(id_ip, id_suivant, MODULO_ID)
+            elif self.id_max is not None and id_ip != self.id_max:
+                retransmis = apres(id_ip, self.id_max, MODULO_ID)
+            else:
+                retransmis = ts - self.temps_fin_max > SEUIL_HORS_SEQUENCE
+            if retransmis:
+                self.retransmissions += 1
+            else:
+                self.hors_sequence += 1
+            if apres(fin, self.fin_max, MODULO_SEQ):
+                self.fin_max = fin
+                self.temps_fin_max = ts
+        if self.id_max is None or apres(id_ip, self.id_max, MODULO_ID):
+            self.id_max = id_ip
+        if fin in self.en_attente:
+            self.en_attente[fin] = None
+        else:
+            self.en_attente[fin] = None if retransmis else ts
+            self.ordre.append((fin, seq))
+        self.id_par_debut[seq] = id_ip
+        return retransmis
+
+    def acquitter(self, ts, ack):
+        """Libère les segments acquittés ; renvoie l'échantillon RTT de l'ACK, ou None."""
+        rtt = None
+        emission = self.en_attente.pop(ack, None)
+        if emission is not None:
+            rtt = ts - emission
+            self.somme_rtt += rtt
+            self.somme_carres_rtt += rtt * rtt
+            self.rtts += 1
+            self.rtt_min = rtt if self.rtt_min is None else min(self.rtt_min, rtt)
+            self.rtt_max = rtt if self.rtt_max is None else max(self.rtt_max, rtt)
+        # ACK cumulatif : tout ce qui finit avant ack est acquitté
+        while self.ordre and apres(ack, self.ordre[0][0], MODULO_SEQ):
+            fin, debut = self.ordre.popleft()
+            self.en_attente.pop(fin, None)
+            self.id_par_debut.pop(debut, None)
+        if not self.ordre and self.id_par_debut:
+            # Tout est acquitté : restent les débuts des retransmissions redécoupées, absents de ordre
+            self.id_par_debut.clear()
+        return rtt
+
+
+class AnalyseurTCP:
+    def __init__(self, ip_serveur, ip_client, port=None, releve=False):
+        self.ip_serveur = socket.inet_aton(ip_serveur)
+        self.ip_client = socket.inet_aton(ip_client)
+        self.port = port
+        # (ip_src, port_src, ip_dst, port_dst) -> FluxTCP
+        self.flux = {}
+        self.paquets = 0
+        self.octets = 0
+        self.premier = None
+        self.dernier = None
+        self.somme_gigue = 0.0
+        self.gigues = 0
+        self.derniere_donnee = None
+        self.derniere_interarrivee = None
+        # Ancienne gigue de qos_script_calcul.sh : écarts entre trames de rang pair
+        self.derniere_trame_paire = None
+        self.somme_ecarts_pairs = 0.0
+        self.ecarts_pairs = 0
+        self.releve = ReleveTCP() if releve else None
+
+    def ajouter(self, ts, longueur, segment):
+        if segment.ip_src == self.ip_serveur and segment.ip_dst == self.ip_client:
+            port, descendant = segment.port_src, True
+        elif segment.ip_src == self.ip_client and segment.ip_dst == self.ip_serveur:
+            port, descendant = segment.port_dst, False
+        else:
+            return
+        if self.port is not None and port != self.port:
+            return
+        self.paquets += 1
+        self.octets += longueur
+        if self.premier is None:
+            self.premier = ts
+        self.dernier = ts
+        if self.paquets % 2 == 0:
+            if self.derniere_trame_paire is not None:
+                self.somme_ecarts_pairs += abs(ts - self.derniere_trame_paire)
+                self.ecarts_pairs += 1
+            self.derniere_trame_paire = ts
+        if self.releve is not None:
+            self.releve.ts.append(ts)
+            self.releve.octets.append(longueur)
+        self.ajouter_tcp(ts, segment, descendant)
+        if descendant and segment.charge > 0:
+            if self.derniere_donnee is not None:
+                interarrivee = ts - self.derniere_donnee
+                if interarrivee > PAUSE_MAX:
+                    interarrivee = None
+                elif self.derniere_interarrivee is not None:
+                    self.somme_gigue += abs(interarrivee - self.derniere_interarrivee)
+                    self.gigues += 1
+                self.derniere_interarrivee = interarrivee
+            self.derniere_donnee = ts
+
+    def ajouter_tcp(self, ts, segment, descendant):
+        """Flux TCP seuls (retransmissions, RTT, ACK dupliqués) : ajouter() sans débit, trames paires ni gigue."""
+        releve = self.releve
+        cle = (segment.ip_src, segment.port_src, segment.ip_dst, segment.port_dst)
+        flux = self.flux.get(cle)
+        if flux is None:
+            flux = self.flux[cle] = FluxTCP()
+        inverse = self.flux.get((segment.ip_dst, segment.port_dst, segment.ip_src, segment.port_src))
+        longueur_seq = segment.charge + (1 if segment.flags & TCP_SYN else 0) + (1 if segment.flags & TCP_FIN else 0)
+        if segment.flags & TCP_ACK and inverse is not None:
+            if (longueur_seq == 0 and segment.ack == flux.dernier_ack and segment.fenetre == flux.derniere_fenetre
+                    and inverse.ordre):
+                flux.dupacks += 1
+            rtt = inverse.acquitter(ts, segment.ack)
+            if rtt is not None and releve is not None:
+                releve.ts_rtt.append(ts)
+                releve.rtt.append(rtt)
+                releve.rtt_montant.append(descendant)
+            flux.dernier_ack = segment.ack
+            flux.derniere_fenetre = segment.fenetre
+        if longueur_seq > 0:
+            retransmis = flux.emettre(ts, segment.seq, longueur_seq, segment.charge, segment.id_ip)
+            if segment.charge > 0 and releve is not None:
+                releve.ts_donnees.append(ts)
+                releve.retransmis.append(retransmis)
+                releve.descendant.append(descendant)
+
+    def analyser(self, source):
+        for paquet in lire_paquets(source):
+            if paquet.timestamp is None:
+                continue
+            segment = decoder_tcp(paquet.donnees)
+            if segment is not None:
+                self.ajouter(paquet.timestamp, paquet.longueur, segment)
+        return self.resume()
+
+    @staticmethod
+    def _rtt(flux):
+        rtts = sum(f.rtts for f in flux)
+        somme = sum(f.somme_rtt for f in flux)
+        moyenne = somme / rtts if rtts else 0.0
+        variance = max(0.0, sum(f.somme_carres_rtt for f in flux) / rtts - moyenne ** 2) if rtts else 0.0
+        minimums = [f.rtt_min for f in flux if f.rtt_min is not None]
+        maximums = [f.rtt_max for f in flux if f.rtt_max is not None]
+        return {
+            'echantillons': rtts,
+            'moyenne_ms': 1000 * moyenne,
+            'ecart_type_ms': 1000 * variance ** 0.5,
+            'min_ms': 1000 * min(minimums) if minimums else 0.0,
+            'max_ms': 1000 * max(maximums) if maximums else 0.0,
+        }
+
+    def totaux(self):
+        """Compteurs cumulés depuis le début ; la différence de deux relevés donne ceux d'une fenêtre."""
+        montants = [f for cle, f in self.flux.items() if cle[0] == self.ip_client]
+        descendants = [f for cle, f in self.flux.items() if cle[0] == self.ip_serveur]
+        tous = montants + descendants
+        return {
+            'paquets': self.paquets,
+            'octets': self.octets,
+            'segments_donnees': sum(f.segments_donnees for f in tous),
+            'retransmissions': sum(f.retransmissions for f in tous),
+            'somme_gigue': self.somme_gigue,
+            'gigues': self.gigues,
+            # Capture côté client : les RTT réseau sont ceux des segments du client (SYN, requêtes GET)
+            'somme_rtt_client': sum(f.somme_rtt for f in montants),
+            'rtts_client': sum(f.rtts for f in montants),
+            'somme_rtt_serveur': sum(f.somme_rtt for f in descendants),
+            'rtts_serveur': sum(f.rtts for f in descendants),
+        }
+
+    def resume(self):
+        montants = [f for cle, f in self.flux.items() if cle[0] == self.ip_client]
+        descendants = [f for cle, f in self.flux.items() if cle[0] == self.ip_serveur]
+        tous = montants + descendants
+        duree = (self.dernier - self.premier) if self.paquets > 1 else 0.0
+        totaux = self.totaux()
+        valeurs = metriques(totaux, duree)
+        return {
+            'paquets': self.paquets,
+            'octets': self.octets,
+            'connexions': len(descendants),
+            'duree_s': duree,
+            'debit_mbps': valeurs['debit_mbps'],
+            'segments_donnees': totaux['segments_donnees'],
+            'retransmissions': totaux['retransmissions'],
+            'hors_sequence': sum(f.hors_sequence for f in tous),
+            'dupacks': sum(f.dupacks for f in tous),
+            'perte_pct': valeurs['perte_pct'],
+            'rtt_client': self._rtt(montants),
+            'rtt_serveur': self._rtt(descendants),
+            'latence_ms': valeurs['latence_ms'],
+            'gigue_ms': valeurs['gigue_ms'],
+            'gigue_trames_paires_ms': 1000 * self.somme_ecarts_pairs / self.ecarts_pairs if self.ecarts_pairs else 0.0,
+        }
+
+
+def ligne_bash(resume):
+    """Ligne lue par QoSMetricsCollector, commune à analyse_tcp.py, qos_direct.py et qos_segments.py."""
+    # Même sortie (et mêmes unités : Mbps, %, secondes) que l'ancien qos_script_calcul.sh, sans notation
+    # exponentielle, que l'expression régulière de QoSMetricsCollector ne lit pas
+    return (f"bitrate: {resume['debit_mbps']:.6f} packet_loss: {resume['perte_pct']:.6f} "
+            f"average_latency: {resume['latence_ms'] / 1000:.9f} average_jitter: {resume['gigue_ms'] / 1000:.9f}")
+
+
+class Main:
+    @staticmethod
+    def main():
+        parser = argparse.ArgumentParser(description="Analyse TCP d'une capture : RTT, retransmissions, ACK dupliqués, perte.")
+        parser.add_argument('capture', help="capture pcapng/pcap ou '-' pour l'entrée standard")
+        parser.add_argument('--serveur', required=True, help="adresse IP du serveur vidéo")
+        parser.add_argument('--client', required=True, help="adresse IP du client")
+        parser.add_argument('--port', type=int, help="port vidéo du serveur")
+        parser.add_argument('--format', choices=['json', 'bash'], default='json',
+                            help="bash : ligne « bitrate: ... packet_loss: ... » lue par QoSMetricsCollector")
+        args = parser.parse_args()
+
+        resume = AnalyseurTCP(args.serveur, args.client, args.port).analyser(args.capture)
+        if args.format == 'bash':
+            print(ligne_bash(resume))
+        else:
+            print(json.dumps(resume, indent=2))
+
+
+if __name__ == "__main__":
+    Main.main()
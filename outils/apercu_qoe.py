@@ -0,0 +1,235 @@
+"""Aperçu rapide de la QoE : PSNR/SSIM sur une fenêtre sur N et/ou sur des images réduites, pour trier une campagne.
+
+Dans classe_2_experimentation.py, QoEMetricsCollector.APERCU_PAS_IMAGES = N ne mesure qu'une fenêtre de
+APERCU_FENETRE_S secondes sur N : chaque fenêtre est atteinte par -ss/-t sur la référence comme sur la vidéo
+reçue, ffmpeg ne décode que depuis l'image clé qui la précède, et les fenêtres sont combinées (EQM pondérée
+par le nombre d'images pour le PSNR, moyenne pondérée pour le SSIM). APERCU_REDUCTION = K divise largeur et
+hauteur par K (scale, moyenne par zone) avant psnr/ssim. Les valeurs vont dans l'entrepôt sous psnr_apercu /
+ssim_apercu, jamais mélangées aux valeurs complètes, et ne sont pas exportées en Excel.
+
+L'aperçu n'est pas la mesure complète :
+    - la réduction moyenne les pixels voisins et efface une partie du bruit de codage (blocs, flou
+      fin) : PSNR et SSIM de l'aperçu sont en général plus élevés que les valeurs complètes, mais
+      ce biais est à peu près commun à toutes les valeurs d'une configuration ;
+    - l'échantillonnage n'a pas de biais pour une dégradation régulière (débit), mais une dégradation
+      localisée (rafale de pertes, gel) peut tomber hors des fenêtres ou y être surreprésentée ;
+    - le gain de l'échantillonnage dépend de l'intervalle entre images clés : avec des segments HLS
+      de 2 s, une fenêtre de 2 s ne décode guère plus que ses propres images.
+La sous-commande erreurs mesure ces écarts sur un corpus (clips de benchmark_qoe.py, dégradations
+debit, gel et perte_ts, et/ou vidéos reçues d'une campagne avec --video) pour chaque réglage (N, K) :
+écart maximal et moyen avec le calcul complet, étendue de l'écart signé (plus grand max - min à codec
+et profil fixés) et accélération. Ce tableau de bornes est la documentation de l'aperçu : il se
+régénère quand le corpus, ffmpeg ou APERCU_FENETRE_S change.
+
+outils/bornes_apercu_synthetique.csv est ce tableau pour ffmpeg 7.0.2 (libx264, libx265) sur des clips
+testsrc2 seulement : 60 s à 25 images/s, une image clé toutes les 2 s, h264 et h265, profils 240 à
+1080, dégradations debit, gel et perte_ts (30 comparaisons par réglage ; les .ts de perte_ts ont été
+remuxés en Matroska, le ffmpeg statique utilisé plantant au démultiplexage MPEG-TS). Une fenêtre sur 5
+ou sur 10 accélère le calcul de x3,5 et x6,5 ; l'écart reste sous 0,45 dB (PSNR) et 0,0031 (SSIM) pour
+debit et gel, mais atteint 3 à 4 dB et 0,15 à 0,19 (SSIM) pour perte_ts. La réduction surestime le
+PSNR jusqu'à 4,9 dB (K = 2) et 8,9 dB (K = 4) sans accélérer (x1,03 et x1,06 seule) : le
+décodage domine. Ces bornes ne valent pas pour des vidéos reçues : avant de trier une campagne,
+régénérer le tableau avec --reference et --video sur des vidéos reçues de cette campagne.
+
+La sous-commande trier lit les valeurs d'aperçu d'une expérience et retient les valeurs de
+perturbation autour desquelles la métrique change de plus que l'étendue de l'écart du réglage (l'erreur
+possible sur la différence de deux valeurs d'aperçu), ou passe sous --seuil : seules celles-ci sont à
+recalculer en complet (QoEMetricsCollector.VALEURS_COMPLETES).
+
+    python3 outils/apercu_qoe.py erreurs --sans-clips --reference video_serveur.mp4 --video recue_1.mp4 --video recue_2.mp4 --sortie bornes_apercu.csv
+    python3 outils/apercu_qoe.py trier 03_perte_paquet/02_une_video/01_h264 --bornes bornes_apercu.csv --pas 5
+"""
+import argparse
+import csv
+import os
+import time
+
+import numpy as np
+
+from benchmark_qoe import DEGRADATIONS, ENCODEURS, PROFILS, ClipGenerator
+from experiences import EXPERIENCE_DEFAUT, charger_classe
+from rapport_campagne import agreger
+from regression import ecrire_resultats
+from resultats import RACINE_RESULTATS, EntrepotResultats, cle_perturbation
+
+METRIQUES = ('psnr', 'ssim')
+COLONNES_DETAILS = ('codec', 'profil', 'degradation', 'pas_images', 'reduction', 'fenetre_s', 'psnr', 'psnr_apercu',
+                    'ecart_psnr', 'ssim', 'ssim_apercu', 'ecart_ssim', 'duree_s', 'duree_apercu_s')
+COLONNES_BORNES = ('pas_images', 'reduction', 'fenetre_s', 'comparaisons', 'ecart_psnr_max', 'ecart_psnr_moyen',
+                   'ecart_psnr_etendue', 'ecart_ssim_max', 'ecart_ssim_moyen', 'ecart_ssim_etendue', 'acceleration')
+
+
+def reglages(pas_images, reductions):
+    return [(pas, reduction) for pas in pas_images for reduction in reductions if pas > 1 or reduction > 1]
+
+
+def calculer(collecteur, reference, video, pas_images=1, reduction=1):
+    """(psnr, ssim, durée) avec le réglage d'aperçu donné ; (1, 1) pour le calcul complet. La durée des
+    fenêtres est celle de collecteur.APERCU_FENETRE_S."""
+    collecteur.APERCU_PAS_IMAGES, collecteur.APERCU_REDUCTION = pas_images, reduction
+    instance = collecteur({}, reference)
+    debut = time.perf_counter()
+    psnr, ssim = instance.calcul_psnr(reference, video), instance.calcul_ssim(reference, video)
+    return psnr, ssim, time.perf_counter() - debut
+
+
+def mesurer_erreurs(collecteur, comparaisons, liste_reglages):
+    """Une ligne (COLONNES_DETAILS) par comparaison et par réglage ; les réglages changent des attributs
+    de classe, les comparaisons sont donc faites une à une."""
+    details = []
+    for comparaison in comparaisons:
+        psnr, ssim, duree = calculer(collecteur, comparaison['reference'], comparaison['degradee'])
+        for pas_images, reduction in liste_reglages:
+            psnr_apercu, ssim_apercu, duree_apercu = calculer(collecteur, comparaison['reference'], comparaison['degradee'],
+                                                              pas_images, reduction)
+            details.append({'codec': comparaison['codec'], 'profil': comparaison['profil'],
+                            'degradation': comparaison['degradation'], 'pas_images': pas_images, 'reduction': reduction,
+                            'fenetre_s': collecteur.APERCU_FENETRE_S, 'psnr': psnr, 'psnr_apercu': psnr_apercu, 'ecart_psnr': psnr_apercu - psnr,
+                            'ssim': ssim, 'ssim_apercu': ssim_apercu, 'ecart_ssim': ssim_apercu - ssim,
+                            'duree_s': duree, 'duree_apercu_s': duree_apercu})
+        print(f"{comparaison['codec']} {comparaison['profil']} {comparaison['degradation']} : "
+              f"PSNR {psnr:.2f} dB, SSIM {ssim:.4f} en {duree:.1f}s")
+    return details
+
+
+def etendue(lignes, metrique):
+    """Plus grand max - min de l'écart signé à codec et profil fixés : erreur possible sur la différence de deux
+    valeurs d'aperçu d'une même configuration (le biais commun, celui de la réduction surtout, s'y annule)."""
+    par_configuration = {}
+    for ligne in lignes:
+        par_configuration.setdefault((ligne['codec'], ligne['profil']), []).append(ligne[f'ecart_{metrique}'])
+    return max(max(ecarts) - min(ecarts) for ecarts in par_configuration.values())
+
+
+def bornes(details):
+    """Écarts maximal et moyen (en valeur absolue), étendue et accélération de chaque réglage (COLONNES_BORNES)."""
+    resultats = []
+    for pas_images, reduction in sorted({(detail['pas_images'], detail['reduction']) for detail in details}):
+        lignes = [detail for detail in details if (detail['pas_images'], detail['reduction']) == (pas_images, reduction)]
+        ecarts = {metrique: np.abs([ligne[f'ecart_{metrique}'] for ligne in lignes]) for metrique in METRIQUES}
+        resultats.append({'pas_images': pas_images, 'reduction': reduction, 'fenetre_s': lignes[0]['fenetre_s'],
+                          'comparaisons': len(lignes),
+                          'ecart_psnr_max': float(ecarts['psnr'].max()), 'ecart_psnr_moyen': float(ecarts['psnr'].mean()),
+                          'ecart_psnr_etendue': etendue(lignes, 'psnr'),
+                          'ecart_ssim_max': float(ecarts['ssim'].max()), 'ecart_ssim_moyen': float(ecarts['ssim'].mean()),
+                          'ecart_ssim_etendue': etendue(lignes, 'ssim'),
+                          'acceleration': sum(ligne['duree_s'] for ligne in lignes) / sum(ligne['duree_apercu_s'] for ligne in lignes)})
+    return resultats
+
+
+def marge_bornes(chemin, metrique, pas_images, reduction):
+    """Étendue de l'écart du réglage dans un tableau de bornes (.csv de la sous-commande erreurs)."""
+    with open(chemin, newline='') as f:
+        for ligne in csv.DictReader(f):
+            if (int(ligne['pas_images']), int(ligne['reduction'])) == (pas_images, reduction):
+                return float(ligne[f'ecart_{metrique}_etendue'])
+    raise ValueError(f"Réglage pas_images={pas_images}, reduction={reduction} absent de {chemin}")
+
+
+def trier(lignes, metrique, marge, seuil=None):
+    """{(perturbation, codec, profile, nombre_hotes): (valeurs, moyennes des paires, retenues)} d'après les valeurs d'aperçu."""
+    choix = {}
+    for perturbation, colonnes in agreger(lignes).get(f'{metrique}_apercu', {}).items():
+        par_configuration = {}
+        for (codec, profile, hotes, _), valeurs in colonnes.items():
+            for valeur, mesure in valeurs.items():
+                par_configuration.setdefault((codec, profile, hotes), {}).setdefault(valeur, []).append(mesure)
+        for (codec, profile, hotes), par_valeur in sorted(par_configuration.items()):
+            valeurs = sorted(par_valeur)
+            moyennes = np.array([np.mean(par_valeur[valeur]) for valeur in valeurs])
+            # Les deux extrémités d'un saut plus grand que l'erreur possible de l'aperçu
+            sauts = np.abs(np.diff(moyennes)) > marge
+            retenues = np.zeros(len(valeurs), dtype=bool)
+            retenues[:-1] |= sauts
+            retenues[1:] |= sauts
+            if seuil is not None:
+                retenues |= moyennes < seuil
+            choix[(perturbation, codec, profile, hotes)] = (valeurs, moyennes, retenues)
+    return choix
+
+
+class Main:
+    @staticmethod
+    def main():
+        parser = argparse.ArgumentParser(description="Aperçu rapide de la QoE : bornes d'erreur et tri d'une campagne.")
+        commandes = parser.add_subparsers(dest='commande', required=True)
+        erreurs = commandes.add_parser('erreurs', help="écarts de l'aperçu avec le calcul complet sur le corpus")
+        erreurs.add_argument('--repertoire', default='corpus_qoe', help="répertoire des clips générés (réutilisés s'ils existent)")
+        erreurs.add_argument('--codec', action='append', choices=sorted(ENCODEURS), help="codec (répétable)")
+        erreurs.add_argument('--profil', action='append', type=int, choices=sorted(PROFILS), help="profil vertical (répétable)")
+        erreurs.add_argument('--degradation', action='append', choices=DEGRADATIONS, help="dégradation (répétable)")
+        erreurs.add_argument('--duree', type=int, default=60, help="durée des clips en secondes")
+        erreurs.add_argument('--image-cle', type=float, default=2.0,
+                             help="intervalle entre images clés des clips en secondes (segments HLS)")
+        erreurs.add_argument('--reference', help="vidéo côté serveur pour les vidéos --video")
+        erreurs.add_argument('--video', action='append', help="vidéo reçue d'une campagne (répétable, avec --reference)")
+        erreurs.add_argument('--sans-clips', action='store_true', help="seulement les vidéos --video")
+        erreurs.add_argument('--pas', action='append', type=int, help="une fenêtre sur N (répétable ; 1, 5, 10 par défaut)")
+        erreurs.add_argument('--fenetre', type=float, help="durée des fenêtres en secondes (APERCU_FENETRE_S par défaut)")
+        erreurs.add_argument('--reduction', action='append', type=int, help="facteur de réduction (répétable ; 1, 2, 4 par défaut)")
+        erreurs.add_argument('--experience', default=EXPERIENCE_DEFAUT, help="répertoire d'expérience (classe_2_experimentation.py)")
+        erreurs.add_argument('--sortie', default='bornes_apercu.csv', help="tableau des bornes par réglage (.csv ou .xlsx)")
+        erreurs.add_argument('--details', help="écarts par comparaison (.csv ou .xlsx)")
+        tri = commandes.add_parser('trier', help="valeurs de perturbation à recalculer en complet")
+        tri.add_argument('experience', help="répertoire de l'expérience, relatif à la racine du dépôt")
+        tri.add_argument('--racine', default=RACINE_RESULTATS, help="répertoire de l'entrepôt")
+        tri.add_argument('--metrique', choices=METRIQUES, default='psnr')
+        tri.add_argument('--profile', type=int, action='append', help="profil vidéo (répétable)")
+        tri.add_argument('--bornes', help="tableau de la sous-commande erreurs, avec --pas et --reduction")
+        tri.add_argument('--pas', type=int, default=1, help="réglage d'aperçu utilisé pour la campagne")
+        tri.add_argument('--reduction', type=int, default=1, help="réglage d'aperçu utilisé pour la campagne")
+        tri.add_argument('--marge', type=float, help="saut minimal retenu, sans --bornes")
+        tri.add_argument('--seuil', type=float, help="retient aussi les valeurs sous ce seuil")
+        args = parser.parse_args()
+
+        if args.commande == 'erreurs':
+            comparaisons = []
+            if not args.sans_clips:
+                generateur = ClipGenerator(args.repertoire, args.duree, image_cle_s=args.image_cle)
+                comparaisons = generateur.corpus(args.codec or ['h264', 'h265'], args.profil or [240, 720],
+                                                 args.degradation or DEGRADATIONS)
+            if args.video:
+                if not args.reference:
+                    parser.error("--video demande --reference")
+                comparaisons += [{'codec': '', 'profil': '', 'degradation': os.path.basename(video),
+                                  'reference': args.reference, 'degradee': video} for video in args.video]
+            collecteur = charger_classe(os.path.join(args.experience, 'classe_2_experimentation.py'), 'QoEMetricsCollector')
+            if args.fenetre:
+                collecteur.APERCU_FENETRE_S = args.fenetre
+            details = mesurer_erreurs(collecteur, comparaisons, reglages(args.pas or [1, 5, 10], args.reduction or [1, 2, 4]))
+            if not details:
+                parser.error("aucune comparaison ou aucun réglage d'aperçu")
+            resultats = bornes(details)
+            ecrire_resultats(resultats, args.sortie, COLONNES_BORNES)
+            if args.details:
+                ecrire_resultats(details, args.details, COLONNES_DETAILS)
+            for resultat in resultats:
+                print(f"une fenêtre sur {resultat['pas_images']}, réduction {resultat['reduction']} : "
+                      f"PSNR ±{resultat['ecart_psnr_max']:.2f} dB (étendue {resultat['ecart_psnr_etendue']:.2f}), "
+                      f"SSIM ±{resultat['ecart_ssim_max']:.4f} (étendue {resultat['ecart_ssim_etendue']:.4f}), "
+                      f"x{resultat['acceleration']:.1f}")
+            print(f"Bornes écrites dans {args.sortie}")
+            return
+
+        if args.bornes:
+            marge = marge_bornes(args.bornes, args.metrique, args.pas, args.reduction)
+        elif args.marge is not None:
+            marge = args.marge
+        else:
+            parser.error("--bornes ou --marge")
+        lignes = EntrepotResultats(args.racine).lire(experience=[args.experience], profile=args.profile,
+                                                      metrique=[f'{args.metrique}_apercu'])
+        choix = trier(lignes, args.metrique, marge, args.seuil)
+        if not choix:
+            parser.error(f"aucune valeur {args.metrique}_apercu pour {args.experience} dans {args.racine}")
+        completes = set()
+        for (perturbation, codec, profile, hotes), (valeurs, moyennes, retenues) in sorted(choix.items()):
+            print(f"{perturbation}, {codec} {profile}p, {hotes} hôtes (saut minimal {marge:.4g}) :")
+            for valeur, moyenne, retenue in zip(valeurs, moyennes.tolist(), retenues.tolist()):
+                print(f"    {valeur} : {moyenne:.4f}{'  -> complet' if retenue else ''}")
+            completes.update(valeur for valeur, retenue in zip(valeurs, retenues.tolist()) if retenue)
+        print(f"QoEMetricsCollector.VALEURS_COMPLETES = {sorted(cle_perturbation(valeur) for valeur in completes)}")
+
+
+if __name__ == "__main__":
+    Main.main()
@@ -0,0 +1,97 @@
+"""Balayage adaptatif des valeurs de perturbation : grille grossière, puis bissection là où la métrique change le plus.
+
+Les PERTURBATION_NUMBERS fixes ([24, 32, 48, 64, 80, 96] Mbps, [0, 2, 3, 5, 10, 15] % de perte, ...)
+mettent souvent plusieurs valeurs dans des zones plates et trop peu autour de la chute de qualité.
+Avec un budget de B exécutions, BalayageAdaptatif mesure d'abord la grille (ou, si B est plus petit,
+ses extrémités et des valeurs régulièrement réparties), puis, tant qu'il reste du budget, coupe en deux
+l'intervalle entre deux valeurs voisines où la métrique varie le plus (|écart|, à égalité le plus
+large). Les valeurs restent des multiples entiers de pas (noms de fichiers et clés de la phase 2) :
+un intervalle plus court que 2 pas n'est plus coupé et le balayage s'arrête avant le budget s'il n'y a
+plus rien à couper.
+
+Dans classe_1_experimentation.py (Main.BUDGET_ADAPTATIF, Main.METRIQUE_ADAPTATIVE), la métrique d'une
+exécution est mesurée dès la fin du flux sur les captures de end_exp_<perturbation>_<valeur>
+(analyse_tcp.py, moyenne des paires du nombre d'hôtes en cours), avant de choisir la valeur suivante.
+
+    python3 outils/balayage_adaptatif.py end_exp_loss_5 --suffixe _hotes_2_loss_5.pcapng --metrique bitrate
+"""
+import argparse
+import os
+import re
+
+import numpy as np
+
+from analyse_tcp import AnalyseurTCP
+
+# Métrique de classe_2 -> champ du résumé d'AnalyseurTCP
+CHAMPS = {'bitrate': 'debit_mbps', 'packet_loss': 'perte_pct', 'average_latency': 'latence_ms', 'average_jitter': 'gigue_ms'}
+CAPTURE = re.compile(r'^h(\d+)_h(\d+)_')
+
+
+class BalayageAdaptatif:
+    def __init__(self, grille, budget, pas=1):
+        grille = sorted(set(grille))
+        choisies = np.unique(np.round(np.linspace(0, len(grille) - 1, min(budget, len(grille)))).astype(int))
+        self.grossiere = [grille[indice] for indice in choisies.tolist()]
+        self.budget = budget
+        self.pas = pas
+        self.mesures = {}
+
+    def ajouter(self, valeur, mesure):
+        self.mesures[valeur] = mesure
+
+    def prochaine(self):
+        """Prochaine valeur à exécuter ; None quand le budget est épuisé ou qu'aucun intervalle ne peut être coupé."""
+        if len(self.mesures) >= self.budget:
+            return None
+        for valeur in self.grossiere:
+            if valeur not in self.mesures:
+                return valeur
+        valeurs = np.array(sorted(self.mesures))
+        metriques = np.array([self.mesures[valeur] for valeur in valeurs.tolist()], dtype=np.float64)
+        variations = np.abs(np.diff(metriques))
+        largeurs = np.diff(valeurs)
+        # Une exécution en échec (NaN) n'oriente pas la recherche
+        coupables = (largeurs >= 2 * self.pas) & np.isfinite(variations)
+        if not coupables.any():
+            return None
+        ordre = np.lexsort((largeurs, variations))
+        intervalle = ordre[coupables[ordre]][-1]
+        milieu = valeurs[intervalle] + (largeurs[intervalle] // (2 * self.pas)) * self.pas
+        return milieu.item()
+
+    def valeurs(self, mesurer):
+        """Valeurs à exécuter une à une ; mesurer(valeur) est appelé quand l'exécution de valeur est terminée."""
+        valeur = self.prochaine()
+        while valeur is not None:
+            yield valeur
+            self.ajouter(valeur, mesurer(valeur))
+            valeur = self.prochaine()
+
+
+def mesurer_repertoire(repertoire, suffixe, metrique='bitrate'):
+    """Moyenne sur les paires de la métrique des captures h<X>_h<Y>_...<suffixe> du répertoire (NaN si aucune)."""
+    mesures = []
+    for nom in sorted(os.listdir(repertoire)) if os.path.isdir(repertoire) else []:
+        correspondance = CAPTURE.match(nom)
+        if correspondance and nom.endswith(suffixe):
+            # Adresses des hôtes Mininet, comme QoSMetricsCollector._get_ip_address
+            serveur, client = (f"10.1.1.{numero}" for numero in correspondance.groups())
+            resume = AnalyseurTCP(serveur, client).analyser(os.path.join(repertoire, nom))
+            mesures.append(resume[CHAMPS[metrique]])
+    return float(np.mean(mesures)) if mesures else float('nan')
+
+
+class Main:
+    @staticmethod
+    def main():
+        parser = argparse.ArgumentParser(description="Métrique d'une exécution du balayage adaptatif (moyenne des paires).")
+        parser.add_argument('repertoire', help="répertoire end_exp_<perturbation>_<valeur>")
+        parser.add_argument('--suffixe', default='.pcapng', help="fin du nom des captures (_<perturbation>_<valeur>.pcapng)")
+        parser.add_argument('--metrique', choices=sorted(CHAMPS), default='bitrate', help="métrique mesurée")
+        args = parser.parse_args()
+        print(f"{args.metrique} : {mesurer_repertoire(args.repertoire, args.suffixe, args.metrique):.6f}")
+
+
+if __name__ == "__main__":
+    Main.main()
@@ -0,0 +1,253 @@
+"""Benchmark hors ligne des contrôleurs Ryu : rejoue des packet-in sur des datapaths factices.
+
+Aucun Mininet ni OVS n'est nécessaire, seulement ryu. Exemple :
+
+    python3 outils/benchmark_controleur.py 03_perte_paquet/02_une_video/01_h264/d_controler_05_07_2024.py
+    python3 outils/benchmark_controleur.py 01_bande_passante/02_une_video/002_h264/controleur.py --pcap capture.pcapng
+
+Un seul contrôleur par exécution : les options cfg enregistrées par deux contrôleurs différents
+entreraient en conflit dans le même processus.
+"""
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import socket
+import struct
+import time
+
+from ryu import cfg
+from ryu.controller import ofp_event
+from ryu.ofproto import ofproto_v1_3, ofproto_v1_3_parser
+
+from lecteur_pcapng import lire_paquets
+
+ETH_TYPE_IP = 0x0800
+ETH_TYPE_ARP = 0x0806
+TCP_SYN = 0x02
+TCP_ACK = 0x10
+TCP_PSH = 0x08
+NOMBRE_PAIRES = 8
+OPENFLOW_HEADER = struct.Struct('!BBHI')
+NOMS_MESSAGES = {valeur: nom[len('OFPT_'):] for nom, valeur in vars(ofproto_v1_3).items()
+                 if nom.startswith('OFPT_') and isinstance(valeur, int)}
+
+
+def mac_hote(numero):
+    return bytes([0, 0, 0, 0, 0, numero])
+
+
+def ip_hote(numero):
+    return socket.inet_aton(f"10.1.1.{numero}")
+
+
+def port_hote(numero):
+    # Topologie NetworkTopology : s1-s2 sur le port 1, puis h1/h2 sur le port 2 de s1/s2, h3/h4 sur le port 3, ...
+    dpid = 1 if numero % 2 else 2
+    return dpid, (numero + 1) // 2 + 1
+
+
+class FakeDatapath:
+    """Datapath OpenFlow 1.3 en mémoire : sérialise les messages comme ryu mais ne les envoie nulle part."""
+    def __init__(self, dpid):
+        self.id = dpid
+        self.ofproto = ofproto_v1_3
+        self.ofproto_parser = ofproto_v1_3_parser
+        self.xid = 0
+        self.messages = {}
+        self.octets = 0
+        self.barriers = []
+
+    def set_xid(self, msg):
+        self.xid += 1
+        msg.set_xid(self.xid)
+        return self.xid
+
+    def send_msg(self, msg):
+        if msg.xid is None:
+            self.set_xid(msg)
+        msg.serialize()
+        self.send(msg.buf)
+
+    def send(self, buf):
+        # Un même write peut contenir plusieurs messages (envoi groupé) : on relit les en-têtes OpenFlow
+        self.octets += len(buf)
+        position = 0
+        while position + 8 <= len(buf):
+            _, type_msg, longueur, xid = OPENFLOW_HEADER.unpack_from(buf, position)
+            nom = NOMS_MESSAGES.get(type_msg, str(type_msg))
+            self.messages[nom] = self.messages.get(nom, 0) + 1
+            if type_msg == ofproto_v1_3.OFPT_BARRIER_REQUEST:
+                self.barriers.append(xid)
+            position += max(longueur, 8)
+
+
+class FakeWSGI:
+    def register(self, controller, data=None):
+        pass
+
+
+class TrafficGenerator:
+    """Rafales HLS synthétiques : ARP puis ouvertures de connexions TCP des 8 clients vers leurs serveurs."""
+    def __init__(self, connexions_par_client=20, paires=NOMBRE_PAIRES):
+        self.connexions_par_client = connexions_par_client
+        self.paires = paires
+
+    @staticmethod
+    def trame_arp(src, dst, requete):
+        eth = (b'\xff' * 6 if requete else mac_hote(dst)) + mac_hote(src) + struct.pack('!H', ETH_TYPE_ARP)
+        arp = struct.pack('!HHBBH6s4s6s4s', 1, ETH_TYPE_IP, 6, 4, 1 if requete else 2,
+                          mac_hote(src), ip_hote(src), b'\x00' * 6 if requete else mac_hote(dst), ip_hote(dst))
+        return eth + arp
+
+    @staticmethod
+    def trame_tcp(src, dst, port_src, port_dst, flags, seq, ack, payload=b''):
+        tcp = struct.pack('!HHIIBBHHH', port_src, port_dst, seq, ack, 5 << 4, flags, 65535, 0, 0) + payload
+        ip = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(tcp), seq & 0xFFFF, 0x4000, 64, 6, 0, ip_hote(src), ip_hote(dst))
+        return mac_hote(dst) + mac_hote(src) + struct.pack('!H', ETH_TYPE_IP) + ip + tcp
+
+    def _traverser(self, src, dst, trame):
+        # Tant que le flux n'est pas installé, chaque switch traversé remonte un packet-in
+        dpid_src, port_src = port_hote(src)
+        dpid_dst, _ = port_hote(dst)
+        evenements = [(dpid_src, port_src, trame)]
+        if dpid_dst != dpid_src:
+            evenements.append((dpid_dst, 1, trame))
+        return evenements
+
+    def generer(self):
+        evenements = []
+        for paire in range(self.paires):
+            serveur, client = 2 * paire + 1, 2 * paire + 2
+            evenements += self._traverser(client, serveur, self.trame_arp(client, serveur, True))
+            evenements += self._traverser(serveur, client, self.trame_arp(serveur, client, False))
+        requete = b'GET /h264/hls/1080/240/bbb_h264_slave_240_4.m3u8 HTTP/1.1\r\n\r\n'
+        for connexion in range(self.connexions_par_client):
+            for paire in range(self.paires):
+                serveur, client = 2 * paire + 1, 2 * paire + 2
+                port_video = 5000 + 1000 * paire
+                port_client = 40000 + connexion * self.paires + paire
+                evenements += self._traverser(client, serveur, self.trame_tcp(client, serveur, port_client, port_video, TCP_SYN, 1000, 0))
+                evenements += self._traverser(serveur, client, self.trame_tcp(serveur, client, port_video, port_client, TCP_SYN | TCP_ACK, 5000, 1001))
+                evenements += self._traverser(client, serveur, self.trame_tcp(client, serveur, port_client, port_video, TCP_ACK, 1001, 5001))
+                evenements += self._traverser(client, serveur, self.trame_tcp(client, serveur, port_client, port_video, TCP_PSH | TCP_ACK, 1001, 5001, requete))
+        return evenements
+
+    @staticmethod
+    def depuis_capture(chemin):
+        evenements = []
+        for paquet in lire_paquets(chemin):
+            trame = paquet.donnees
+            if len(trame) < 14:
+                continue
+            numero = trame[11] if trame[6:11] == b'\x00' * 5 else 0
+            dpid, port = port_hote(numero) if 0 < numero <= 2 * NOMBRE_PAIRES else (1, 1)
+            evenements.append((dpid, port, trame))
+        return evenements
+
+
+class ControllerBenchmark:
+    def __init__(self, chemin_controleur, fichier_conf=None):
+        self.chemin_controleur = os.path.abspath(chemin_controleur)
+        cfg.CONF(args=[], project='ryu', default_config_files=[fichier_conf] if fichier_conf else [])
+        spec = importlib.util.spec_from_file_location('controleur_benchmark', self.chemin_controleur)
+        self.module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(self.module)
+        self.app = self.module.Controller(wsgi=FakeWSGI())
+        self.datapaths = {dpid: FakeDatapath(dpid) for dpid in (1, 2)}
+
+    def connecter_switches(self):
+        parser = ofproto_v1_3_parser
+        for datapath in self.datapaths.values():
+            msg = parser.OFPSwitchFeatures(datapath, datapath_id=datapath.id)
+            self.app.switch_features_handler(ofp_event.EventOFPSwitchFeatures(msg))
+            if hasattr(self.app, 'barrier_reply_handler'):
+                for xid in datapath.barriers:
+                    reply = parser.OFPBarrierReply(datapath)
+                    reply.xid = xid
+                    self.app.barrier_reply_handler(ofp_event.EventOFPBarrierReply(reply))
+
+    def rejouer(self, evenements, repetitions=1):
+        parser = ofproto_v1_3_parser
+        ofproto = ofproto_v1_3
+        packet_ins = []
+        for dpid, in_port, trame in evenements:
+            datapath = self.datapaths[dpid]
+            msg = parser.OFPPacketIn(datapath, buffer_id=ofproto.OFP_NO_BUFFER, total_len=len(trame),
+                                     reason=ofproto.OFPR_NO_MATCH, table_id=0, cookie=0,
+                                     match=parser.OFPMatch(in_port=in_port), data=trame)
+            packet_ins.append(ofp_event.EventOFPPacketIn(msg))
+        handler = self.app.packet_in_handler
+        latences = []
+        debut = time.perf_counter()
+        for _ in range(repetitions):
+            for ev in packet_ins:
+                t0 = time.perf_counter_ns()
+                handler(ev)
+                latences.append(time.perf_counter_ns() - t0)
+        duree = time.perf_counter() - debut
+        return self.rapport(latences, duree)
+
+    @staticmethod
+    def percentile(valeurs_triees, q):
+        if not valeurs_triees:
+            return 0.0
+        index = min(len(valeurs_triees) - 1, int(round(q / 100.0 * (len(valeurs_triees) - 1))))
+        return valeurs_triees[index] / 1000.0
+
+    def rapport(self, latences, duree):
+        triees = sorted(latences)
+        return {
+            'controleur': self.chemin_controleur,
+            'packet_in': len(latences),
+            'duree_s': duree,
+            'packet_in_par_s': len(latences) / duree if duree else 0.0,
+            'latence_us': {
+                'moyenne': sum(triees) / len(triees) / 1000.0 if triees else 0.0,
+                'p50': self.percentile(triees, 50),
+                'p90': self.percentile(triees, 90),
+                'p99': self.percentile(triees, 99),
+                'max': triees[-1] / 1000.0 if triees else 0.0
+            },
+            'messages': {str(dpid): dict(dp.messages) for dpid, dp in self.datapaths.items()},
+            'octets_emis': sum(dp.octets for dp in self.datapaths.values())
+        }
+
+
+class Main:
+    @staticmethod
+    def main():
+        parser = argparse.ArgumentParser(description="Benchmark hors ligne d'un contrôleur Ryu par rejeu de packet-in.")
+        parser.add_argument('controleur', help="chemin du fichier contrôleur (d_controler_05_07_2024.py, controleur.py, ...)")
+        parser.add_argument('--config-file', help="fichier params.conf passé au contrôleur")
+        parser.add_argument('--pcap', help="capture pcap/pcapng à rejouer au lieu du trafic synthétique")
+        parser.add_argument('--connexions', type=int, default=20, help="connexions TCP par client (trafic synthétique)")
+        parser.add_argument('--repetitions', type=int, default=1, help="nombre de rejeux du flux de packet-in")
+        parser.add_argument('--sortie', help="fichier JSON où écrire le rapport")
+        parser.add_argument('--verbose', action='store_true', help="conserver les logs INFO du contrôleur")
+        args = parser.parse_args()
+        logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+        benchmark = ControllerBenchmark(args.controleur, args.config_file)
+        benchmark.connecter_switches()
+        if args.pcap:
+            evenements = TrafficGenerator.depuis_capture(args.pcap)
+        else:
+            evenements = TrafficGenerator(args.connexions).generer()
+        resultats = benchmark.rejouer(evenements, args.repetitions)
+
+        print(f"Contrôleur : {resultats['controleur']}")
+        print(f"{resultats['packet_in']} packet-in en {resultats['duree_s']:.3f}s : {resultats['packet_in_par_s']:.0f} packet-in/s")
+        latence = resultats['latence_us']
+        print(f"Latence (µs) : moyenne {latence['moyenne']:.1f}, p50 {latence['p50']:.1f}, p90 {latence['p90']:.1f}, p99 {latence['p99']:.1f}, max {latence['max']:.1f}")
+        for dpid, messages in resultats['messages'].items():
+            print(f"dpid {dpid} : {messages}")
+        if args.sortie:
+            with open(args.sortie, 'w') as f:
+                json.dump(resultats, f, indent=2)
+            print(f"Rapport écrit dans {args.sortie}")
+
+
+if __name__ == "__main__":
+    Main.main()
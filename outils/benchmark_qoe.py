@@ -0,0 +1,198 @@
+"""Benchmark hors ligne du calcul PSNR/SSIM (QoEMetricsCollector) sur des vidéos dégradées synthétiques.
+
+Les clips de référence sont produits avec la source de test testsrc2 de ffmpeg (h264 et h265,
+profils 240 et plus), puis dégradés de trois façons :
+    debit      ré-encodage à bas débit
+    gel        images figées (filtre freezeframes)
+    perte_ts   paquets TS de 188 octets supprimés aléatoirement dans un flux MPEG-TS
+
+Chaque comparaison référence/dégradée est mesurée pour chaque backend et chaque nombre de
+travailleurs en parallèle (comme les threads de QoEMetricsCollector.run) : durée et images/s.
+
+    python3 outils/benchmark_qoe.py --profil 240 --profil 720 --travailleurs 1 --travailleurs 4
+    python3 outils/benchmark_qoe.py --backend collecteur_ffmpeg --backend numpy
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from experiences import EXPERIENCE_DEFAUT, charger_classe
+
+PROFILS = {240: '426x240', 360: '640x360', 480: '854x480', 720: '1280x720', 1080: '1920x1080'}
+ENCODEURS = {'h264': 'libx264', 'h265': 'libx265'}
+DEGRADATIONS = ('debit', 'gel', 'perte_ts')
+TAILLE_PAQUET_TS = 188
+
+
+def ffmpeg(*arguments):
+    subprocess.run(['ffmpeg', '-y', '-loglevel', 'error'] + list(arguments), check=True)
+
+
+class ClipGenerator:
+    def __init__(self, repertoire, duree=10, images_par_s=25, perte_ts_pct=1.0, graine=0, image_cle_s=None):
+        self.repertoire = repertoire
+        self.duree = duree
+        self.images_par_s = images_par_s
+        self.perte_ts_pct = perte_ts_pct
+        self.graine = graine
+        # Intervalle entre images clés (comme les segments HLS servis) ; None : celui de l'encodeur
+        self.gop = ['-g', str(round(image_cle_s * images_par_s))] if image_cle_s else []
+        # Clips réutilisés d'une exécution à l'autre : durée et intervalle dans le nom
+        self.suffixe = f"_{duree}s" + (f"_g{self.gop[1]}" if self.gop else "")
+        os.makedirs(repertoire, exist_ok=True)
+
+    def reference(self, codec, profil):
+        chemin = os.path.join(self.repertoire, f"reference_{codec}_{profil}{self.suffixe}.mp4")
+        if not os.path.exists(chemin):
+            source = f"testsrc2=size={PROFILS[profil]}:rate={self.images_par_s}:duration={self.duree}"
+            ffmpeg('-f', 'lavfi', '-i', source, '-c:v', ENCODEURS[codec], *self.gop, '-pix_fmt', 'yuv420p', chemin)
+        return chemin
+
+    def degrader(self, reference, codec, profil, degradation):
+        base = os.path.join(self.repertoire, f"{degradation}_{codec}_{profil}{self.suffixe}")
+        if degradation == 'debit':
+            chemin = base + '.mp4'
+            if not os.path.exists(chemin):
+                ffmpeg('-i', reference, '-c:v', ENCODEURS[codec], *self.gop, '-b:v', f"{max(50, profil // 2)}k", chemin)
+        elif degradation == 'gel':
+            chemin = base + '.mp4'
+            if not os.path.exists(chemin):
+                # Fige un tiers de la vidéo sur l'image qui précède ; freezeframes prend l'image de
+                # remplacement dans sa deuxième entrée (ici la même vidéo)
+                premiere = self.duree * self.images_par_s // 3
+                derniere = 2 * premiere
+                ffmpeg('-i', reference, '-i', reference, '-filter_complex',
+                       f"[0:v][1:v]freezeframes=first={premiere}:last={derniere}:replace={premiere - 1}",
+                       '-c:v', ENCODEURS[codec], *self.gop, chemin)
+        elif degradation == 'perte_ts':
+            chemin = base + '.ts'
+            if not os.path.exists(chemin):
+                flux_ts = base + '_intact.ts'
+                ffmpeg('-i', reference, '-c', 'copy', '-f', 'mpegts', flux_ts)
+                self.supprimer_paquets_ts(flux_ts, chemin)
+                os.remove(flux_ts)
+        else:
+            raise ValueError(f"Dégradation inconnue : {degradation}")
+        return chemin
+
+    def supprimer_paquets_ts(self, source, destination):
+        rng = random.Random(self.graine)
+        with open(source, 'rb') as f:
+            donnees = f.read()
+        paquets = [donnees[i:i + TAILLE_PAQUET_TS] for i in range(0, len(donnees), TAILLE_PAQUET_TS)]
+        # Les premiers paquets (PAT/PMT) sont conservés pour que le flux reste décodable
+        gardes = paquets[:8] + [p for p in paquets[8:] if rng.random() * 100 >= self.perte_ts_pct]
+        with open(destination, 'wb') as f:
+            f.write(b''.join(gardes))
+
+    def corpus(self, codecs, profils, degradations):
+        comparaisons = []
+        for codec in codecs:
+            for profil in profils:
+                reference = self.reference(codec, profil)
+                for degradation in degradations:
+                    comparaisons.append({'codec': codec, 'profil': profil, 'degradation': degradation,
+                                         'reference': reference, 'degradee': self.degrader(reference, codec, profil, degradation)})
+        return comparaisons
+
+
+def backend_collecteur_ffmpeg(experience):
+    """calcul_psnr et calcul_ssim de QoEMetricsCollector : deux passes ffmpeg par comparaison."""
+    collecteur = charger_classe(os.path.join(experience, 'classe_2_experimentation.py'), 'QoEMetricsCollector')({}, None)
+
+    def calculer(reference, degradee):
+        return {'psnr': collecteur.calcul_psnr(reference, degradee), 'ssim': collecteur.calcul_ssim(reference, degradee)}
+    return calculer
+
+
+def backend_numpy(experience):
+    """qoe_numpy.calculer_qoe (BACKEND_QOE = "numpy") : un décodage rawvideo pour PSNR et SSIM, Y, U et V."""
+    from qoe_numpy import calculer_qoe
+
+    def calculer(reference, degradee):
+        resultat = calculer_qoe(reference, degradee, chroma=True)
+        return {'psnr': resultat['psnr'], 'ssim': resultat['ssim']}
+    return calculer
+
+
+# Backends PSNR/SSIM comparables : nom -> fabrique(experience) -> calculer(reference, degradee)
+BACKENDS = {
+    'collecteur_ffmpeg': backend_collecteur_ffmpeg,
+    'numpy': backend_numpy,
+}
+
+
+class QoEBenchmark:
+    def __init__(self, comparaisons, images, experience=EXPERIENCE_DEFAUT):
+        self.comparaisons = comparaisons
+        self.images = images
+        self.experience = os.path.abspath(experience)
+
+    def mesurer(self, calculer, comparaison):
+        debut = time.perf_counter()
+        try:
+            metriques = calculer(comparaison['reference'], comparaison['degradee'])
+            erreur = None
+        except (ValueError, subprocess.CalledProcessError) as e:
+            metriques, erreur = {}, str(e)
+        duree = time.perf_counter() - debut
+        return dict(comparaison, metriques=metriques, erreur=erreur, images=self.images, duree_s=duree,
+                    images_par_s=self.images / duree if duree else 0.0)
+
+    def run(self, backends, travailleurs):
+        reglages = []
+        for nom_backend in backends:
+            calculer = BACKENDS[nom_backend](self.experience)
+            for nombre in travailleurs:
+                debut = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=nombre) as executeur:
+                    resultats = list(executeur.map(lambda comparaison: self.mesurer(calculer, comparaison), self.comparaisons))
+                duree = time.perf_counter() - debut
+                images = self.images * len(resultats)
+                print(f"{nom_backend}, {nombre} travailleur(s) : {len(resultats)} comparaisons en {duree:.2f}s, {images / duree:.1f} images/s")
+                for resultat in resultats:
+                    print(f"    {resultat['codec']} {resultat['profil']} {resultat['degradation']} : {resultat['duree_s']:.2f}s, "
+                          f"{resultat['images_par_s']:.1f} images/s {resultat['metriques'] or resultat['erreur']}")
+                reglages.append({'backend': nom_backend, 'travailleurs': nombre, 'duree_s': duree,
+                                 'images_par_s': images / duree if duree else 0.0, 'comparaisons': resultats})
+        return {
+            'experience': self.experience,
+            'machine': {'python': platform.python_version(), 'systeme': platform.platform(), 'cpu': os.cpu_count()},
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'reglages': reglages,
+        }
+
+
+class Main:
+    @staticmethod
+    def main():
+        parser = argparse.ArgumentParser(description="Benchmark PSNR/SSIM sur des vidéos dégradées synthétiques.")
+        parser.add_argument('--repertoire', default='corpus_qoe', help="répertoire des clips générés (réutilisés s'ils existent)")
+        parser.add_argument('--codec', action='append', choices=sorted(ENCODEURS), help="codec (répétable)")
+        parser.add_argument('--profil', action='append', type=int, choices=sorted(PROFILS), help="profil vertical (répétable)")
+        parser.add_argument('--degradation', action='append', choices=DEGRADATIONS, help="dégradation (répétable)")
+        parser.add_argument('--duree', type=int, default=10, help="durée des clips en secondes")
+        parser.add_argument('--images-par-s', type=int, default=25)
+        parser.add_argument('--perte-ts', type=float, default=1.0, help="paquets TS supprimés (%%)")
+        parser.add_argument('--backend', action='append', choices=sorted(BACKENDS), help="backend à mesurer (répétable)")
+        parser.add_argument('--travailleurs', action='append', type=int, help="comparaisons en parallèle (répétable)")
+        parser.add_argument('--experience', default=EXPERIENCE_DEFAUT, help="répertoire d'expérience (classe_2_experimentation.py)")
+        parser.add_argument('--sortie', default='benchmark_qoe.json', help="fichier JSON des résultats")
+        args = parser.parse_args()
+
+        generateur = ClipGenerator(args.repertoire, args.duree, args.images_par_s, args.perte_ts)
+        comparaisons = generateur.corpus(args.codec or ['h264', 'h265'], args.profil or [240, 720], args.degradation or DEGRADATIONS)
+        benchmark = QoEBenchmark(comparaisons, args.duree * args.images_par_s, args.experience)
+        resultats = benchmark.run(args.backend or ['collecteur_ffmpeg'], args.travailleurs or [1, 4])
+        with open(args.sortie, 'w') as f:
+            json.dump(resultats, f, indent=2)
+        print(f"Résultats écrits dans {args.sortie}")
+
+
+if __name__ == "__main__":
+    Main.main()
@@ -0,0 +1,238 @@
+"""Benchmark hors ligne du calcul des métriques QoS sur un corpus de captures générées.
+
+Chaque unité (paire, valeur de perturbation) est calculée dans un processus séparé pour mesurer
+le temps, les paquets/s, les Mo/s et le pic de mémoire (RSS du processus Python et des
+processus enfants bash/tshark). Aucun Mininet ni droit root n'est nécessaire : la classe
+QoSMetricsCollector est extraite du fichier classe_2_experimentation.py sans l'importer.
+
+    python3 outils/generateur_pcapng.py --campagne loss --paires 2 --repertoire corpus_loss
+    python3 outils/benchmark_qos.py corpus_loss/files.txt --sortie benchmark_qos.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import resource
+import time
+import traceback
+
+from experiences import EXPERIENCE_DEFAUT, charger_classe
+from lecteur_pcapng import lire_paquets
+METRIQUES = ('bitrate', 'packet_loss', 'average_latency', 'average_jitter')
+# Durée maximale du calcul d'une unité, en secondes
+DELAI_UNITE_S = 600
+
+
+def backend_collecteur_bash(experience):
+    """QoSMetricsCollector de l'expérience avec son script bash_file/qos_script_calcul.sh (analyse_tcp.py)."""
+    collecteur = charger_classe(os.path.join(experience, 'classe_2_experimentation.py'), 'QoSMetricsCollector')
+    script = os.path.join(experience, 'bash_file', 'qos_script_calcul.sh')
+
+    def calculer(cle, valeur, chemin):
+        resultats = collecteur({cle: {valeur: chemin}}, script).run()
+        return {metrique: resultat[cle][valeur] for metrique, resultat in zip(METRIQUES, resultats)}
+    return calculer
+
+
+def backend_analyse_tcp(experience):
+    """AnalyseurTCP appelé dans le processus, sans passer par bash ni QoSMetricsCollector."""
+    from analyse_tcp import AnalyseurTCP
+
+    def calculer(cle, valeur, chemin):
+        serveur, client = cle.split('_')[:2]
+        resume = AnalyseurTCP(f"10.1.1.{serveur[1:]}", f"10.1.1.{client[1:]}").analyser(chemin)
+        return {'bitrate': resume['debit_mbps'], 'packet_loss': resume['perte_pct'],
+                'average_latency': resume['latence_ms'] / 1000, 'average_jitter': resume['gigue_ms'] / 1000}
+    return calculer
+
+
+# Backends de calcul QoS comparables : nom -> fabrique(experience) -> calculer(cle, valeur, chemin)
+BACKENDS = {
+    'collecteur_bash': backend_collecteur_bash,
+    'analyse_tcp': backend_analyse_tcp,
+}
+
+
+def lire_corpus(chemin_liste):
+    # Même format que files.txt : cle,valeur,chemin
+    corpus = []
+    with open(chemin_liste) as f:
+        for ligne in f:
+            ligne = ligne.strip()
+            if ligne:
+                cle, valeur, chemin = ligne.split(',', 2)
+                corpus.append((cle, int(valeur), chemin))
+    return corpus
+
+
+def lire_verite(chemin):
+    chemin_verite = chemin + '.verite.json'
+    if os.path.exists(chemin_verite):
+        with open(chemin_verite) as f:
+            return json.load(f)
+    return None
+
+
+def compter_paquets(chemin):
+    return sum(1 for _ in lire_paquets(chemin))
+
+
+def _executer_unite(nom_backend, experience, cle, valeur, chemin, file_resultats):
+    try:
+        calculer = BACKENDS[nom_backend](experience)
+        debut = time.perf_counter()
+        metriques = calculer(cle, valeur, chemin)
+        duree = time.perf_counter() - debut
+    except BaseException:
+        # La trace remonte au parent, qui signale l'unité en erreur au lieu d'attendre
+        file_resultats.put({'erreur': traceback.format_exc()})
+        raise SystemExit(1)
+    file_resultats.put({
+        'metriques': metriques,
+        'duree_s': duree,
+        'rss_max_ko': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'rss_max_enfants_ko': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    })
+
+
+class QoSBenchmark:
+    def __init__(self, corpus, experience=EXPERIENCE_DEFAUT, backends=('collecteur_bash',), repetitions=1, delai=DELAI_UNITE_S):
+        self.corpus = corpus
+        self.experience = os.path.abspath(experience)
+        self.backends = list(backends)
+        self.repetitions = repetitions
+        self.delai = delai
+
+    def mesurer(self, nom_backend, cle, valeur, chemin):
+        contexte = multiprocessing.get_context('fork')
+        file_resultats = contexte.Queue()
+        processus = contexte.Process(target=_executer_unite, args=(nom_backend, self.experience, cle, valeur, chemin, file_resultats))
+        debut = time.perf_counter()
+        processus.start()
+        mesure = self.attendre(processus, file_resultats)
+        processus.join()
+        if 'erreur' not in mesure and processus.exitcode != 0:
+            mesure = {'erreur': f"processus terminé avec le code {processus.exitcode}"}
+        mesure['duree_totale_s'] = time.perf_counter() - debut
+        return mesure
+
+    def attendre(self, processus, file_resultats):
+        # Résultat de l'unité, ou erreur si le processus meurt sans résultat ou dépasse le délai
+        fin = time.monotonic() + self.delai
+        while True:
+            try:
+                return file_resultats.get(timeout=0.5)
+            except queue.Empty:
+                pass
+            if not processus.is_alive():
+                try:
+                    return file_resultats.get(timeout=0.5)
+                except queue.Empty:
+                    return {'erreur': f"processus terminé sans résultat (code {processus.exitcode})"}
+            if time.monotonic() > fin:
+                processus.terminate()
+                return {'erreur': f"aucun résultat après {self.delai}s"}
+
+    def unite(self, nom_backend, cle, valeur, chemin):
+        verite = lire_verite(chemin)
+        paquets = verite['paquets'] if verite else compter_paquets(chemin)
+        taille = os.path.getsize(chemin)
+        mesures = [self.mesurer(nom_backend, cle, valeur, chemin) for _ in range(self.repetitions)]
+        erreurs = [mesure['erreur'] for mesure in mesures if 'erreur' in mesure]
+        if erreurs:
+            return {'backend': nom_backend, 'paire': cle, 'perturbation': valeur, 'fichier': chemin,
+                    'paquets': paquets, 'octets': taille, 'erreur': erreurs[-1]}
+        duree = min(mesure['duree_s'] for mesure in mesures)
+        resultat = {
+            'backend': nom_backend,
+            'paire': cle,
+            'perturbation': valeur,
+            'fichier': chemin,
+            'paquets': paquets,
+            'octets': taille,
+            'duree_s': duree,
+            'durees_s': [mesure['duree_s'] for mesure in mesures],
+            'paquets_par_s': paquets / duree if duree else 0.0,
+            'mo_par_s': taille / 1e6 / duree if duree else 0.0,
+            'rss_max_ko': max(mesure['rss_max_ko'] for mesure in mesures),
+            'rss_max_enfants_ko': max(mesure['rss_max_enfants_ko'] for mesure in mesures),
+            'metriques': mesures[-1]['metriques'],
+        }
+        if verite:
+            # Mêmes définitions et mêmes unités (Mbps, %, secondes) que les métriques calculées
+            resultat['verite'] = {'bitrate': verite['debit_mbps'], 'packet_loss': verite['perte_pct'],
+                                  'average_latency': verite['latence_ms'] / 1000, 'average_jitter': verite['gigue_ms'] / 1000}
+        return resultat
+
+    def run(self):
+        unites = []
+        debut = time.perf_counter()
+        for nom_backend in self.backends:
+            for cle, valeur, chemin in self.corpus:
+                resultat = self.unite(nom_backend, cle, valeur, chemin)
+                unites.append(resultat)
+                if 'erreur' in resultat:
+                    print(f"{nom_backend} {cle} {valeur} : erreur\n{resultat['erreur']}")
+                    continue
+                print(f"{nom_backend} {cle} {valeur} : {resultat['duree_s']:.3f}s, {resultat['paquets_par_s']:.0f} paquets/s, "
+                      f"{resultat['mo_par_s']:.1f} Mo/s, RSS {resultat['rss_max_ko']} ko (enfants {resultat['rss_max_enfants_ko']} ko)")
+        return {
+            'experience': self.experience,
+            'machine': {'python': platform.python_version(), 'systeme': platform.platform(), 'cpu': os.cpu_count()},
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'duree_totale_s': time.perf_counter() - debut,
+            'unites': unites,
+        }
+
+
+def comparer(resultats, reference, seuil):
+    """Affiche les unités dont le débit de traitement (paquets/s) a baissé de plus de seuil % par rapport à la référence."""
+    anciens = {(u['backend'], u['paire'], u['perturbation']): u for u in reference['unites']}
+    regressions = 0
+    for unite in resultats['unites']:
+        ancien = anciens.get((unite['backend'], unite['paire'], unite['perturbation']))
+        if 'erreur' in unite or not ancien or not ancien.get('paquets_par_s'):
+            continue
+        ecart = 100.0 * (unite['paquets_par_s'] / ancien['paquets_par_s'] - 1)
+        if ecart < -seuil:
+            regressions += 1
+            print(f"Régression {unite['backend']} {unite['paire']} {unite['perturbation']} : {ecart:.1f}% paquets/s")
+    return regressions
+
+
+class Main:
+    @staticmethod
+    def main():
+        parser = argparse.ArgumentParser(description="Benchmark hors ligne du calcul QoS sur un corpus de captures.")
+        parser.add_argument('corpus', help="liste des captures au format files.txt (cle,valeur,chemin)")
+        parser.add_argument('--experience', default=EXPERIENCE_DEFAUT, help="répertoire d'expérience (classe_2_experimentation.py, bash_file)")
+        parser.add_argument('--backend', action='append', choices=sorted(BACKENDS), help="backend à mesurer (répétable)")
+        parser.add_argument('--repetitions', type=int, default=1, help="mesures par unité (la plus rapide est retenue)")
+        parser.add_argument('--sortie', default='benchmark_qos.json', help="fichier JSON des résultats")
+        parser.add_argument('--reference', help="résultats JSON précédents à comparer")
+        parser.add_argument('--delai', type=float, default=DELAI_UNITE_S, help="durée maximale d'une unité en secondes")
+        parser.add_argument('--seuil', type=float, default=10.0, help="baisse de paquets/s (%%) signalée comme régression")
+        args = parser.parse_args()
+
+        benchmark = QoSBenchmark(lire_corpus(args.corpus), args.experience, args.backend or ['collecteur_bash'], args.repetitions,
+                                 args.delai)
+        resultats = benchmark.run()
+        with open(args.sortie, 'w') as f:
+            json.dump(resultats, f, indent=2)
+        print(f"Résultats écrits dans {args.sortie}")
+        echec = False
+        if args.reference:
+            with open(args.reference) as f:
+                reference = json.load(f)
+            echec = comparer(resultats, reference, args.seuil) > 0
+        erreurs = sum('erreur' in unite for unite in resultats['unites'])
+        if erreurs:
+            print(f"{erreurs} unité(s) en erreur")
+        if echec or erreurs:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    Main.main()
@@ -0,0 +1,150 @@
+"""Comparaison d'expériences depuis l'entrepôt de résultats : h264 contre h265, une vidéo contre plusieurs.
+
+Les résultats de 01_h264 / 02_h265 et de 02_une_video / 03_plusieurs_video sont dans des répertoires
+et des classeurs séparés ; ici les moyennes des deux modalités de l'axe comparé sont jointes sur
+(métrique, perturbation, valeur de perturbation, profil) et sur les colonnes que l'axe laisse fixes :
+    codec           configuration (une_video, plusieurs_video) et nombre d'hôtes
+    configuration   codec
+Chaque côté est la moyenne des paires du run le plus récent de chaque expérience. Tout est fait en
+colonnes numpy (codes de groupes par np.unique, sommes par np.bincount), sans boucle sur les runs.
+Sortie : écart (b - a), rapport (b / a) et écart relatif en % par point, en .xlsx ou .csv, et figures
+superposant a et b (traceur.py) avec --figures.
+
+    python3 outils/comparaison.py codec --profile 240 --sortie h264_h265.xlsx --figures comparaison_codec
+    python3 outils/comparaison.py configuration --a une_video --b plusieurs_video --codec h265
+"""
+import argparse
+import os
+
+import numpy as np
+
+from regression import ecrire_resultats
+from resultats import RACINE_RESULTATS, EntrepotResultats, cle_perturbation
+
+# Axe comparé : modalités a et b par défaut, colonnes fixes ajoutées à la clé de jointure
+AXES = {
+    'codec': ('h264', 'h265', ('configuration', 'nombre_hotes')),
+    'configuration': ('une_video', 'plusieurs_video', ('codec',)),
+}
+CLE = ('metrique', 'perturbation', 'valeur_perturbation', 'profile')
+MESURE = ('experience', 'metrique', 'perturbation', 'valeur_perturbation', 'profile', 'codec', 'nombre_hotes', 'paire')
+
+
+def configuration(experience):
+    # 02_une_video ou 03_plusieurs_video (03_plusieur_video pour la gigue)
+    return np.where(np.char.find(experience.astype(str), 'une_video') >= 0, 'une_video', 'plusieurs_video')
+
+
+def _codes(colonnes):
+    """Code de groupe entier (0 .. groupes - 1) de chaque ligne pour la combinaison des colonnes."""
+    code = np.zeros(len(colonnes[0]), dtype=np.int64)
+    for colonne in colonnes:
+        valeurs, inverse = np.unique(colonne, return_inverse=True)
+        code = np.unique(code * len(valeurs) + inverse, return_inverse=True)[1]
+    return code
+
+
+def comparer(lignes, axe, a=None, b=None):
+    """Colonnes de la comparaison (dict nom -> tableau numpy), une ligne par point présent des deux côtés."""
+    a_defaut, b_defaut, fixes = AXES[axe]
+    a, b = a or a_defaut, b or b_defaut
+    scalaires = np.isnan(lignes['temps_s'])
+    colonnes = {nom: lignes[nom][scalaires] for nom in MESURE + ('valeur', 'horodatage')}
+    colonnes['configuration'] = configuration(colonnes['experience'])
+    retenues = np.flatnonzero(np.isin(colonnes[axe], [a, b]))
+
+    # Le run le plus récent l'emporte pour chaque mesure (expérience, valeur, paire, ...)
+    mesures = _codes([colonnes[nom][retenues] for nom in MESURE])
+    ordre = np.argsort(colonnes['horodatage'][retenues], kind='stable')[::-1]
+    retenues = retenues[ordre[np.unique(mesures[ordre], return_index=True)[1]]]
+    colonnes = {nom: colonne[retenues] for nom, colonne in colonnes.items()}
+
+    # Moyenne de chaque côté sur les paires (et les expériences d'une même modalité)
+    cle = [colonnes[nom] for nom in CLE + fixes]
+    _, representants, groupes = np.unique(_codes(cle + [colonnes[axe]]), return_index=True, return_inverse=True)
+    paires = np.bincount(groupes)
+    moyennes = np.bincount(groupes, weights=colonnes['valeur']) / paires
+
+    # Jointure des deux côtés sur la clé
+    jointures = _codes([colonne[representants] for colonne in cle])
+    cote_b = colonnes[axe][representants] == b
+    valeurs = np.full((2, jointures.max() + 1 if len(jointures) else 0), np.nan)
+    nombres = np.zeros(valeurs.shape, dtype=np.int64)
+    valeurs[cote_b.astype(int), jointures] = moyennes
+    nombres[cote_b.astype(int), jointures] = paires
+    communs = np.flatnonzero(np.isfinite(valeurs).all(axis=0))
+    origine = representants[np.unique(jointures, return_index=True)[1]][communs]
+
+    resultat = {nom: colonnes[nom][origine] for nom in CLE + fixes}
+    valeur_a, valeur_b = valeurs[0, communs], valeurs[1, communs]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        resultat.update({a: valeur_a, b: valeur_b, 'ecart': valeur_b - valeur_a, 'rapport': valeur_b / valeur_a,
+                         'ecart_pct': 100 * (valeur_b - valeur_a) / np.abs(valeur_a),
+                         f'paires_{a}': nombres[0, communs], f'paires_{b}': nombres[1, communs]})
+    return resultat
+
+
+def lignes_comparaison(resultat):
+    """Dictionnaires par ligne (pour ecrire_resultats), dans l'ordre de la clé."""
+    noms = list(resultat)
+    lignes = [dict(zip(noms, ligne)) for ligne in zip(*(resultat[nom].tolist() for nom in noms))]
+    for ligne in lignes:
+        ligne['valeur_perturbation'] = cle_perturbation(ligne['valeur_perturbation'])
+    return lignes
+
+
+def traces_comparaison(resultat, axe, a, b, repertoire):
+    """Une figure par (métrique, perturbation, profil, colonnes fixes) : a et b superposés."""
+    from traceur import Trace
+
+    fixes = AXES[axe][2]
+    cle = [resultat[nom] for nom in ('metrique', 'perturbation', 'profile') + fixes]
+    codes = _codes(cle) if len(cle[0]) else np.zeros(0, dtype=np.int64)
+    traces = []
+    for groupe in np.unique(codes):
+        selection = np.flatnonzero(codes == groupe)
+        selection = selection[np.argsort(resultat['valeur_perturbation'][selection])]
+        metrique, perturbation, profile, *autres = (str(colonne[selection[0]]) for colonne in cle)
+        abscisses = resultat['valeur_perturbation'][selection]
+        suffixe = '_'.join([metrique, perturbation, profile] + autres)
+        traces.append(Trace(os.path.join(repertoire, f'{axe}_{suffixe}.png'),
+                            f'{metrique} : {perturbation}, {profile}p, {" ".join(autres)}', perturbation, metrique,
+                            [(a, abscisses, resultat[a][selection]), (b, abscisses, resultat[b][selection])], 'o'))
+    return traces
+
+
+class Main:
+    @staticmethod
+    def main():
+        parser = argparse.ArgumentParser(description="Comparaison de deux codecs ou de deux configurations, depuis l'entrepôt de résultats.")
+        parser.add_argument('axe', choices=sorted(AXES), help="codec (h264/h265) ou configuration (une_video/plusieurs_video)")
+        parser.add_argument('--a', help="modalité de référence (h264 ou une_video par défaut)")
+        parser.add_argument('--b', help="modalité comparée (h265 ou plusieurs_video par défaut)")
+        parser.add_argument('--racine', default=RACINE_RESULTATS, help="répertoire de l'entrepôt")
+        parser.add_argument('--sortie', default='comparaison.xlsx', help="fichier produit (.xlsx ou .csv)")
+        parser.add_argument('--figures', help="répertoire des figures superposées (aucune par défaut)")
+        parser.add_argument('--profile', type=int, action='append', help="profil vidéo (répétable)")
+        parser.add_argument('--perturbation', action='append', help="bande_passante, delay, loss (répétable)")
+        parser.add_argument('--codec', action='append', help="h264, h265 (répétable)")
+        parser.add_argument('--metrique', action='append', help="métrique (répétable, toutes par défaut)")
+        parser.add_argument('--travailleurs', type=int, help="processus de tracé (par défaut : nombre de cœurs)")
+        args = parser.parse_args()
+
+        a, b = args.a or AXES[args.axe][0], args.b or AXES[args.axe][1]
+        lignes = EntrepotResultats(args.racine).lire(profile=args.profile, perturbation=args.perturbation,
+                                                      codec=args.codec, metrique=args.metrique)
+        resultat = comparer(lignes, args.axe, a, b)
+        if not len(resultat['metrique']):
+            parser.error(f"aucun point commun à {a} et {b} dans {args.racine} pour ces filtres")
+        ecrire_resultats(lignes_comparaison(resultat), args.sortie, list(resultat))
+        message = f"{args.sortie} : {len(resultat['metrique'])} points {a} / {b}"
+        if args.figures:
+            from traceur import tracer_lot
+
+            os.makedirs(args.figures, exist_ok=True)
+            message += f", {len(tracer_lot(traces_comparaison(resultat, args.axe, a, b, args.figures), args.travailleurs))} figures"
+        print(message)
+
+
+if __name__ == "__main__":
+    Main.main()
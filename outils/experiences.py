@@ -0,0 +1,31 @@
+"""Accès aux expérimentations depuis les outils : racine du dépôt, expérience par défaut et chargement
+d'une classe d'un fichier classe_*_experimentation.py sans exécuter ses imports (mininet, openpyxl, ...)."""
+import ast
+import math
+import os
+import re
+import subprocess
+import threading
+import time
+from typing import Dict, List, Tuple
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXPERIENCE_DEFAUT = os.path.join(RACINE, '03_perte_paquet', '02_une_video', '01_h264')
+
+
+def charger_classe(chemin_fichier, nom_classe, **globales):
+    """Extrait une classe d'un fichier d'expérimentation sans exécuter ses imports (mininet, openpyxl, ...).
+
+    globales complète l'espace de noms de la classe (np, plt, openpyxl, ...) quand elle en a besoin.
+    """
+    with open(chemin_fichier) as f:
+        arbre = ast.parse(f.read(), chemin_fichier)
+    for noeud in arbre.body:
+        if isinstance(noeud, ast.ClassDef) and noeud.name == nom_classe:
+            module = ast.Module(body=[noeud], type_ignores=[])
+            espace = {'math': math, 'os': os, 're': re, 'subprocess': subprocess, 'threading': threading,
+                      'time': time, 'Dict': Dict, 'List': List, 'Tuple': Tuple}
+            espace.update(globales)
+            exec(compile(module, chemin_fichier, 'exec'), espace)
+            return espace[nom_classe]
+    raise ValueError(f"Classe {nom_classe} introuvable dans {chemin_fichier}")
@@ -0,0 +1,407 @@
+"""Génération de captures pcapng synthétiques de sessions HLS sur TCP, avec vérité terrain.
+
+Les captures imitent celles de VideoStreamingClient.start_streaming (tshark sur l'interface du client)
+entre hôtes 10.1.1.X, sans Mininet : débit vidéo, débit du lien, délai, gigue et perte sont contrôlés.
+Chaque capture est accompagnée d'un fichier <capture>.verite.json avec les valeurs réellement
+simulées, pour valider qos_script_calcul.sh ou tout autre calcul de métriques :
+    debit_mbps, perte_pct, latence_ms, gigue_ms   vérité dans les définitions de analyse_tcp.py
+        (trames du flux / durée ; segments de données retransmis reçus / segments de données reçus ;
+        RTT des segments du client, daté à l'ACK du serveur qui les acquitte exactement ; variation
+        moyenne des inter-arrivées des segments de données, hors pauses de plus de PAUSE_MAX)
+    perte_canal_pct, delai_canal_*, variation_delai_canal_ms   paramètres effectifs du canal simulé
+        (transmissions perdues, délai aller serveur -> client et sa variation d'un segment au
+        suivant), qui ne se mesurent pas directement sur une capture côté client
+
+Modèle : le serveur envoie chaque segment HLS (2 s de vidéo) au rythme du lien ; le chemin
+serveur -> client applique délai + gigue (loi normale, réordonnancement possible) et perte ;
+un segment perdu est retransmis (fast retransmit ou RTO) ; le client acquitte tous les deux
+segments et envoie un ACK dupliqué pour chaque segment hors séquence.
+
+    python3 outils/generateur_pcapng.py --perturbation loss --valeur 5 --sortie h1_h2.pcapng
+    python3 outils/generateur_pcapng.py --campagne loss --paires 8 --repertoire corpus_loss
+"""
+import argparse
+import heapq
+import io
+import json
+import os
+import random
+import socket
+import struct
+from collections import deque
+
+from analyse_tcp import PAUSE_MAX
+
+ETH_TYPE_IP = 0x0800
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_PSH = 0x08
+TCP_ACK = 0x10
+MSS = 1448
+ENTETES = 14 + 20 + 20
+DELAI_ACK = 0.00001
+
+# Balayages des expérimentations (VideoInput._PERTURBATION_NUMBERS / _JITTERS_NUMBERS)
+CAMPAGNES = {
+    'bande_passante': [24, 32, 48, 64, 80, 96],
+    'delay': [20, 50, 100, 200, 500, 1000],
+    'loss': [0, 2, 3, 5, 10, 15],
+}
+GIGUES_DELAY = {20: 2, 50: 5, 100: 10, 200: 20, 500: 50, 1000: 100}
+
+IPV4 = struct.Struct('!BBHHHBBH4s4s')
+TCP = struct.Struct('!HHIIBBHHH')
+EPB = struct.Struct('<IIIIIII')
+ZEROS = bytes(MSS)
+
+
+class PcapngWriter:
+    """Écriture pcapng en flux (SHB, une IDB Ethernet, puis des Enhanced Packet Blocks)."""
+    def __init__(self, chemin, snaplen=0, nom_interface='h2-eth0'):
+        self.fichier = io.open(chemin, 'wb', buffering=1 << 20)
+        self.snaplen = snaplen
+        self.octets = 0
+        self.paquets = 0
+        shb = struct.pack('<IHHq', 0x1A2B3C4D, 1, 0, -1)
+        self._bloc(0x0A0D0D0A, shb)
+        nom = nom_interface.encode() + b'\x00'
+        options = struct.pack('<HH', 2, len(nom)) + nom + bytes((-len(nom)) % 4) + struct.pack('<HH', 0, 0)
+        self._bloc(0x00000001, struct.pack('<HHI', 1, 0, snaplen) + options)
+
+    def _bloc(self, type_bloc, corps):
+        corps += bytes((-len(corps)) % 4)
+        longueur = len(corps) + 12
+        donnees = struct.pack('<II', type_bloc, longueur) + corps + struct.pack('<I', longueur)
+        self.fichier.write(donnees)
+        self.octets += len(donnees)
+
+    def ecrire(self, timestamp, trame):
+        longueur = len(trame)
+        if self.snaplen and longueur > self.snaplen:
+            trame = trame[:self.snaplen]
+        capturee = len(trame)
+        bourrage = (-capturee) % 4
+        longueur_bloc = 32 + capturee + bourrage
+        ts = int(round(timestamp * 1e6))
+        self.fichier.write(EPB.pack(6, longueur_bloc, 0, ts >> 32, ts & 0xFFFFFFFF, capturee, longueur))
+        self.fichier.write(trame)
+        self.fichier.write(ZEROS[:bourrage] + struct.pack('<I', longueur_bloc))
+        self.octets += longueur_bloc
+        self.paquets += 1
+
+    def close(self):
+        self.fichier.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SessionHLS:
+    def __init__(self, serveur, client, port_video, debit_video=2.0, debit_lien=16.0, delai_ms=0.0,
+                 gigue_ms=0.0, perte_pct=0.0, duree=30.0, duree_segment=2.0, debut=1.7e9, graine=0):
+        self.ip_serveur = socket.inet_aton(f"10.1.1.{serveur}")
+        self.ip_client = socket.inet_aton(f"10.1.1.{client}")
+        mac_serveur = bytes([0, 0, 0, 0, 0, serveur])
+        mac_client = bytes([0, 0, 0, 0, 0, client])
+        self.eth_descendant = mac_client + mac_serveur + struct.pack('!H', ETH_TYPE_IP)
+        self.eth_montant = mac_serveur + mac_client + struct.pack('!H', ETH_TYPE_IP)
+        self.port_video = port_video
+        self.port_client = 40000 + client
+        self.debit_video = debit_video
+        self.debit_lien = debit_lien
+        self.delai = delai_ms / 1000.0
+        self.gigue = gigue_ms / 1000.0
+        self.perte = perte_pct / 100.0
+        self.duree = duree
+        self.duree_segment = duree_segment
+        self.debut = debut
+        self.rng = random.Random(graine)
+        self.tx = (MSS + ENTETES) * 8 / (debit_lien * 1e6)
+        self._compteur = 0
+        self.capture = []
+        self.retransmissions = []
+        self.seq_client = 1000
+        self.rcv_nxt = 5001
+        self.hors_sequence = {}
+        self.non_acquittes = 0
+        # Identifiants IP attribués à l'envoi : un segment réordonné garde l'identifiant de son rang d'envoi
+        self.id_serveur = 0
+        self.id_client = 0
+        self.verite = {
+            'transmissions': 0, 'perdus': 0, 'retransmissions_recues': 0, 'segments_donnees': 0,
+            'octets_utiles': 0, 'somme_delais': 0.0, 'somme_carres_delais': 0.0, 'delais': 0,
+            'somme_gigue': 0.0, 'gigues': 0, 'dernier_delai': None,
+            'octets_trames': 0, 'paquets': 0, 'premier': None, 'dernier': None,
+            # Vérité dans les définitions de analyse_tcp.py, relevée sur les trames capturées
+            'segments_recus': 0, 'somme_gigue_arrivees': 0.0, 'gigues_arrivees': 0,
+            'derniere_arrivee': None, 'derniere_interarrivee': None, 'somme_rtt': 0.0, 'rtts': 0,
+        }
+        # Segments du client (SYN, GET, FIN) non encore acquittés : (fin de séquence, instant de capture)
+        self.requetes = deque()
+
+    def _pousser(self, temps, evenement):
+        self._compteur += 1
+        heapq.heappush(self.capture, (temps, self._compteur, evenement))
+
+    def _id_serveur(self):
+        self.id_serveur = (self.id_serveur + 1) & 0xFFFF
+        return self.id_serveur
+
+    def _trame(self, descendant, seq, ack, flags, taille, id_ip=None):
+        if descendant:
+            ip = IPV4.pack(0x45, 0, 40 + taille, id_ip if id_ip is not None else self._id_serveur(), 0x4000, 64, 6, 0, self.ip_serveur, self.ip_client)
+            tcp = TCP.pack(self.port_video, self.port_client, seq & 0xFFFFFFFF, ack, 5 << 4, flags, 65535, 0, 0)
+            return self.eth_descendant + ip + tcp + ZEROS[:taille]
+        self.id_client = (self.id_client + 1) & 0xFFFF
+        ip = IPV4.pack(0x45, 0, 40 + taille, self.id_client, 0x4000, 64, 6, 0, self.ip_client, self.ip_serveur)
+        tcp = TCP.pack(self.port_client, self.port_video, seq, ack & 0xFFFFFFFF, 5 << 4, flags, 65535, 0, 0)
+        return self.eth_montant + ip + tcp + ZEROS[:taille]
+
+    def _transmettre(self, temps, seq, taille, retransmission, restants):
+        verite = self.verite
+        verite['transmissions'] += 1
+        id_ip = self._id_serveur()
+        if self.rng.random() < self.perte:
+            verite['perdus'] += 1
+            if restants >= 3:
+                attente = 2 * self.delai + 4 * self.tx
+            else:
+                attente = max(0.2, 4 * self.delai)
+            heapq.heappush(self.retransmissions, (temps + attente, seq, taille))
+            return
+        delai = max(0.0, self.rng.gauss(self.delai, self.gigue)) if self.gigue else self.delai
+        verite['somme_delais'] += delai
+        verite['somme_carres_delais'] += delai * delai
+        verite['delais'] += 1
+        if verite['dernier_delai'] is not None:
+            verite['somme_gigue'] += abs(delai - verite['dernier_delai'])
+            verite['gigues'] += 1
+        verite['dernier_delai'] = delai
+        self._pousser(temps + delai, ('donnees', seq, taille, retransmission, id_ip, self.seq_client))
+
+    def _recevoir(self, temps, seq, taille, retransmission):
+        if retransmission:
+            self.verite['retransmissions_recues'] += 1
+        fin = seq + taille
+        immediat = False
+        if seq == self.rcv_nxt:
+            immediat = bool(self.hors_sequence)
+            self.rcv_nxt = fin
+            while self.rcv_nxt in self.hors_sequence:
+                self.rcv_nxt = self.hors_sequence.pop(self.rcv_nxt)
+            self.non_acquittes += 1
+        elif seq > self.rcv_nxt:
+            self.hors_sequence[seq] = fin
+            immediat = True
+        else:
+            immediat = True
+        if immediat or self.non_acquittes >= 2:
+            self.non_acquittes = 0
+            self._pousser(temps + DELAI_ACK, ('montant', self.seq_client, self.rcv_nxt, TCP_ACK, 0))
+
+    def _arrivee_donnees(self, capture):
+        verite = self.verite
+        verite['segments_recus'] += 1
+        if verite['derniere_arrivee'] is not None:
+            interarrivee = capture - verite['derniere_arrivee']
+            if interarrivee > PAUSE_MAX:
+                interarrivee = None
+            elif verite['derniere_interarrivee'] is not None:
+                verite['somme_gigue_arrivees'] += abs(interarrivee - verite['derniere_interarrivee'])
+                verite['gigues_arrivees'] += 1
+            verite['derniere_interarrivee'] = interarrivee
+        verite['derniere_arrivee'] = capture
+
+    def _acquittement_serveur(self, capture, ack):
+        # Le client ne retransmet jamais : l'ACK égal à la fin d'une requête donne son RTT, les requêtes
+        # antérieures sont acquittées cumulativement sans échantillon
+        while self.requetes and self.requetes[0][0] <= ack:
+            fin, emission = self.requetes.popleft()
+            if fin == ack:
+                self.verite['somme_rtt'] += capture - emission
+                self.verite['rtts'] += 1
+
+    def _vider(self, limite, sortie):
+        verite = self.verite
+        while self.capture and self.capture[0][0] <= limite:
+            temps, _, evenement = heapq.heappop(self.capture)
+            # Instant tel qu'il est écrit dans la capture (microsecondes)
+            capture = int(round(temps * 1e6)) * 1e-6
+            if evenement[0] == 'donnees':
+                _, seq, taille, retransmission, id_ip, ack = evenement
+                trame = self._trame(True, seq, ack, TCP_ACK | TCP_PSH, taille, id_ip)
+                self._recevoir(temps, seq, taille, retransmission)
+                self._acquittement_serveur(capture, ack)
+                self._arrivee_donnees(capture)
+            elif evenement[0] == 'montant':
+                _, seq, ack, flags, taille = evenement
+                trame = self._trame(False, seq, ack, flags, taille)
+                longueur_seq = taille + (1 if flags & TCP_SYN else 0) + (1 if flags & TCP_FIN else 0)
+                if longueur_seq:
+                    self.requetes.append((seq + longueur_seq, capture))
+            else:
+                _, seq, ack, flags, taille = evenement
+                trame = self._trame(True, seq, ack, flags, taille)
+                if flags & TCP_ACK:
+                    self._acquittement_serveur(capture, ack)
+            if verite['premier'] is None:
+                verite['premier'] = temps
+            verite['dernier'] = temps
+            verite['octets_trames'] += len(trame)
+            verite['paquets'] += 1
+            sortie(temps, trame)
+
+    def _retransmettre_avant(self, limite):
+        while self.retransmissions and self.retransmissions[0][0] <= limite:
+            temps, seq, taille = heapq.heappop(self.retransmissions)
+            self._transmettre(temps, seq, taille, True, 0)
+
+    def generer(self, sortie, limite_octets=None):
+        """Appelle sortie(timestamp, trame) pour chaque paquet capturé, dans l'ordre des timestamps."""
+        t = self.debut
+        # Établissement de la connexion
+        self._pousser(t, ('montant', 999, 0, TCP_SYN, 0))
+        self._pousser(t + self.delai, ('descendant', 5000, 1000, TCP_SYN | TCP_ACK, 0))
+        self._pousser(t + self.delai + DELAI_ACK, ('montant', 1000, 5001, TCP_ACK, 0))
+        seq_serveur = 5001
+        envoi = t + self.delai
+        octets_segment = int(self.debit_video * 1e6 * self.duree_segment / 8)
+        nombre_segments = max(1, int(self.duree / self.duree_segment))
+        for segment in range(nombre_segments):
+            debut_segment = t + self.delai + segment * self.duree_segment
+            # Requête GET du client pour le segment suivant
+            self._vider(debut_segment, sortie)
+            self._pousser(debut_segment, ('montant', self.seq_client, self.rcv_nxt, TCP_ACK | TCP_PSH, 120))
+            self.seq_client += 120
+            envoi = max(envoi, debut_segment)
+            restant = octets_segment
+            nombre_paquets = (octets_segment + MSS - 1) // MSS
+            for index in range(nombre_paquets):
+                taille = min(MSS, restant)
+                restant -= taille
+                self._retransmettre_avant(envoi)
+                self._vider(envoi, sortie)
+                self._transmettre(envoi, seq_serveur, taille, False, nombre_paquets - index - 1)
+                self.verite['segments_donnees'] += 1
+                self.verite['octets_utiles'] += taille
+                seq_serveur += taille
+                envoi += (taille + ENTETES) * 8 / (self.debit_lien * 1e6)
+            if limite_octets is not None and self.verite['octets_trames'] >= limite_octets:
+                break
+        while self.retransmissions:
+            self._retransmettre_avant(self.retransmissions[0][0])
+            self._vider(self.retransmissions[0][0] if self.retransmissions else float('inf'), sortie)
+        self._vider(float('inf'), sortie)
+        fin = self.verite['dernier'] + DELAI_ACK
+        self._pousser(fin, ('montant', self.seq_client, self.rcv_nxt, TCP_FIN | TCP_ACK, 0))
+        self._vider(float('inf'), sortie)
+        return self.resume()
+
+    def resume(self):
+        verite = self.verite
+        duree = (verite['dernier'] or 0) - (verite['premier'] or 0)
+        delais = verite['delais']
+        moyenne = verite['somme_delais'] / delais if delais else 0.0
+        variance = max(0.0, verite['somme_carres_delais'] / delais - moyenne * moyenne) if delais else 0.0
+        return {
+            'parametres': {
+                'debit_video_mbps': self.debit_video, 'debit_lien_mbps': self.debit_lien,
+                'delai_ms': self.delai * 1000, 'gigue_ms': self.gigue * 1000, 'perte_pct': self.perte * 100,
+                'duree_s': self.duree, 'duree_segment_s': self.duree_segment,
+            },
+            'paquets': verite['paquets'],
+            'octets_trames': verite['octets_trames'],
+            'duree_capture_s': duree,
+            'debit_mbps': verite['octets_trames'] * 8 / (duree * 1e6) if duree else 0.0,
+            'debit_utile_mbps': verite['octets_utiles'] * 8 / (duree * 1e6) if duree else 0.0,
+            'segments_donnees': verite['segments_donnees'],
+            'segments_recus': verite['segments_recus'],
+            'retransmissions': verite['retransmissions_recues'],
+            'perte_pct': 100.0 * verite['retransmissions_recues'] / verite['segments_recus'] if verite['segments_recus'] else 0.0,
+            'latence_ms': 1000 * verite['somme_rtt'] / verite['rtts'] if verite['rtts'] else 0.0,
+            'gigue_ms': 1000 * verite['somme_gigue_arrivees'] / verite['gigues_arrivees'] if verite['gigues_arrivees'] else 0.0,
+            'transmissions': verite['transmissions'],
+            'paquets_perdus': verite['perdus'],
+            'perte_canal_pct': 100.0 * verite['perdus'] / verite['transmissions'] if verite['transmissions'] else 0.0,
+            'delai_canal_moyen_ms': moyenne * 1000,
+            'delai_canal_ecart_type_ms': variance ** 0.5 * 1000,
+            'variation_delai_canal_ms': verite['somme_gigue'] / verite['gigues'] * 1000 if verite['gigues'] else 0.0,
+        }
+
+
+def parametres_perturbation(perturbation, valeur, debit_lien=16.0):
+    if perturbation == 'bande_passante':
+        return {'debit_lien': float(valeur)}
+    if perturbation == 'delay':
+        return {'debit_lien': debit_lien, 'delai_ms': float(valeur), 'gigue_ms': float(GIGUES_DELAY.get(valeur, 0))}
+    if perturbation == 'loss':
+        return {'debit_lien': debit_lien, 'perte_pct': float(valeur)}
+    raise ValueError(f"Perturbation inconnue : {perturbation}")
+
+
+def generer_capture(chemin, serveur, client, port_video, snaplen=0, limite_octets=None, **parametres):
+    session = SessionHLS(serveur, client, port_video, **parametres)
+    with PcapngWriter(chemin, snaplen, f"h{client}-eth0") as writer:
+        verite = session.generer(writer.ecrire, limite_octets)
+    verite['fichier'] = os.path.abspath(chemin)
+    verite['octets_fichier'] = writer.octets
+    with open(chemin + '.verite.json', 'w') as f:
+        json.dump(verite, f, indent=2)
+    return verite
+
+
+class Main:
+    @staticmethod
+    def main():
+        parser = argparse.ArgumentParser(description="Génère des captures pcapng HLS/TCP synthétiques avec vérité terrain.")
+        parser.add_argument('--perturbation', choices=sorted(CAMPAGNES), help="type de perturbation de l'expérience")
+        parser.add_argument('--valeur', type=float, default=0, help="valeur de la perturbation (Mbps, ms ou %%)")
+        parser.add_argument('--campagne', choices=sorted(CAMPAGNES), help="génère tout le balayage de la perturbation")
+        parser.add_argument('--paires', type=int, default=1, help="nombre de paires serveur/client (1 à 8)")
+        parser.add_argument('--repertoire', default='corpus_pcapng', help="répertoire de sortie (mode campagne)")
+        parser.add_argument('--sortie', default='h1_h2.pcapng', help="fichier de sortie (mode simple)")
+        parser.add_argument('--debit-video', type=float, default=2.0, help="débit vidéo en Mbps")
+        parser.add_argument('--debit-lien', type=float, default=16.0, help="débit du lien en Mbps")
+        parser.add_argument('--delai', type=float, default=0.0, help="délai en ms")
+        parser.add_argument('--gigue', type=float, default=0.0, help="gigue en ms")
+        parser.add_argument('--perte', type=float, default=0.0, help="perte en %%")
+        parser.add_argument('--duree', type=float, default=30.0, help="durée de streaming en secondes")
+        parser.add_argument('--taille-max', type=float, help="arrête la génération au-delà de cette taille (Mo)")
+        parser.add_argument('--snaplen', type=int, default=0, help="tronque les trames capturées (0 = trames complètes)")
+        parser.add_argument('--codec', default='h264')
+        parser.add_argument('--graine', type=int, default=0)
+        args = parser.parse_args()
+
+        limite = int(args.taille_max * 1e6) if args.taille_max else None
+        base = {'debit_video': args.debit_video, 'duree': args.duree}
+        if args.campagne:
+            lignes = []
+            nombre_hotes = 2 * args.paires
+            for valeur in CAMPAGNES[args.campagne]:
+                for paire in range(args.paires):
+                    serveur, client = 2 * paire + 1, 2 * paire + 2
+                    cle = f"h{serveur}_h{client}"
+                    repertoire = os.path.join(args.repertoire, f"end_exp_{args.campagne}_{valeur}")
+                    os.makedirs(repertoire, exist_ok=True)
+                    chemin = os.path.join(repertoire, f"{cle}_bbb_{args.codec}_hls_hotes_{nombre_hotes}_{args.campagne}_{valeur}.pcapng")
+                    parametres = dict(base, **parametres_perturbation(args.campagne, valeur, args.debit_lien))
+                    verite = generer_capture(chemin, serveur, client, 5000 + 1000 * paire, args.snaplen, limite,
+                                             graine=args.graine + 1000 * valeur + paire, **parametres)
+                    lignes.append(f"{cle},{valeur},{os.path.abspath(chemin)}")
+                    print(f"{chemin} : {verite['paquets']} paquets, {verite['octets_fichier'] / 1e6:.1f} Mo")
+            # Même format que files.txt, lu par DataOrganizer.read_data_from_files
+            with open(os.path.join(args.repertoire, 'files.txt'), 'w') as f:
+                f.write('\n'.join(lignes) + '\n')
+        else:
+            parametres = dict(base, debit_lien=args.debit_lien, delai_ms=args.delai, gigue_ms=args.gigue, perte_pct=args.perte)
+            if args.perturbation:
+                parametres.update(parametres_perturbation(args.perturbation, args.valeur, args.debit_lien))
+            verite = generer_capture(args.sortie, 1, 2, 5000, args.snaplen, limite, graine=args.graine, **parametres)
+            print(json.dumps(verite, indent=2))
+
+
+if __name__ == "__main__":
+    Main.main()
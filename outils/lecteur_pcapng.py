@@ -0,0 +1,163 @@
+"""Lecture des captures pcapng (et pcap classiques) sans tshark, depuis un fichier ou un pipe."""
+import struct
+import sys
+from collections import namedtuple
+
+Paquet = namedtuple('Paquet', ['timestamp', 'interface', 'longueur', 'donnees'])
+SegmentTCP = namedtuple('SegmentTCP', ['ip_src', 'ip_dst', 'id_ip', 'port_src', 'port_dst', 'seq', 'ack', 'flags', 'charge', 'fenetre'])
+
+TYPE_SHB = b'\x0a\x0d\x0d\x0a'
+BLOC_IDB = 0x00000001
+BLOC_SPB = 0x00000003
+BLOC_EPB = 0x00000006
+MAGIC_ORDRE_OCTETS = 0x1A2B3C4D
+OPTION_TSRESOL = 9
+ETH_TYPE_IP = 0x0800
+IP_PROTO_TCP = 6
+
+ETH_TYPE = struct.Struct('!H')
+ENTETE_IPV4 = struct.Struct('!BxHH2xBB2x4s4s')
+ENTETE_TCP = struct.Struct('!HHIIBBH')
+
+MAGIC_PCAP = {
+    b'\xd4\xc3\xb2\xa1': ('<', 1e-6), b'\xa1\xb2\xc3\xd4': ('>', 1e-6),
+    b'\x4d\x3c\xb2\xa1': ('<', 1e-9), b'\xa1\xb2\x3c\x4d': ('>', 1e-9),
+}
+
+
+class PcapngReader:
+    def __init__(self, flux):
+        self.flux = flux
+        self.ordre = '<'
+        # Par interface : (linktype, snaplen, résolution des timestamps en secondes)
+        self.interfaces = []
+
+    @classmethod
+    def ouvrir(cls, chemin):
+        return cls(open(chemin, 'rb'))
+
+    def close(self):
+        self.flux.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _lire(self, taille):
+        donnees = self.flux.read(taille)
+        while len(donnees) < taille:
+            suite = self.flux.read(taille - len(donnees))
+            if not suite:
+                return None
+            donnees += suite
+        return donnees
+
+    def __iter__(self):
+        debut = self._lire(4)
+        if debut is None:
+            return
+        if debut in MAGIC_PCAP:
+            yield from self._lire_pcap(debut)
+        elif debut == TYPE_SHB:
+            yield from self._lire_pcapng(debut)
+        else:
+            raise ValueError("Format de capture inconnu (ni pcapng ni pcap).")
+
+    def _lire_pcap(self, magic):
+        ordre, resolution = MAGIC_PCAP[magic]
+        entete = self._lire(20)
+        if entete is None:
+            return
+        snaplen, linktype = struct.unpack(ordre + 'HHiIII', entete)[4:]
+        self.interfaces = [(linktype, snaplen, resolution)]
+        enregistrement = struct.Struct(ordre + 'IIII')
+        while True:
+            entete = self._lire(16)
+            if entete is None:
+                return
+            secondes, fraction, longueur_capturee, longueur = enregistrement.unpack(entete)
+            donnees = self._lire(longueur_capturee)
+            if donnees is None:
+                return
+            yield Paquet(secondes + fraction * resolution, 0, longueur, donnees)
+
+    def _lire_pcapng(self, type_brut):
+        while True:
+            if type_brut is None:
+                type_brut = self._lire(4)
+                if type_brut is None:
+                    return
+            longueur_brute = self._lire(4)
+            if longueur_brute is None:
+                return
+            if type_brut == TYPE_SHB:
+                # Chaque section donne son ordre des octets par le magic qui suit la longueur
+                magic = self._lire(4)
+                if magic is None:
+                    return
+                self.ordre = '<' if struct.unpack('<I', magic)[0] == MAGIC_ORDRE_OCTETS else '>'
+                longueur_bloc = struct.unpack(self.ordre + 'I', longueur_brute)[0]
+                if self._lire(longueur_bloc - 12) is None:
+                    return
+                self.interfaces = []
+                type_brut = None
+                continue
+            type_bloc = struct.unpack(self.ordre + 'I', type_brut)[0]
+            longueur_bloc = struct.unpack(self.ordre + 'I', longueur_brute)[0]
+            corps = self._lire(longueur_bloc - 8)
+            if corps is None:
+                return
+            if type_bloc == BLOC_EPB:
+                interface, ts_haut, ts_bas, longueur_capturee, longueur = struct.unpack_from(self.ordre + 'IIIII', corps, 0)
+                resolution = self.interfaces[interface][2] if interface < len(self.interfaces) else 1e-6
+                yield Paquet(((ts_haut << 32) | ts_bas) * resolution, interface, longueur, corps[20:20 + longueur_capturee])
+            elif type_bloc == BLOC_SPB:
+                longueur = struct.unpack_from(self.ordre + 'I', corps, 0)[0]
+                snaplen = self.interfaces[0][1] if self.interfaces else 0
+                longueur_capturee = min(longueur, snaplen) if snaplen else longueur
+                yield Paquet(None, 0, longueur, corps[4:4 + longueur_capturee])
+            elif type_bloc == BLOC_IDB:
+                self.interfaces.append(self._lire_interface(corps))
+            type_brut = None
+
+    def _lire_interface(self, corps):
+        linktype, _, snaplen = struct.unpack_from(self.ordre + 'HHI', corps, 0)
+        resolution = 1e-6
+        position = 8
+        while position + 4 <= len(corps) - 4:
+            code, longueur = struct.unpack_from(self.ordre + 'HH', corps, position)
+            if code == 0:
+                break
+            if code == OPTION_TSRESOL:
+                valeur = corps[position + 4]
+                resolution = 2.0 ** -(valeur & 0x7F) if valeur & 0x80 else 10.0 ** -valeur
+            position += 4 + ((longueur + 3) & ~3)
+        return (linktype, snaplen, resolution)
+
+
+def lire_paquets(source):
+    """Itère sur les paquets d'un chemin de fichier, d'un flux binaire ou de '-' (entrée standard)."""
+    if source == '-':
+        yield from PcapngReader(sys.stdin.buffer)
+    elif isinstance(source, str):
+        with PcapngReader.ouvrir(source) as lecteur:
+            yield from lecteur
+    else:
+        yield from PcapngReader(source)
+
+
+def decoder_tcp(donnees):
+    """En-têtes Ethernet/IPv4/TCP d'une trame (éventuellement tronquée par snaplen), ou None."""
+    if len(donnees) < 54 or ETH_TYPE.unpack_from(donnees, 12)[0] != ETH_TYPE_IP:
+        return None
+    version_ihl, longueur_totale, id_ip, _, protocole, ip_src, ip_dst = ENTETE_IPV4.unpack_from(donnees, 14)
+    if protocole != IP_PROTO_TCP:
+        return None
+    debut_tcp = 14 + (version_ihl & 0x0F) * 4
+    if len(donnees) < debut_tcp + 16:
+        return None
+    port_src, port_dst, seq, ack, decalage, flags, fenetre = ENTETE_TCP.unpack_from(donnees, debut_tcp)
+    charge = longueur_totale - (version_ihl & 0x0F) * 4 - (decalage >> 4) * 4
+    return SegmentTCP(ip_src, ip_dst, id_ip, port_src, port_dst, seq, ack, flags, charge, fenetre)
@@ -0,0 +1,301 @@
+"""PSNR et SSIM calculés en numpy sur les images décodées, sans analyser la sortie texte de ffmpeg.
+
+ffmpeg décode la référence et la vidéo reçue en yuv420p brut (-f rawvideo) dans des tubes ; les images
+sont lues par lots dans des tampons numpy alloués une fois, et PSNR et SSIM sont calculés pour tout un
+lot par opération de tableau :
+    PSNR   comme le filtre psnr de ffmpeg : EQM des plans Y, U, V pondérée par leur nombre de pixels ;
+           la valeur globale (« average: ») vient de la moyenne des EQM sur les images.
+    SSIM   fenêtre gaussienne 11x11, sigma 1,5 (Wang et al. 2004), filtrage séparable sur la
+           luminance, et sur U et V avec chroma=True (moyenne 4:1:1 comme « All: »). Le filtre ssim de
+           ffmpeg travaille par blocs 8x8 : les valeurs sont proches mais pas identiques.
+Les deux vidéos sont comparées image par image jusqu'à la fin de la plus courte ; la vidéo reçue est
+mise aux dimensions de la référence si elles diffèrent. Un seul décodage sert aux deux métriques et
+les valeurs par image sont rendues avec leur instant. Avec travailleurs > 1, les images sont découpées
+en plages contiguës, une paire de décodeurs par plage (positionnement -ss exact de ffmpeg).
+pas_images, reduction et fenetre_s reprennent l'aperçu de QoEMetricsCollector (apercu_qoe.py) : les
+fenêtres comparées sont des plages, et les images qui les séparent ne sont pas décodées.
+
+    python3 outils/qoe_numpy.py file_video_serveur_h264/bbb.mp4 video_client.mp4 --chroma --travailleurs 4 --sortie images.npz
+"""
+import argparse
+import json
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+
+import numpy as np
+
+# Pixels de luminance par lot, entre 1 et IMAGES_PAR_LOT images : les tampons SSIM d'un lot restent dans le
+# cache (mesuré sur un cœur : 1 image par lot en 240p est 2x plus rapide que 32, 10 images de 106x60 3x plus que 1)
+PIXELS_PAR_LOT = 64_000
+IMAGES_PAR_LOT = 32
+FENETRE = 11
+SIGMA = 1.5
+C1 = (0.01 * 255) ** 2
+C2 = (0.03 * 255) ** 2
+# PSNR donné à des images identiques (EQM nulle) au lieu de l'infini, pour que les séries restent exportables
+PSNR_MAX = 100.0
+
+
+def noyau_gaussien(taille=FENETRE, sigma=SIGMA):
+    x = np.arange(taille) - (taille - 1) / 2
+    noyau = np.exp(-x ** 2 / (2 * sigma ** 2))
+    return (noyau / noyau.sum()).astype(np.float32)
+
+
+def proprietes(chemin):
+    """(largeur, hauteur, images par seconde, nombre d'images) du premier flux vidéo (ffprobe)."""
+    sortie = subprocess.run(['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-count_packets', '-show_entries',
+                             'stream=width,height,r_frame_rate,nb_read_packets', '-of', 'json', chemin],
+                            capture_output=True, text=True, check=True)
+    flux = json.loads(sortie.stdout).get('streams')
+    if not flux:
+        raise ValueError(f"Pas de flux vidéo dans {chemin}.")
+    flux = flux[0]
+    return int(flux['width']), int(flux['height']), float(Fraction(flux['r_frame_rate'])), int(flux.get('nb_read_packets', 0))
+
+
+def taille_reduite(largeur, hauteur, reduction):
+    # Même arrondi que scale=trunc(iw/K/2)*2:trunc(ih/K/2)*2 de QoEMetricsCollector.filtre_qoe
+    return largeur // (2 * reduction) * 2, hauteur // (2 * reduction) * 2
+
+
+def commande_decodage(chemin, debut_s=0.0, images=None, filtre=None):
+    commande = ['ffmpeg', '-v', 'error', '-nostdin']
+    if debut_s > 0:
+        commande += ['-ss', f'{debut_s:.6f}']
+    commande += ['-i', chemin, '-map', '0:v:0']
+    if filtre:
+        commande += ['-vf', filtre]
+    if images is not None:
+        commande += ['-frames:v', str(images)]
+    return commande + ['-f', 'rawvideo', '-pix_fmt', 'yuv420p', '-']
+
+
+class DecodeurYUV:
+    """Images yuv420p brutes lues dans la sortie d'un processus de décodage."""
+
+    def __init__(self, commande, taille_image):
+        self.taille_image = taille_image
+        self.processus = subprocess.Popen(commande, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def lire(self, tampon):
+        """Remplit tampon (images, taille_image) et rend le nombre d'images complètes lues (moins en fin de vidéo)."""
+        vue = memoryview(tampon.reshape(-1))
+        lus = 0
+        while lus < len(vue):
+            nombre = self.processus.stdout.readinto(vue[lus:])
+            if not nombre:
+                break
+            lus += nombre
+        return lus // self.taille_image
+
+    def fermer(self):
+        self.processus.stdout.close()
+        self.processus.kill()
+        self.processus.wait()
+
+
+class FenetreGaussienne:
+    """SSIM par image de plans (lot, hauteur, largeur) ; tampons de travail alloués une fois et réutilisés."""
+
+    def __init__(self, lot, hauteur, largeur, noyau):
+        marge = len(noyau) - 1
+        if hauteur <= marge or largeur <= marge:
+            raise ValueError(f"Plan {largeur}x{hauteur} plus petit que la fenêtre SSIM {len(noyau)}x{len(noyau)}.")
+        self.noyau = noyau.tolist()
+        self.x = np.empty((lot, hauteur, largeur), dtype=np.float32)
+        self.y = np.empty_like(self.x)
+        self.produit = np.empty_like(self.x)
+        self.horizontal = np.empty((lot, hauteur, largeur - marge), dtype=np.float32)
+        self.terme = np.empty_like(self.horizontal)
+        # Moyennes locales de x, y, x², y², xy, puis deux tampons de calcul
+        self.cartes = np.empty((7, lot, hauteur - marge, largeur - marge), dtype=np.float32)
+
+    def _filtrer(self, image, sortie):
+        # Convolution séparable « valide », lignes puis colonnes ; le noyau est symétrique : les deux
+        # décalages de même coefficient sont additionnés avant la multiplication
+        nombre, largeur, hauteur = len(image), self.horizontal.shape[2], sortie.shape[1]
+        horizontal, terme = self.horizontal[:nombre], self.terme[:nombre]
+        dernier, centre = len(self.noyau) - 1, len(self.noyau) // 2
+        np.multiply(image[:, :, centre:centre + largeur], self.noyau[centre], out=horizontal)
+        for decalage, coefficient in enumerate(self.noyau[:centre]):
+            np.add(image[:, :, decalage:decalage + largeur], image[:, :, dernier - decalage:dernier - decalage + largeur], out=terme)
+            terme *= coefficient
+            horizontal += terme
+        terme = terme[:, :hauteur]
+        np.multiply(horizontal[:, centre:centre + hauteur], self.noyau[centre], out=sortie)
+        for decalage, coefficient in enumerate(self.noyau[:centre]):
+            np.add(horizontal[:, decalage:decalage + hauteur], horizontal[:, dernier - decalage:dernier - decalage + hauteur], out=terme)
+            terme *= coefficient
+            sortie += terme
+
+    def ssim(self, a, b):
+        nombre = len(a)
+        x, y, produit = self.x[:nombre], self.y[:nombre], self.produit[:nombre]
+        mx, my, mxx, myy, mxy, numerateur, denominateur = self.cartes[:, :nombre]
+        np.copyto(x, a)
+        np.copyto(y, b)
+        self._filtrer(x, mx)
+        self._filtrer(y, my)
+        np.multiply(x, x, out=produit)
+        self._filtrer(produit, mxx)
+        np.multiply(y, y, out=produit)
+        self._filtrer(produit, myy)
+        np.multiply(x, y, out=produit)
+        self._filtrer(produit, mxy)
+        # (2 µx µy + C1)(2 σxy + C2) / ((µx² + µy² + C1)(σx² + σy² + C2)), en place
+        np.multiply(mx, my, out=numerateur)
+        mxy -= numerateur
+        numerateur *= 2
+        numerateur += C1
+        mxy *= 2
+        mxy += C2
+        numerateur *= mxy
+        mx *= mx
+        my *= my
+        mxx -= mx
+        myy -= my
+        np.add(mx, my, out=denominateur)
+        denominateur += C1
+        mxx += myy
+        mxx += C2
+        denominateur *= mxx
+        numerateur /= denominateur
+        return numerateur.reshape(nombre, -1).mean(axis=1, dtype=np.float64)
+
+
+class ComparateurYUV:
+    """EQM et SSIM par image de deux flux yuv420p de mêmes dimensions, lot par lot."""
+
+    def __init__(self, largeur, hauteur, chroma=False, lot=None):
+        largeur_chroma, hauteur_chroma = (largeur + 1) // 2, (hauteur + 1) // 2
+        self.plans = [(hauteur, largeur), (hauteur_chroma, largeur_chroma), (hauteur_chroma, largeur_chroma)]
+        self.pixels = np.array([h * l for h, l in self.plans], dtype=np.float64)
+        self.bornes = np.concatenate([[0], np.cumsum(self.pixels).astype(np.int64)]).tolist()
+        self.taille_image = self.bornes[-1]
+        self.lot = lot or min(IMAGES_PAR_LOT, max(1, PIXELS_PAR_LOT // (largeur * hauteur)))
+        self.chroma = chroma
+        self.reference = np.empty((self.lot, self.taille_image), dtype=np.uint8)
+        self.recue = np.empty_like(self.reference)
+        self.ecart = np.empty((self.lot, self.taille_image), dtype=np.int32)
+        noyau = noyau_gaussien()
+        self.fenetres = [FenetreGaussienne(self.lot, *self.plans[0], noyau)]
+        if chroma:
+            self.fenetres.append(FenetreGaussienne(self.lot, *self.plans[1], noyau))
+
+    def plan(self, tampon, indice, nombre):
+        return tampon[:nombre, self.bornes[indice]:self.bornes[indice + 1]].reshape(nombre, *self.plans[indice])
+
+    def comparer(self, decodeur_reference, decodeur_recue):
+        """(eqm, ssim) par image, jusqu'à la fin du plus court des deux flux."""
+        eqm, ssim = [], []
+        while True:
+            nombre = min(decodeur_reference.lire(self.reference), decodeur_recue.lire(self.recue))
+            if not nombre:
+                break
+            ecart = self.ecart[:nombre]
+            np.subtract(self.reference[:nombre], self.recue[:nombre], out=ecart, dtype=np.int32)
+            ecart *= ecart
+            # EQM de chaque plan, puis moyenne pondérée par les pixels comme le filtre psnr
+            sommes = np.add.reduceat(ecart, self.bornes[:-1], axis=1, dtype=np.int64)
+            eqm.append(sommes.sum(axis=1) / self.pixels.sum())
+            valeurs = [fenetre.ssim(self.plan(self.reference, indice, nombre), self.plan(self.recue, indice, nombre))
+                       for fenetre, indice in zip(self.fenetres, (0, 1))]
+            if self.chroma:
+                valeurs.append(self.fenetres[1].ssim(self.plan(self.reference, 2, nombre), self.plan(self.recue, 2, nombre)))
+                valeurs = np.average(valeurs, axis=0, weights=self.pixels)
+            else:
+                valeurs = valeurs[0]
+            ssim.append(valeurs)
+            if nombre < self.lot:
+                break
+        if not eqm:
+            return np.zeros(0), np.zeros(0)
+        return np.concatenate(eqm), np.concatenate(ssim)
+
+
+def psnr(eqm):
+    with np.errstate(divide='ignore'):
+        return np.minimum(10 * np.log10(255.0 ** 2 / np.asarray(eqm, dtype=np.float64)), PSNR_MAX)
+
+
+def plages(images, travailleurs):
+    """Plages contiguës [début, fin) d'images, une par travailleur (une seule si le nombre est inconnu)."""
+    if not images or travailleurs <= 1:
+        return [(0, images or None)]
+    bornes = np.linspace(0, images, min(travailleurs, images) + 1).round().astype(int).tolist()
+    return list(zip(bornes[:-1], bornes[1:]))
+
+
+def fenetres(images, pas_images, images_fenetre):
+    """Plages [début, fin) de l'aperçu : images_fenetre images consécutives toutes les pas_images x images_fenetre."""
+    return [(debut, min(debut + images_fenetre, images)) for debut in range(0, images, pas_images * images_fenetre)]
+
+
+def calculer_qoe(reference, video, chroma=False, travailleurs=1, pas_images=1, reduction=1, fenetre_s=2.0):
+    """PSNR et SSIM globaux et par image ({'psnr', 'ssim', 'temps_s', 'psnr_images', 'ssim_images', 'images'})."""
+    largeur, hauteur, images_par_s, images = proprietes(reference)
+    largeur_video, hauteur_video = proprietes(video)[:2]
+    if reduction > 1:
+        largeur, hauteur = taille_reduite(largeur, hauteur, reduction)
+    echelle = [f"scale={largeur}:{hauteur}:flags=area"] if reduction > 1 else []
+    filtre_reference = ','.join(echelle)
+    if not echelle and (largeur_video, hauteur_video) != (largeur, hauteur):
+        echelle = [f"scale={largeur}:{hauteur}"]
+    filtre_video = ','.join(echelle)
+
+    def comparer_plage(plage):
+        debut, fin = plage
+        # Une demi-image plus tôt : la première image de la plage n'est pas écartée par un arrondi de l'instant
+        debut_s = max(0.0, (debut - 0.5) / images_par_s)
+        nombre = fin - debut if fin is not None else None
+        comparateur = ComparateurYUV(largeur, hauteur, chroma)
+        decodeurs = [DecodeurYUV(commande_decodage(chemin, debut_s, nombre, filtre), comparateur.taille_image)
+                     for chemin, filtre in ((reference, filtre_reference), (video, filtre_video))]
+        try:
+            return comparateur.comparer(*decodeurs)
+        finally:
+            for decodeur in decodeurs:
+                decodeur.fermer()
+
+    if pas_images > 1 and images:
+        liste_plages = fenetres(images, pas_images, max(1, round(fenetre_s * images_par_s)))
+    else:
+        liste_plages = plages(images, travailleurs)
+    with ThreadPoolExecutor(max_workers=min(travailleurs, len(liste_plages))) as executeur:
+        resultats = list(executeur.map(comparer_plage, liste_plages))
+    eqm = np.concatenate([eqm_plage for eqm_plage, _ in resultats])
+    ssim = np.concatenate([ssim_plage for _, ssim_plage in resultats])
+    if not len(eqm):
+        raise ValueError(f"Aucune image décodée pour {reference} et {video}.")
+    # Instant de chaque image comparée ; une plage s'arrête plus tôt si la vidéo reçue est plus courte
+    temps_s = np.concatenate([np.arange(debut, debut + len(eqm_plage)) for (debut, _), (eqm_plage, _) in
+                              zip(liste_plages, resultats)]) / images_par_s
+    return {'psnr': float(psnr(eqm.mean())), 'ssim': float(ssim.mean()), 'images': len(eqm),
+            'temps_s': temps_s, 'psnr_images': psnr(eqm), 'ssim_images': ssim}
+
+
+class Main:
+    @staticmethod
+    def main():
+        parser = argparse.ArgumentParser(description="PSNR et SSIM par image en numpy (décodage ffmpeg rawvideo).")
+        parser.add_argument('reference', help="vidéo de référence (côté serveur)")
+        parser.add_argument('video', help="vidéo reçue")
+        parser.add_argument('--chroma', action='store_true', help="SSIM sur Y, U et V (luminance seule par défaut)")
+        parser.add_argument('--travailleurs', type=int, default=1, help="plages d'images calculées en parallèle")
+        parser.add_argument('--pas', type=int, default=1, help="une fenêtre sur N (aperçu)")
+        parser.add_argument('--fenetre', type=float, default=2.0, help="durée des fenêtres de l'aperçu (s)")
+        parser.add_argument('--reduction', type=int, default=1, help="facteur de réduction des dimensions (aperçu)")
+        parser.add_argument('--sortie', help="valeurs par image (.npz : temps_s, psnr, ssim)")
+        args = parser.parse_args()
+        resultat = calculer_qoe(args.reference, args.video, args.chroma, args.travailleurs, args.pas, args.reduction,
+                                args.fenetre)
+        print(f"{resultat['images']} images : PSNR {resultat['psnr']:.4f} dB, SSIM {resultat['ssim']:.6f}")
+        if args.sortie:
+            np.savez(args.sortie, temps_s=resultat['temps_s'], psnr=resultat['psnr_images'], ssim=resultat['ssim_images'])
+            print(f"Valeurs par image écrites dans {args.sortie}")
+
+
+if __name__ == "__main__":
+    Main.main()
@@ -0,0 +1,188 @@
+"""Métriques QoS calculées pendant la capture, fenêtre par fenêtre (1 s par défaut).
+
+Les paquets sont lus soit depuis un pipe pcapng (tshark/dumpcap -w -), soit directement sur
+l'interface du client avec une socket AF_PACKET (dans l'espace de noms de l'hôte Mininet, root).
+Seul le trafic TCP entre le serveur et le client (et le port vidéo s'il est donné) est pris en compte.
+
+Fichiers produits, mis à jour à chaque fenêtre :
+    PREFIXE.csv   une ligne par fenêtre (débit, gigue, retransmissions, latence des requêtes)
+    PREFIXE.json  cumul depuis le début et état du flux (en_cours, interrompu, termine)
+    PREFIXE.txt   à la fin, même sortie que qos_script_calcul.sh (bitrate, packet_loss, ...)
+
+    tshark -i h2-eth0 -w - | tee h1_h2.pcapng | python3 outils/qos_direct.py - --serveur 10.1.1.1 --client 10.1.1.2 --sortie h1_h2.pcapng.qos
+    python3 outils/qos_direct.py --interface h2-eth0 --serveur 10.1.1.1 --client 10.1.1.2 --sortie h1_h2.qos
+
+Les paquets passent par AnalyseurTCP (analyse_tcp.py) : mêmes définitions de débit, perte, latence
+et gigue, et donc mêmes valeurs, que analyse_tcp.py (qos_script_calcul.sh) et qos_segments.py sur
+la même capture. Lue directement sur l'interface (--interface), la socket peut ne pas voir
+exactement les paquets écrits par tshark : le résumé .txt est alors proche mais pas identique à
+celui de la phase 2. Les valeurs d'une fenêtre sont calculées sur la différence des compteurs
+cumulés à ses deux bords.
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import sys
+import time
+
+from analyse_tcp import AnalyseurTCP, ligne_bash, metriques
+from lecteur_pcapng import Paquet, decoder_tcp, lire_paquets
+
+ETH_P_ALL = 0x0003
+COLONNES = ['fenetre', 'debut', 'paquets', 'octets', 'debit_mbps', 'gigue_ms', 'segments_donnees',
+            'retransmissions', 'perte_pct', 'latence_ms']
+
+
+def lire_interface(interface, attente):
+    """Paquets d'une interface via AF_PACKET ; None quand rien n'est arrivé pendant attente secondes."""
+    prise = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+    prise.bind((interface, 0))
+    prise.settimeout(attente)
+    try:
+        while True:
+            try:
+                donnees = prise.recv(65535)
+            except socket.timeout:
+                yield None
+                continue
+            yield Paquet(time.time(), 0, len(donnees), donnees)
+    finally:
+        prise.close()
+
+
+def resumer(totaux, duree):
+    """Résumé d'une fenêtre ou du cumul à partir des compteurs de AnalyseurTCP.totaux()."""
+    return dict(metriques(totaux, duree), paquets=totaux['paquets'], octets=totaux['octets'],
+                segments_donnees=totaux['segments_donnees'], retransmissions=totaux['retransmissions'])
+
+
+class AnalyseurDirect:
+    def __init__(self, ip_serveur, ip_client, port=None, fenetre=1.0, prefixe=None, arret_si_vide=0):
+        self.tcp = AnalyseurTCP(ip_serveur, ip_client, port)
+        self.port = port
+        self.fenetre = fenetre
+        self.prefixe = prefixe
+        self.arret_si_vide = arret_si_vide
+        # Compteurs cumulés au début de la fenêtre courante
+        self.debut_fenetre = self.tcp.totaux()
+        self.index = None
+        self.origine = None
+        self.fenetres_vides = 0
+        self.etat = 'en_cours'
+        self.csv = None
+        if prefixe:
+            self.csv = open(prefixe + '.csv', 'w', buffering=1)
+            self.csv.write(','.join(COLONNES) + '\n')
+
+    def _concerne(self, segment):
+        if segment.ip_src == self.tcp.ip_serveur and segment.ip_dst == self.tcp.ip_client:
+            port = segment.port_src
+        elif segment.ip_src == self.tcp.ip_client and segment.ip_dst == self.tcp.ip_serveur:
+            port = segment.port_dst
+        else:
+            return False
+        return self.port is None or port == self.port
+
+    def ajouter(self, paquet):
+        if paquet is None or paquet.timestamp is None:
+            return
+        segment = decoder_tcp(paquet.donnees)
+        if segment is None or not self._concerne(segment):
+            return
+        ts = paquet.timestamp
+        self.avancer(ts)
+        if self.index is None:
+            self.origine = ts
+            self.index = 0
+        self.tcp.ajouter(ts, paquet.longueur, segment)
+
+    def resume(self):
+        tcp = self.tcp
+        duree = (tcp.dernier - tcp.premier) if tcp.paquets > 1 else 0.0
+        return resumer(tcp.totaux(), duree)
+
+    def avancer(self, maintenant):
+        """Clôt toutes les fenêtres terminées avant maintenant (y compris les fenêtres sans trafic)."""
+        if self.index is None:
+            return
+        while maintenant >= self.origine + (self.index + 1) * self.fenetre:
+            self._clore_fenetre()
+
+    def _clore_fenetre(self):
+        totaux = self.tcp.totaux()
+        resume = resumer({cle: totaux[cle] - self.debut_fenetre[cle] for cle in totaux}, self.fenetre)
+        self.debut_fenetre = totaux
+        ligne = dict(resume, fenetre=self.index, debut=round(self.origine + self.index * self.fenetre, 6))
+        if self.csv:
+            self.csv.write(','.join(str(round(ligne[c], 3) if isinstance(ligne[c], float) else ligne[c]) for c in COLONNES) + '\n')
+        self.fenetres_vides = self.fenetres_vides + 1 if resume['paquets'] == 0 else 0
+        if self.arret_si_vide and self.fenetres_vides >= self.arret_si_vide and self.etat == 'en_cours':
+            self.etat = 'interrompu'
+            print(f"Flux interrompu : aucun paquet depuis {self.fenetres_vides} fenêtres.", file=sys.stderr)
+        self.index += 1
+        self._ecrire_cumul()
+
+    def _ecrire_cumul(self):
+        if not self.prefixe:
+            return
+        donnees = dict(self.resume(), etat=self.etat, fenetres=self.index or 0, fenetre_s=self.fenetre)
+        temporaire = self.prefixe + '.json.tmp'
+        with open(temporaire, 'w') as f:
+            json.dump(donnees, f)
+        os.replace(temporaire, self.prefixe + '.json')
+
+    def terminer(self):
+        if self.index is not None and self.tcp.paquets > self.debut_fenetre['paquets']:
+            self._clore_fenetre()
+        if self.etat == 'en_cours':
+            self.etat = 'termine'
+        self._ecrire_cumul()
+        if self.csv:
+            self.csv.close()
+        ligne = ligne_bash(self.resume())
+        if self.prefixe:
+            with open(self.prefixe + '.txt', 'w') as f:
+                f.write(ligne + '\n')
+        return ligne
+
+
+def arreter(signum, frame):
+    raise KeyboardInterrupt
+
+
+class Main:
+    @staticmethod
+    def main():
+        parser = argparse.ArgumentParser(description="Métriques QoS par fenêtre pendant la capture.")
+        parser.add_argument('source', nargs='?', default='-', help="capture pcapng/pcap ou '-' pour un pipe (tshark -w -)")
+        parser.add_argument('--interface', help="lecture directe de l'interface par socket AF_PACKET au lieu d'un pipe")
+        parser.add_argument('--serveur', required=True, help="adresse IP du serveur vidéo")
+        parser.add_argument('--client', required=True, help="adresse IP du client")
+        parser.add_argument('--port', type=int, help="port vidéo du serveur")
+        parser.add_argument('--fenetre', type=float, default=1.0, help="durée d'une fenêtre en secondes")
+        parser.add_argument('--sortie', help="préfixe des fichiers .csv/.json/.txt")
+        parser.add_argument('--arret-si-vide', type=int, default=0, help="déclare le flux interrompu après N fenêtres vides")
+        args = parser.parse_args()
+
+        signal.signal(signal.SIGTERM, arreter)
+        signal.signal(signal.SIGHUP, arreter)
+        analyseur = AnalyseurDirect(args.serveur, args.client, args.port, args.fenetre, args.sortie, args.arret_si_vide)
+        try:
+            if args.interface:
+                for paquet in lire_interface(args.interface, args.fenetre):
+                    if paquet is None:
+                        analyseur.avancer(time.time())
+                    else:
+                        analyseur.ajouter(paquet)
+            else:
+                for paquet in lire_paquets(args.source):
+                    analyseur.ajouter(paquet)
+        except KeyboardInterrupt:
+            pass
+        print(analyseur.terminer())
+
+
+if __name__ == "__main__":
+    Main.main()
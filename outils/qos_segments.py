@@ -0,0 +1,308 @@
+"""Métriques QoS d'une capture découpée en segments (anneau dumpcap -b duration:N / filesize:N).
+
+Chaque segment fermé est analysé en entier par un travailleur (analyser_segment) depuis un état vide :
+compteurs, sommes et sommes des carrés des RTT, minimums et maximums, premier et dernier instant.
+Le processus principal ne fait que les raccorder, dans l'ordre des segments, à l'état réel porté
+d'un segment au suivant (séquences et ACK, RTT en attente, dernière inter-arrivée) :
+    - débit, trames de rang pair et gigue : sommes, plus les termes qui enjambent le raccord ;
+    - flux TCP : le travailleur note pour chaque connexion les paquets qui précèdent son point de
+      raccord (premier ACK, dans chaque sens, d'un segment émis dans ce segment de capture) et
+      l'état TCP à ce point. Le processus principal rejoue ces paquets depuis l'état réel ; si
+      l'état obtenu est celui du travailleur, la suite de l'analyse du travailleur est exacte et
+      ses compteurs s'ajoutent. Sinon (segment du fichier précédent retransmis après le point de
+      raccord, par exemple), la connexion est relue en série.
+Le résultat est donc celui de analyse_tcp.py et de qos_direct.py sur la capture complète, aux
+arrondis près de l'ordre des additions.
+
+    dumpcap -i h2-eth0 -b duration:10 -w h1_h2.pcapng &
+    python3 outils/qos_segments.py --suivre --serveur 10.1.1.1 --client 10.1.1.2 --sortie h1_h2.pcapng.qos 'h1_h2_*.pcapng'
+    python3 outils/qos_segments.py --serveur 10.1.1.1 --client 10.1.1.2 h1_h2_000*.pcapng
+
+En mode --suivre, un segment est analysé dès qu'un segment plus récent apparaît ; le dernier
+l'est à l'arrêt (SIGTERM/SIGINT).
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import signal
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from analyse_tcp import MODULO_SEQ, PAUSE_MAX, AnalyseurTCP, apres, ligne_bash
+from lecteur_pcapng import decoder_tcp, lire_paquets
+from qos_direct import arreter
+
+
+def lire_segment(chemin, ip_serveur, ip_client, port=None):
+    """Paquets TCP du flux vidéo d'un segment, décodés : liste de (timestamp, longueur, SegmentTCP)."""
+    serveur = socket.inet_aton(ip_serveur)
+    client = socket.inet_aton(ip_client)
+    paquets = []
+    for paquet in lire_paquets(chemin):
+        if paquet.timestamp is None:
+            continue
+        segment = decoder_tcp(paquet.donnees)
+        if segment is None:
+            continue
+        if segment.ip_src == serveur and segment.ip_dst == client:
+            port_video = segment.port_src
+        elif segment.ip_src == client and segment.ip_dst == serveur:
+            port_video = segment.port_dst
+        else:
+            continue
+        if port is None or port_video == port:
+            paquets.append((paquet.timestamp, paquet.longueur, segment))
+    return paquets
+
+
+def connexion(segment, descendant):
+    # (port serveur, port client)
+    return (segment.port_src, segment.port_dst) if descendant else (segment.port_dst, segment.port_src)
+
+
+class PartielSegment:
+    """Agrégats d'un segment analysé depuis un état vide, à raccorder par CaptureSegmentee.raccorder()."""
+    __slots__ = ('paquets', 'octets', 'premier', 'dernier', 'trames', 'premiere_donnee', 'premiere_interarrivee',
+                 'donnees', 'derniere_donnee', 'derniere_interarrivee', 'somme_gigue', 'gigues', 'tetes', 'raccords',
+                 'suites')
+
+    def __init__(self):
+        self.paquets = 0
+        self.octets = 0
+        self.premier = None
+        self.dernier = None
+        # Trames de rang local pair et impair : [première, dernière, somme des |écarts|, écarts]
+        self.trames = ([None, None, 0.0, 0], [None, None, 0.0, 0])
+        # Gigue : les deux premières données du serveur portent les termes qui enjambent le raccord
+        self.premiere_donnee = None
+        self.premiere_interarrivee = None
+        self.donnees = 0
+        self.derniere_donnee = None
+        self.derniere_interarrivee = None
+        self.somme_gigue = 0.0
+        self.gigues = 0
+        # Par connexion : paquets jusqu'au point de raccord, état TCP des deux sens à ce point,
+        # flux (compteurs depuis ce point, état final)
+        self.tetes = {}
+        self.raccords = {}
+        self.suites = {}
+
+
+def analyser_segment(chemin, ip_serveur, ip_client, port=None):
+    """Travailleur : agrégats partiels d'un segment, analysé depuis un état TCP vide."""
+    analyseur = AnalyseurTCP(ip_serveur, ip_client, port)
+    serveur, client = analyseur.ip_serveur, analyseur.ip_client
+    partiel = PartielSegment()
+    # Par connexion : fin du premier segment émis dans chaque sens
+    premieres_fins = {}
+    for ts, longueur, segment in lire_segment(chemin, ip_serveur, ip_client, port):
+        trames = partiel.trames[partiel.paquets & 1]
+        if trames[1] is not None:
+            trames[2] += abs(ts - trames[1])
+            trames[3] += 1
+        else:
+            trames[0] = ts
+        trames[1] = ts
+        descendant = segment.ip_src == serveur
+        analyseur.ajouter(ts, longueur, segment)
+        partiel.paquets += 1
+        if descendant and segment.charge > 0:
+            partiel.donnees += 1
+            if partiel.donnees == 1:
+                partiel.premiere_donnee = ts
+            elif partiel.donnees == 2:
+                partiel.premiere_interarrivee = analyseur.derniere_interarrivee
+        cle = connexion(segment, descendant)
+        if cle in partiel.raccords:
+            continue
+        partiel.tetes.setdefault(cle, []).append((ts, segment))
+        port_serveur, port_client = cle
+        aller = analyseur.flux.get((serveur, port_serveur, client, port_client))
+        retour = analyseur.flux.get((client, port_client, serveur, port_serveur))
+        premieres = premieres_fins.setdefault(cle, [None, None])
+        for sens, flux in enumerate((aller, retour)):
+            if premieres[sens] is None and flux is not None:
+                premieres[sens] = flux.fin_max
+        if (None not in premieres and retour.dernier_ack is not None and aller.dernier_ack is not None
+                and apres(retour.dernier_ack, premieres[0], MODULO_SEQ)
+                and apres(aller.dernier_ack, premieres[1], MODULO_SEQ)):
+            partiel.raccords[cle] = (aller.etat(), retour.etat())
+            analyseur.flux[(serveur, port_serveur, client, port_client)] = aller.suite()
+            analyseur.flux[(client, port_client, serveur, port_serveur)] = retour.suite()
+    for port_serveur, port_client in partiel.raccords:
+        partiel.suites[port_serveur, port_client] = (analyseur.flux[serveur, port_serveur, client, port_client],
+                                                     analyseur.flux[client, port_client, serveur, port_serveur])
+    partiel.octets = analyseur.octets
+    partiel.premier = analyseur.premier
+    partiel.dernier = analyseur.dernier
+    partiel.derniere_donnee = analyseur.derniere_donnee
+    partiel.derniere_interarrivee = analyseur.derniere_interarrivee
+    partiel.somme_gigue = analyseur.somme_gigue
+    partiel.gigues = analyseur.gigues
+    return partiel
+
+
+def numero_segment(chemin):
+    # dumpcap nomme les segments <base>_<numéro>_<date>.pcapng
+    correspondance = re.search(r'_(\d{5,})_\d{14}', os.path.basename(chemin))
+    return (int(correspondance.group(1)) if correspondance else 0, chemin)
+
+
+class CaptureSegmentee:
+    def __init__(self, ip_serveur, ip_client, port=None, travailleurs=None, prefixe=None):
+        self.ip_serveur = ip_serveur
+        self.ip_client = ip_client
+        self.port = port
+        self.prefixe = prefixe
+        self.executeur = ProcessPoolExecutor(max_workers=travailleurs)
+        self.en_cours = []
+        self.analyseur = AnalyseurTCP(ip_serveur, ip_client, port)
+        self.segments = 0
+        # Connexions relues en série faute d'état identique au point de raccord
+        self.relectures = 0
+
+    def soumettre(self, chemin):
+        futur = self.executeur.submit(analyser_segment, chemin, self.ip_serveur, self.ip_client, self.port)
+        self.en_cours.append((chemin, futur))
+
+    def fusionner_prets(self, attendre=False):
+        # Raccord dans l'ordre des segments, dès que le plus ancien en cours est analysé
+        while self.en_cours and (attendre or self.en_cours[0][1].done()):
+            chemin, futur = self.en_cours.pop(0)
+            self.raccorder(chemin, futur.result())
+            self.segments += 1
+            self.ecrire(termine=False)
+
+    def raccorder(self, chemin, partiel):
+        analyseur = self.analyseur
+        # Trames de rang pair : rang global = paquets déjà vus + rang local + 1
+        premiere, derniere, somme, ecarts = partiel.trames[(analyseur.paquets + 1) & 1]
+        if premiere is not None:
+            if analyseur.derniere_trame_paire is not None:
+                analyseur.somme_ecarts_pairs += abs(premiere - analyseur.derniere_trame_paire)
+                analyseur.ecarts_pairs += 1
+            analyseur.somme_ecarts_pairs += somme
+            analyseur.ecarts_pairs += ecarts
+            analyseur.derniere_trame_paire = derniere
+        analyseur.paquets += partiel.paquets
+        analyseur.octets += partiel.octets
+        if partiel.paquets:
+            if analyseur.premier is None:
+                analyseur.premier = partiel.premier
+            analyseur.dernier = partiel.dernier
+
+        if partiel.donnees:
+            # Inter-arrivée entre la dernière donnée du segment précédent et la première de celui-ci
+            interarrivee = None
+            if analyseur.derniere_donnee is not None:
+                interarrivee = partiel.premiere_donnee - analyseur.derniere_donnee
+                if interarrivee > PAUSE_MAX:
+                    interarrivee = None
+                elif analyseur.derniere_interarrivee is not None:
+                    analyseur.somme_gigue += abs(interarrivee - analyseur.derniere_interarrivee)
+                    analyseur.gigues += 1
+            # Terme que le travailleur n'a pas pu calculer, faute de cette inter-arrivée
+            if interarrivee is not None and partiel.premiere_interarrivee is not None:
+                analyseur.somme_gigue += abs(partiel.premiere_interarrivee - interarrivee)
+                analyseur.gigues += 1
+            analyseur.somme_gigue += partiel.somme_gigue
+            analyseur.gigues += partiel.gigues
+            analyseur.derniere_donnee = partiel.derniere_donnee
+            analyseur.derniere_interarrivee = partiel.derniere_interarrivee if partiel.donnees > 1 else interarrivee
+
+        serveur, client = analyseur.ip_serveur, analyseur.ip_client
+        a_relire = {}
+        for cle, tete in partiel.tetes.items():
+            for ts, segment in tete:
+                analyseur.ajouter_tcp(ts, segment, segment.ip_src == serveur)
+            if cle not in partiel.raccords:
+                continue
+            port_serveur, port_client = cle
+            flux = (analyseur.flux[serveur, port_serveur, client, port_client],
+                    analyseur.flux[client, port_client, serveur, port_serveur])
+            if (flux[0].etat(), flux[1].etat()) == partiel.raccords[cle]:
+                for reel, suite in zip(flux, partiel.suites[cle]):
+                    reel.fusionner(suite)
+            else:
+                a_relire[cle] = len(tete)
+        if a_relire:
+            self.relectures += len(a_relire)
+            for ts, _, segment in lire_segment(chemin, self.ip_serveur, self.ip_client, self.port):
+                descendant = segment.ip_src == serveur
+                cle = connexion(segment, descendant)
+                reste = a_relire.get(cle)
+                if reste is None:
+                    continue
+                if reste:
+                    a_relire[cle] = reste - 1
+                else:
+                    analyseur.ajouter_tcp(ts, segment, descendant)
+
+    def ecrire(self, termine):
+        if not self.prefixe:
+            return
+        donnees = dict(self.analyseur.resume(), segments=self.segments, relectures=self.relectures,
+                       etat='termine' if termine else 'en_cours')
+        temporaire = self.prefixe + '.json.tmp'
+        with open(temporaire, 'w') as f:
+            json.dump(donnees, f)
+        os.replace(temporaire, self.prefixe + '.json')
+
+    def terminer(self):
+        self.fusionner_prets(attendre=True)
+        self.executeur.shutdown()
+        self.ecrire(termine=True)
+        ligne = ligne_bash(self.analyseur.resume())
+        if self.prefixe:
+            with open(self.prefixe + '.txt', 'w') as f:
+                f.write(ligne + '\n')
+        return ligne
+
+
+class Main:
+    @staticmethod
+    def main():
+        parser = argparse.ArgumentParser(description="Métriques QoS d'une capture en segments (anneau dumpcap).")
+        parser.add_argument('segments', nargs='+', help="fichiers segments, ou motif glob entre guillemets avec --suivre")
+        parser.add_argument('--serveur', required=True, help="adresse IP du serveur vidéo")
+        parser.add_argument('--client', required=True, help="adresse IP du client")
+        parser.add_argument('--port', type=int, help="port vidéo du serveur")
+        parser.add_argument('--travailleurs', type=int, help="processus d'analyse en parallèle")
+        parser.add_argument('--suivre', action='store_true', help="analyse les segments au fil de leur fermeture")
+        parser.add_argument('--intervalle', type=float, default=1.0, help="période de recherche des nouveaux segments (s)")
+        parser.add_argument('--sortie', help="préfixe des fichiers .json (cumul) et .txt (résumé)")
+        args = parser.parse_args()
+
+        capture = CaptureSegmentee(args.serveur, args.client, args.port, args.travailleurs, args.sortie)
+        if not args.suivre:
+            for chemin in sorted(args.segments, key=numero_segment):
+                capture.soumettre(chemin)
+            print(capture.terminer())
+            return
+        signal.signal(signal.SIGTERM, arreter)
+        signal.signal(signal.SIGHUP, arreter)
+        soumis = set()
+        try:
+            while True:
+                presents = sorted({chemin for motif in args.segments for chemin in glob.glob(motif)}, key=numero_segment)
+                # Le plus récent est encore en cours d'écriture par dumpcap
+                for chemin in presents[:-1]:
+                    if chemin not in soumis:
+                        soumis.add(chemin)
+                        capture.soumettre(chemin)
+                capture.fusionner_prets()
+                time.sleep(args.intervalle)
+        except KeyboardInterrupt:
+            pass
+        presents = sorted({chemin for motif in args.segments for chemin in glob.glob(motif)}, key=numero_segment)
+        for chemin in presents:
+            if chemin not in soumis:
+                capture.soumettre(chemin)
+        print(capture.terminer())
+
+
+if __name__ == "__main__":
+    Main.main()
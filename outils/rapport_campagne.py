@@ -0,0 +1,128 @@
+"""Classeur de campagne : toutes les métriques QoS et QoE, toutes perturbations, codecs et nombres d'hôtes.
+
+Remplace la fusion à la main des excel_files_<codec>_<profil>_<métrique>/resultats_*.xlsx (comme
+000_résultats_240p.xlsx) : l'entrepôt de résultats (resultats.py) est lu une fois, agrégé en mémoire,
+puis écrit en un seul passage (classeur en écriture seule, une sauvegarde) :
+    campagne     les runs retenus par expérience (le plus récent l'emporte pour chaque valeur)
+    <métrique>   un bloc par perturbation (valeurs en lignes, codec / profil / hôtes / paire en colonnes)
+                 et un graphique Excel natif (LineChart) par bloc, qui référence les cellules
+
+    python3 outils/rapport_campagne.py --profile 240 --sortie campagne_240p.xlsx
+    python3 outils/rapport_campagne.py --perturbation loss --codec h264 --codec h265
+"""
+import argparse
+import time
+
+import numpy as np
+from openpyxl import Workbook
+from openpyxl.chart import LineChart, Reference
+from openpyxl.utils import get_column_letter
+
+from resultats import RACINE_RESULTATS, EntrepotResultats, cle_perturbation
+
+METRIQUES = ('bitrate', 'packet_loss', 'average_latency', 'average_jitter', 'psnr', 'ssim')
+UNITES = {'bitrate': 'Mbps', 'packet_loss': '%', 'average_latency': 's', 'average_jitter': 's', 'psnr': 'dB', 'ssim': ''}
+# Hauteur d'un graphique par défaut (7,5 cm) en lignes : les blocs sont espacés d'au moins autant
+LIGNES_GRAPHIQUE = 16
+
+
+def ordre_colonne(cle):
+    # h3_h4 avant h11_h12 : tri sur le numéro d'hôte du serveur plutôt que sur le texte
+    codec, profile, hotes, paire = cle
+    serveur = paire.split('_')[0]
+    return (codec, profile, hotes, int(serveur[1:]) if serveur[1:].isdigit() else 0, paire)
+
+
+def agreger(lignes):
+    """{metrique: {perturbation: {(codec, profile, nombre_hotes, paire): {valeur de perturbation: valeur}}}} des moyennes.
+
+    Le profil fait partie de la colonne : deux profils d'une même paire ne s'écrasent pas.
+    """
+    tables = {}
+    scalaires = np.flatnonzero(np.isnan(lignes['temps_s']))
+    # Ordre chronologique des runs : le plus récent écrase les précédents
+    for index in scalaires[np.argsort(lignes['horodatage'][scalaires], kind='stable')]:
+        colonne = (str(lignes['codec'][index]), int(lignes['profile'][index]), int(lignes['nombre_hotes'][index]),
+                   str(lignes['paire'][index]))
+        (tables.setdefault(str(lignes['metrique'][index]), {})
+               .setdefault(str(lignes['perturbation'][index]), {})
+               .setdefault(colonne, {}))[cle_perturbation(lignes['valeur_perturbation'][index])] = float(lignes['valeur'][index])
+    return tables
+
+
+def _feuille_campagne(classeur, lignes):
+    feuille = classeur.create_sheet(title='campagne')
+    feuille.append(['experience', 'perturbation', 'codec', 'profile', 'nombre_hotes', 'runs', 'dernier run'])
+    runs = {}
+    for experience, perturbation, codec, profile, hotes, run, horodatage in zip(
+            lignes['experience'].tolist(), lignes['perturbation'].tolist(), lignes['codec'].tolist(),
+            lignes['profile'].tolist(), lignes['nombre_hotes'].tolist(), lignes['run'].tolist(),
+            lignes['horodatage'].tolist()):
+        runs.setdefault((experience, perturbation, codec, profile, hotes), {})[run] = horodatage
+    for contexte, horodatages in sorted(runs.items()):
+        dernier = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(max(horodatages.values())))
+        feuille.append(list(contexte) + [len(horodatages), dernier])
+
+
+def _feuille_metrique(classeur, metrique, table):
+    feuille = classeur.create_sheet(title=metrique)
+    ligne = 1
+    for perturbation, colonnes in sorted(table.items()):
+        cles = sorted(colonnes, key=ordre_colonne)
+        valeurs = sorted(set().union(*(colonnes[cle].keys() for cle in cles)))
+        feuille.append([perturbation] + [f'{codec} {profile}p {hotes} hotes {paire}' for codec, profile, hotes, paire in cles])
+        for valeur in valeurs:
+            feuille.append([valeur] + [colonnes[cle].get(valeur) for cle in cles])
+        graphique = LineChart()
+        graphique.title = f'{metrique} : {perturbation}'
+        graphique.x_axis.title = perturbation
+        graphique.y_axis.title = f'{metrique} ({UNITES[metrique]})' if UNITES[metrique] else metrique
+        graphique.x_axis.delete = False
+        graphique.y_axis.delete = False
+        graphique.width = max(15, 2 * len(valeurs))
+        graphique.add_data(Reference(feuille, min_col=2, max_col=1 + len(cles), min_row=ligne, max_row=ligne + len(valeurs)),
+                           titles_from_data=True)
+        graphique.set_categories(Reference(feuille, min_col=1, min_row=ligne + 1, max_row=ligne + len(valeurs)))
+        feuille.add_chart(graphique, f'{get_column_letter(len(cles) + 3)}{ligne}')
+        hauteur = max(len(valeurs) + 3, LIGNES_GRAPHIQUE)
+        for _ in range(hauteur - len(valeurs) - 1):
+            feuille.append([])
+        ligne += hauteur
+
+
+def ecrire_rapport(lignes, sortie, metriques=METRIQUES):
+    """Écrit le classeur de campagne à partir des colonnes de l'entrepôt ; renvoie les métriques écrites."""
+    tables = agreger(lignes)
+    classeur = Workbook(write_only=True)
+    _feuille_campagne(classeur, lignes)
+    ecrites = [metrique for metrique in metriques if metrique in tables]
+    for metrique in ecrites:
+        _feuille_metrique(classeur, metrique, tables[metrique])
+    classeur.save(sortie)
+    return ecrites
+
+
+class Main:
+    @staticmethod
+    def main():
+        parser = argparse.ArgumentParser(description="Classeur de campagne (une feuille par métrique) depuis l'entrepôt de résultats.")
+        parser.add_argument('--racine', default=RACINE_RESULTATS, help="répertoire de l'entrepôt")
+        parser.add_argument('--sortie', default='campagne.xlsx', help="classeur produit")
+        parser.add_argument('--profile', type=int, action='append', help="profil vidéo (répétable)")
+        parser.add_argument('--perturbation', action='append', help="bande_passante, delay, loss (répétable)")
+        parser.add_argument('--codec', action='append', help="h264, h265 (répétable)")
+        parser.add_argument('--nombre-hotes', type=int, action='append', help="nombre d'hôtes (répétable)")
+        parser.add_argument('--metrique', action='append', choices=METRIQUES, help="métrique (répétable, toutes par défaut)")
+        args = parser.parse_args()
+
+        lignes = EntrepotResultats(args.racine).lire(profile=args.profile, perturbation=args.perturbation,
+                                                      codec=args.codec, nombre_hotes=args.nombre_hotes)
+        if not len(lignes['run']):
+            parser.error(f"aucun résultat dans {args.racine} pour ces filtres")
+        ecrites = ecrire_rapport(lignes, args.sortie, args.metrique or METRIQUES)
+        print(f"{args.sortie} : {len(ecrites)} feuilles de métriques ({', '.join(ecrites)}), "
+              f"{len(np.unique(lignes['run']))} runs")
+
+
+if __name__ == "__main__":
+    Main.main()
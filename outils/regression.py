@@ -0,0 +1,217 @@
+"""Régressions QoE/QoS en fonction de la perturbation, pour toute une campagne en un appel vectorisé.
+
+Remplace les régressions faites à la main hors de l'outil (12_08_24_regression_results.xlsx). Les
+moyennes de l'entrepôt de résultats (resultats.py, le run le plus récent l'emporte) sont regroupées
+par (métrique, perturbation, codec, profil, nombre d'hôtes), toutes paires confondues, puis chaque modèle est
+ajusté sur tous les groupes à la fois par moindres carrés : pseudo-inverse (np.linalg.pinv) d'une pile
+de matrices de régression, les groupes plus courts étant complétés par des lignes de poids nul.
+    lineaire      y = ordonnee + pente x
+    polynome      y = x^0 + x^1 x + ... + x^d x^d                       (degré --degre)
+    logistique    y = bas + amplitude / (1 + exp(-raideur (x - milieu)))
+    morceaux      y = ordonnee + pente x + delta_pente max(0, x - rupture)   (deux droites raccordées)
+Pour logistique et morceaux, les paramètres non linéaires (raideur, milieu, rupture) sont cherchés sur
+une grille dont tous les candidats sont résolus dans le même appel ; les intervalles de confiance des
+coefficients linéaires sont alors conditionnels au candidat retenu (pas d'intervalle pour les
+paramètres de grille). Intervalles de Student à n - p degrés de liberté, p comptant aussi les
+paramètres de grille ; R² et R² ajusté.
+
+    python3 outils/regression.py --profile 240 --sortie regression_240p.xlsx
+    python3 outils/regression.py --metrique psnr --metrique ssim --modele logistique --sortie qoe.csv
+"""
+import argparse
+import csv
+import math
+from statistics import NormalDist
+
+import numpy as np
+from openpyxl import Workbook
+
+from rapport_campagne import agreger
+from resultats import RACINE_RESULTATS, EntrepotResultats
+
+MODELES = ('lineaire', 'polynome', 'logistique', 'morceaux')
+COLONNES = ('metrique', 'perturbation', 'codec', 'profile', 'nombre_hotes', 'modele', 'points', 'r2', 'r2_ajuste',
+            'coefficient', 'valeur', 'ic_bas', 'ic_haut')
+# Candidats des paramètres non linéaires, relatifs à l'étendue des perturbations du groupe
+GRILLE_MILIEU = np.linspace(0.0, 1.0, 21)
+GRILLE_RAIDEUR = np.logspace(0.0, 2.5, 16)
+GRILLE_RUPTURE = np.linspace(0.0, 1.0, 33)[1:-1]
+
+
+def quantile_student(niveau, ddl):
+    """Quantile bilatéral de Student (niveau 0.95 -> t_0.975) ; exact pour 1 et 2 degrés de liberté,
+    développement de Cornish-Fisher au-delà (erreur relative < 0,2 % dès 3 degrés de liberté). NaN si ddl < 1."""
+    p = 0.5 + niveau / 2
+    ddl = np.asarray(ddl, dtype=np.float64)
+    z = NormalDist().inv_cdf(p)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = (z + (z ** 3 + z) / (4 * ddl) + (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96 * ddl ** 2)
+             + (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / (384 * ddl ** 3)
+             + (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3 - 945 * z) / (92160 * ddl ** 4))
+    t = np.where(ddl == 1, math.tan(math.pi * (p - 0.5)), t)
+    t = np.where(ddl == 2, (2 * p - 1) / math.sqrt(2 * p * (1 - p)), t)
+    return np.where(ddl >= 1, t, np.nan)
+
+
+def points(lignes, metriques=None):
+    """Groupes [(metrique, perturbation, codec, profile, nombre_hotes)] et matrices (groupes, points) x, y, masque."""
+    groupes, nuages = [], []
+    for metrique, par_perturbation in sorted(agreger(lignes).items()):
+        if metriques and metrique not in metriques:
+            continue
+        for perturbation, colonnes in sorted(par_perturbation.items()):
+            par_configuration = {}
+            for (codec, profile, hotes, _), valeurs in colonnes.items():
+                par_configuration.setdefault((codec, profile, hotes), []).extend(valeurs.items())
+            for (codec, profile, hotes), nuage in sorted(par_configuration.items()):
+                groupes.append((metrique, perturbation, codec, profile, hotes))
+                nuages.append(nuage)
+    longueur = max((len(nuage) for nuage in nuages), default=0)
+    x = np.zeros((len(nuages), longueur))
+    y = np.zeros((len(nuages), longueur))
+    masque = np.zeros((len(nuages), longueur), dtype=bool)
+    for index, nuage in enumerate(nuages):
+        x[index, :len(nuage)], y[index, :len(nuage)] = zip(*nuage)
+        masque[index, :len(nuage)] = True
+    return groupes, x, y, masque
+
+
+def _moindres_carres(matrice, y, masque):
+    # matrice (..., n, p) : solution de norme minimale pour chaque matrice de la pile, lignes masquées à zéro
+    poids = masque.astype(np.float64)
+    matrice = matrice * poids[..., None]
+    y = np.broadcast_to(y * poids, matrice.shape[:-1])
+    pseudo_inverse = np.linalg.pinv(matrice)
+    coefficients = np.einsum('...pn,...n->...p', pseudo_inverse, y)
+    residus = y - np.einsum('...np,...p->...n', matrice, coefficients)
+    return coefficients, np.einsum('...n,...n->...', residus, residus), pseudo_inverse
+
+
+def _meilleur_candidat(matrice, y, masque):
+    # matrice (groupes, candidats, n, p) : le candidat de plus petite somme des carrés par groupe
+    coefficients, sse, pseudo_inverse = _moindres_carres(matrice, y[:, None], masque[:, None])
+    meilleur = np.argmin(np.where(np.isfinite(sse), sse, np.inf), axis=1)
+    lignes = np.arange(len(meilleur))
+    return meilleur, coefficients[lignes, meilleur], sse[lignes, meilleur], pseudo_inverse[lignes, meilleur]
+
+
+def ajuster(x, y, masque, modele, degre=2, niveau=0.95):
+    """Ajuste modele sur chaque ligne de (x, y, masque) ; dict de tableaux indexés par groupe."""
+    nombre = masque.sum(axis=1)
+    minimum = np.where(masque, x, np.inf).min(axis=1)
+    etendue = np.where(masque, x, -np.inf).max(axis=1) - minimum
+    etendue = np.where(etendue > 0, etendue, 1.0)
+    grille = None
+    if modele == 'lineaire' or modele == 'polynome':
+        puissances = np.arange(2 if modele == 'lineaire' else degre + 1)
+        noms = ['ordonnee', 'pente'] if modele == 'lineaire' else [f'x^{puissance}' for puissance in puissances]
+        coefficients, sse, pseudo_inverse = _moindres_carres(x[..., None] ** puissances, y, masque)
+    elif modele == 'logistique':
+        noms = ['bas', 'amplitude', 'raideur', 'milieu']
+        milieux = minimum[:, None] + etendue[:, None] * np.repeat(GRILLE_MILIEU, len(GRILLE_RAIDEUR))
+        raideurs = np.tile(GRILLE_RAIDEUR, len(GRILLE_MILIEU)) / etendue[:, None]
+        argument = np.clip(raideurs[..., None] * (x[:, None] - milieux[..., None]), -50, 50)
+        sigmoide = 1 / (1 + np.exp(-argument))
+        meilleur, coefficients, sse, pseudo_inverse = _meilleur_candidat(
+            np.stack([np.ones_like(sigmoide), sigmoide], axis=-1), y, masque)
+        lignes = np.arange(len(meilleur))
+        grille = np.stack([raideurs[lignes, meilleur], milieux[lignes, meilleur]], axis=-1)
+    elif modele == 'morceaux':
+        noms = ['ordonnee', 'pente', 'delta_pente', 'rupture']
+        ruptures = minimum[:, None] + etendue[:, None] * GRILLE_RUPTURE
+        abscisses = np.broadcast_to(x[:, None], ruptures.shape + x.shape[1:])
+        charniere = np.maximum(0.0, abscisses - ruptures[..., None])
+        meilleur, coefficients, sse, pseudo_inverse = _meilleur_candidat(
+            np.stack([np.ones_like(charniere), abscisses, charniere], axis=-1), y, masque)
+        grille = ruptures[np.arange(len(meilleur)), meilleur][:, None]
+    else:
+        raise ValueError(f"Modèle inconnu : {modele} (attendu : {', '.join(MODELES)})")
+
+    parametres = len(noms)
+    ddl = nombre - parametres
+    with np.errstate(divide='ignore', invalid='ignore'):
+        moyenne = (y * masque).sum(axis=1) / nombre
+        sst = (((y - moyenne[:, None]) * masque) ** 2).sum(axis=1)
+        r2 = np.where(sst > 0, 1 - sse / sst, np.nan)
+        r2_ajuste = np.where(ddl > 0, 1 - (1 - r2) * (nombre - 1) / ddl, np.nan)
+        variance = np.where(ddl > 0, sse / ddl, np.nan)
+    # Covariance des coefficients linéaires : sigma² (AᵀA)⁻¹ = sigma² A⁺ A⁺ᵀ
+    ecarts = np.sqrt(variance[:, None] * np.einsum('gpn,gpn->gp', pseudo_inverse, pseudo_inverse))
+    demi_largeur = quantile_student(niveau, ddl)[:, None] * ecarts
+    if grille is not None:
+        coefficients = np.concatenate([coefficients, grille], axis=1)
+        demi_largeur = np.concatenate([demi_largeur, np.full(grille.shape, np.nan)], axis=1)
+    return {'noms': noms, 'points': nombre, 'coefficients': coefficients, 'ic_bas': coefficients - demi_largeur,
+            'ic_haut': coefficients + demi_largeur, 'r2': r2, 'r2_ajuste': r2_ajuste}
+
+
+def ajuster_campagne(lignes, modeles=MODELES, metriques=None, degre=2, niveau=0.95):
+    """Lignes de résultats (dict par coefficient, COLONNES) de tous les modèles sur tous les groupes."""
+    groupes, x, y, masque = points(lignes, metriques)
+    resultats = []
+    if not groupes:
+        return resultats
+    for modele in modeles:
+        ajustement = ajuster(x, y, masque, modele, degre, niveau)
+        for index, (metrique, perturbation, codec, profile, hotes) in enumerate(groupes):
+            # Au moins autant de points que de paramètres ; sans degré de liberté, pas d'intervalle ni de R² ajusté
+            if ajustement['points'][index] < len(ajustement['noms']):
+                continue
+            for rang, nom in enumerate(ajustement['noms']):
+                resultats.append({
+                    'metrique': metrique, 'perturbation': perturbation, 'codec': codec, 'profile': profile,
+                    'nombre_hotes': hotes,
+                    'modele': modele, 'points': int(ajustement['points'][index]),
+                    'r2': float(ajustement['r2'][index]), 'r2_ajuste': float(ajustement['r2_ajuste'][index]),
+                    'coefficient': nom, 'valeur': float(ajustement['coefficients'][index, rang]),
+                    'ic_bas': float(ajustement['ic_bas'][index, rang]),
+                    'ic_haut': float(ajustement['ic_haut'][index, rang]),
+                })
+    return resultats
+
+
+def ecrire_resultats(resultats, sortie, colonnes=COLONNES):
+    if sortie.endswith('.csv'):
+        with open(sortie, 'w', newline='') as f:
+            ecrivain = csv.DictWriter(f, fieldnames=colonnes)
+            ecrivain.writeheader()
+            ecrivain.writerows(resultats)
+        return
+    classeur = Workbook(write_only=True)
+    feuille = classeur.create_sheet(title='resultats')
+    feuille.append(list(colonnes))
+    for resultat in resultats:
+        # Cellules vides plutôt que NaN (non représentable dans un classeur)
+        feuille.append([None if isinstance(valeur, float) and math.isnan(valeur) else valeur
+                        for valeur in (resultat[colonne] for colonne in colonnes)])
+    classeur.save(sortie)
+
+
+class Main:
+    @staticmethod
+    def main():
+        parser = argparse.ArgumentParser(description="Régressions des métriques en fonction de la perturbation, depuis l'entrepôt de résultats.")
+        parser.add_argument('--racine', default=RACINE_RESULTATS, help="répertoire de l'entrepôt")
+        parser.add_argument('--sortie', default='regression.xlsx', help="fichier produit (.xlsx ou .csv)")
+        parser.add_argument('--profile', type=int, action='append', help="profil vidéo (répétable)")
+        parser.add_argument('--perturbation', action='append', help="bande_passante, delay, loss (répétable)")
+        parser.add_argument('--codec', action='append', help="h264, h265 (répétable)")
+        parser.add_argument('--nombre-hotes', type=int, action='append', help="nombre d'hôtes (répétable)")
+        parser.add_argument('--metrique', action='append', help="métrique (répétable, toutes par défaut)")
+        parser.add_argument('--modele', action='append', choices=MODELES, help="modèle (répétable, tous par défaut)")
+        parser.add_argument('--degre', type=int, default=2, help="degré du modèle polynome")
+        parser.add_argument('--niveau', type=float, default=0.95, help="niveau des intervalles de confiance")
+        args = parser.parse_args()
+
+        lignes = EntrepotResultats(args.racine).lire(profile=args.profile, perturbation=args.perturbation,
+                                                      codec=args.codec, nombre_hotes=args.nombre_hotes)
+        if not len(lignes['run']):
+            parser.error(f"aucun résultat dans {args.racine} pour ces filtres")
+        resultats = ajuster_campagne(lignes, args.modele or MODELES, args.metrique, args.degre, args.niveau)
+        ecrire_resultats(resultats, args.sortie)
+        print(f"{args.sortie} : {len(resultats)} coefficients, "
+              f"{len({(r['metrique'], r['perturbation'], r['codec'], r['profile'], r['nombre_hotes']) for r in resultats})} groupes")
+
+
+if __name__ == "__main__":
+    Main.main()
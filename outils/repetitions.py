@@ -0,0 +1,218 @@
+"""Répétitions d'une campagne : N exécutions par valeur de perturbation, agrégées en moyenne et intervalle.
+
+classe_1_experimentation.py (Main.REPETITIONS = N) exécute chaque valeur N fois, dans un ordre tiré au
+hasard et sur la même topologie Mininet ; les données de la répétition r sont rangées dans
+<expérience>/repetitions/r<r>/, et l'identifiant de la campagne dans repetitions/campagne.txt. La
+sous-commande phase2 lance classe_2_experimentation.py dans chacun de ces répertoires : chaque répétition
+devient un run de l'entrepôt de résultats (resultats.py), avec sa campagne et son numéro de répétition.
+
+La sous-commande agreger parcourt l'entrepôt fichier par fichier, sans tout charger. Seules les lignes
+d'une répétition comptent (pas celles d'une phase 2 hors répétitions ni des classeurs importés), et
+pour chaque (campagne, répétition, point) seul le run le plus récent est gardé, comme pour l'export
+Excel : relancer la phase 2 remplace une répétition au lieu d'en ajouter une. Moyenne et variance de
+chaque point (expérience, paire, métrique, valeur de perturbation, ...) sont ensuite mises à jour par
+l'algorithme de Welford, puis vient l'intervalle de confiance bootstrap (percentiles des moyennes de
+BOOTSTRAP rééchantillonnages, tirés d'un bloc numpy pour tous les points de même taille). Les
+répétitions de plusieurs campagnes s'additionnent ; --campagne ou --depuis en retiennent une partie.
+Sortie .xlsx ou .csv, figures avec barres d'erreur (traceur.py) avec --figures.
+
+    python3 outils/repetitions.py phase2 03_perte_paquet/02_une_video/01_h264
+    python3 outils/repetitions.py agreger --experience 03_perte_paquet/02_une_video/01_h264 --campagne 20261019T101500 --figures barres
+"""
+import argparse
+import glob
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from rapport_campagne import ordre_colonne
+from regression import ecrire_resultats
+from resultats import RACINE_RESULTATS, EntrepotResultats, cle_perturbation
+
+POINT = ('experience', 'perturbation', 'codec', 'profile', 'protocole', 'nombre_hotes', 'paire', 'metrique',
+         'valeur_perturbation')
+COLONNES = POINT + ('repetitions', 'moyenne', 'ecart_type', 'erreur_type', 'ic_bas', 'ic_haut')
+BOOTSTRAP = 2000
+# Nombre maximal de tirages (points x rééchantillonnages x taille) générés d'un bloc
+BLOC_BOOTSTRAP = 4_000_000
+
+
+class MoyenneVariance:
+    """Moyenne et variance de chaque point, mises à jour run par run (Welford) ; les échantillons sont
+    gardés pour le bootstrap (quelques répétitions par point)."""
+
+    def __init__(self):
+        self.points = {}
+        self.n = np.zeros(0, dtype=np.int64)
+        self.moyenne = np.zeros(0)
+        self.m2 = np.zeros(0)
+        self.echantillons = []
+
+    def _indices(self, cles):
+        indices = np.array([self.points.setdefault(cle, len(self.points)) for cle in cles], dtype=np.int64)
+        nouveaux = len(self.points) - len(self.n)
+        if nouveaux:
+            self.n = np.concatenate([self.n, np.zeros(nouveaux, dtype=np.int64)])
+            self.moyenne = np.concatenate([self.moyenne, np.zeros(nouveaux)])
+            self.m2 = np.concatenate([self.m2, np.zeros(nouveaux)])
+            self.echantillons.extend([] for _ in range(nouveaux))
+        return indices
+
+    def ajouter(self, cles, valeurs):
+        """Ajoute une mesure par clé ; une clé répétée dans le même appel est traitée en plusieurs passes."""
+        indices, valeurs = self._indices(cles), np.asarray(valeurs, dtype=np.float64)
+        while len(indices):
+            _, premiers = np.unique(indices, return_index=True)
+            points, mesures = indices[premiers], valeurs[premiers]
+            self.n[points] += 1
+            ecart = mesures - self.moyenne[points]
+            self.moyenne[points] += ecart / self.n[points]
+            self.m2[points] += ecart * (mesures - self.moyenne[points])
+            for point, mesure in zip(points.tolist(), mesures.tolist()):
+                self.echantillons[point].append(mesure)
+            restants = np.ones(len(indices), dtype=bool)
+            restants[premiers] = False
+            indices, valeurs = indices[restants], valeurs[restants]
+
+    def ecart_type(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.n > 1, np.sqrt(self.m2 / (self.n - 1)), np.nan)
+
+    def bootstrap(self, niveau=0.95, tirages=BOOTSTRAP, graine=0):
+        """Bornes (bas, haut) de l'intervalle percentile de la moyenne ; NaN pour une seule répétition."""
+        generateur = np.random.default_rng(graine)
+        bas, haut = np.full(len(self.n), np.nan), np.full(len(self.n), np.nan)
+        for taille in np.unique(self.n[self.n > 1]).tolist():
+            groupe = np.flatnonzero(self.n == taille)
+            pas = max(1, BLOC_BOOTSTRAP // (tirages * taille))
+            for debut in range(0, len(groupe), pas):
+                bloc = groupe[debut:debut + pas]
+                echantillons = np.array([self.echantillons[point] for point in bloc.tolist()])
+                tirage = generateur.integers(0, taille, size=(len(bloc), tirages, taille))
+                moyennes = np.take_along_axis(echantillons[:, None, :], tirage, axis=2).mean(axis=2)
+                bas[bloc], haut[bloc] = np.percentile(moyennes, [50 * (1 - niveau), 50 * (1 + niveau)], axis=1)
+        return bas, haut
+
+
+def dernieres_mesures(entrepot, depuis=None, **filtres):
+    """{(campagne, repetition, *POINT): ((horodatage, run), valeur)} : valeur moyenne du run le plus récent
+    de chaque point de chaque répétition, fichier par fichier."""
+    mesures = {}
+    for lignes in entrepot.parcourir(**filtres):
+        retenues = np.isnan(lignes['temps_s']) & np.isfinite(lignes['valeur']) & (lignes['repetition'] >= 0)
+        if depuis is not None:
+            retenues &= lignes['horodatage'] >= depuis
+        if not retenues.any():
+            continue
+        colonnes = [lignes[nom][retenues].tolist() for nom in ('campagne', 'repetition') + POINT]
+        runs = zip(lignes['horodatage'][retenues].tolist(), lignes['run'][retenues].tolist())
+        for cle, run, valeur in zip(zip(*colonnes), runs, lignes['valeur'][retenues].tolist()):
+            if cle not in mesures or run > mesures[cle][0]:
+                mesures[cle] = (run, valeur)
+    return mesures
+
+
+def agreger(entrepot, depuis=None, niveau=0.95, tirages=BOOTSTRAP, **filtres):
+    """Lignes de résultats (dict par point, COLONNES) : une mesure par répétition de chaque point."""
+    statistiques = MoyenneVariance()
+    mesures = dernieres_mesures(entrepot, depuis, **filtres)
+    if mesures:
+        statistiques.ajouter([cle[2:] for cle in mesures], [valeur for _, valeur in mesures.values()])
+    ecart_type = statistiques.ecart_type()
+    bas, haut = statistiques.bootstrap(niveau, tirages)
+    resultats = []
+    for cle, point in sorted(statistiques.points.items()):
+        resultat = dict(zip(POINT, cle))
+        resultat['valeur_perturbation'] = cle_perturbation(resultat['valeur_perturbation'])
+        resultat.update({'repetitions': int(statistiques.n[point]), 'moyenne': float(statistiques.moyenne[point]),
+                         'ecart_type': float(ecart_type[point]),
+                         'erreur_type': float(ecart_type[point] / np.sqrt(statistiques.n[point])),
+                         'ic_bas': float(bas[point]), 'ic_haut': float(haut[point])})
+        resultats.append(resultat)
+    return resultats
+
+
+def traces_repetitions(resultats, repertoire):
+    """Une figure par (expérience, métrique, profil, nombre d'hôtes) : une courbe par paire avec barres d'erreur."""
+    from traceur import Trace
+
+    groupes = {}
+    for resultat in resultats:
+        cle = (resultat['experience'], resultat['metrique'], resultat['profile'], resultat['nombre_hotes'])
+        groupes.setdefault(cle, {}).setdefault((resultat['codec'], resultat['nombre_hotes'], resultat['paire']), []).append(resultat)
+    traces = []
+    for (experience, metrique, profile, hotes), par_paire in sorted(groupes.items()):
+        courbes = []
+        for colonne in sorted(par_paire, key=ordre_colonne):
+            points = sorted(par_paire[colonne], key=lambda resultat: resultat['valeur_perturbation'])
+            courbes.append((colonne[2], *([point[nom] for point in points]
+                                          for nom in ('valeur_perturbation', 'moyenne', 'ic_bas', 'ic_haut'))))
+        perturbation = par_paire[colonne][0]['perturbation']
+        nombre = max(point['repetitions'] for points in par_paire.values() for point in points)
+        traces.append(Trace(os.path.join(repertoire, f"{experience.replace('/', '_')}_{metrique}_{profile}_hotes_{hotes}.png"),
+                            f'{experience} : {metrique}, {profile}p ({nombre} répétitions)', perturbation, metrique,
+                            courbes, 'o'))
+    return traces
+
+
+def repertoires_repetitions(chemin_experience):
+    repertoires = [repertoire for repertoire in glob.glob(os.path.join(chemin_experience, 'repetitions', 'r*'))
+                   if os.path.isdir(repertoire) and os.path.basename(repertoire)[1:].isdigit()]
+    return sorted(repertoires, key=lambda repertoire: int(os.path.basename(repertoire)[1:]))
+
+
+class Main:
+    @staticmethod
+    def main():
+        from experiences import RACINE
+
+        parser = argparse.ArgumentParser(description="Répétitions d'une campagne : phase 2 par répétition et agrégation.")
+        commandes = parser.add_subparsers(dest='commande', required=True)
+        phase2 = commandes.add_parser('phase2', help="lance classe_2_experimentation.py dans chaque repetitions/r<n>/")
+        phase2.add_argument('experience', help="répertoire de l'expérience, relatif à la racine du dépôt")
+        agregation = commandes.add_parser('agreger', help="moyenne, écart type et intervalle bootstrap de chaque point")
+        agregation.add_argument('--racine', default=RACINE_RESULTATS, help="répertoire de l'entrepôt")
+        agregation.add_argument('--sortie', default='repetitions.xlsx', help="fichier produit (.xlsx ou .csv)")
+        agregation.add_argument('--figures', help="répertoire des figures avec barres d'erreur (aucune par défaut)")
+        agregation.add_argument('--experience', action='append', help="expérience (répétable)")
+        agregation.add_argument('--profile', type=int, action='append', help="profil vidéo (répétable)")
+        agregation.add_argument('--metrique', action='append', help="métrique (répétable, toutes par défaut)")
+        agregation.add_argument('--campagne', action='append', help="campagne (repetitions/campagne.txt, répétable)")
+        agregation.add_argument('--depuis', help="ne garde que les runs à partir de cette date (AAAA-MM-JJ)")
+        agregation.add_argument('--niveau', type=float, default=0.95, help="niveau des intervalles de confiance")
+        agregation.add_argument('--tirages', type=int, default=BOOTSTRAP, help="rééchantillonnages bootstrap")
+        agregation.add_argument('--travailleurs', type=int, help="processus de tracé (par défaut : nombre de cœurs)")
+        args = parser.parse_args()
+
+        if args.commande == 'phase2':
+            chemin_experience = os.path.join(RACINE, args.experience)
+            repertoires = repertoires_repetitions(chemin_experience)
+            if not repertoires:
+                parser.error(f"aucun répertoire repetitions/r<n> dans {chemin_experience}")
+            for repertoire in repertoires:
+                print(f"Phase 2 de la répétition {os.path.basename(repertoire)}")
+                subprocess.run([sys.executable, os.path.join(chemin_experience, 'classe_2_experimentation.py')],
+                               cwd=repertoire, check=True)
+            return
+
+        depuis = time.mktime(time.strptime(args.depuis, '%Y-%m-%d')) if args.depuis else None
+        resultats = agreger(EntrepotResultats(args.racine), depuis, args.niveau, args.tirages,
+                            experience=args.experience, profile=args.profile, metrique=args.metrique,
+                            campagne=args.campagne)
+        if not resultats:
+            parser.error(f"aucune répétition (repetitions/r<n>) dans {args.racine} pour ces filtres")
+        ecrire_resultats(resultats, args.sortie, COLONNES)
+        message = f"{args.sortie} : {len(resultats)} points, jusqu'à {max(r['repetitions'] for r in resultats)} répétitions"
+        if args.figures:
+            from traceur import tracer_lot
+
+            os.makedirs(args.figures, exist_ok=True)
+            message += f", {len(tracer_lot(traces_repetitions(resultats, args.figures), args.travailleurs))} figures"
+        print(message)
+
+
+if __name__ == "__main__":
+    Main.main()
@@ -0,0 +1,343 @@
+"""Entrepôt de résultats en colonnes, sortie de référence de chaque exécution de classe_2_experimentation.py.
+
+Chaque exécution (run) ajoute un fichier .npz (tableaux numpy, sans pickle) sous
+resultats/<expérience>/, écrit de façon atomique (fichier temporaire puis os.replace) : un lecteur
+ne voit jamais un run à moitié écrit et plusieurs expériences peuvent écrire en même temps.
+Toutes les lignes suivent le même schéma (SCHEMA, version VERSION_SCHEMA) :
+
+    run, horodatage, campagne, repetition, experience, perturbation, valeur_perturbation, codec, profile,
+    protocole, nombre_hotes, paire, metrique, temps_s, valeur
+
+temps_s vaut NaN pour une valeur moyenne et donne le début de fenêtre pour les séries temporelles
+(series_qos.py). campagne et repetition identifient une répétition d'une campagne (phase 2 lancée dans
+repetitions/r<n>/, voir repetitions.py) ; hors répétitions, campagne est vide et repetition vaut -1, comme
+pour les fichiers de la version 1 du schéma. Les classeurs Excel ne sont plus qu'un export :
+
+    python3 outils/resultats.py resume
+    python3 outils/resultats.py csv --perturbation loss --codec h264 > loss_h264.csv
+    python3 outils/resultats.py excel --experience 03_perte_paquet/02_une_video/01_h264
+    python3 outils/resultats.py importer 01_bande_passante/02_une_video/002_h264/excel_files_*/*.xlsx
+"""
+import argparse
+import csv
+import glob
+import os
+import re
+import sys
+import time
+import uuid
+
+import numpy as np
+
+RACINE_RESULTATS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'resultats')
+VERSION_SCHEMA = 2
+SCHEMA = (
+    ('run', str),
+    ('horodatage', np.float64),
+    ('campagne', str),
+    ('repetition', np.int32),
+    ('experience', str),
+    ('perturbation', str),
+    ('valeur_perturbation', np.float64),
+    ('codec', str),
+    ('profile', np.int32),
+    ('protocole', str),
+    ('nombre_hotes', np.int32),
+    ('paire', str),
+    ('metrique', str),
+    ('temps_s', np.float64),
+    ('valeur', np.float64),
+)
+COLONNES = tuple(nom for nom, _ in SCHEMA)
+# Nom de dictionnaire attendu par ExcelSaver.save_metrics_to_excel (suffixe des répertoires excel_files_*)
+NOMS_EXCEL = {
+    'bitrate': 'dict_name_qos_bitrate',
+    'packet_loss': 'dict_name_qos_packetLoss',
+    'average_latency': 'dict_name_qos_averageLatency',
+    'average_jitter': 'dict_name_qos_averageJitter',
+    'psnr': 'dict_name_qoe_psnr',
+    'ssim': 'dict_name_qoe_ssim',
+}
+METRIQUE_PAR_SUFFIXE = {nom.split('_')[-1]: metrique for metrique, nom in NOMS_EXCEL.items()}
+FICHIER_EXCEL = re.compile(r'resultats_(?P<perturbation>.+)_(?P<protocole>[^_]+)_hotes_(?P<nombre_hotes>\d+)_'
+                           r'(?P<codec>[^_]+)_(?P<profile>\d+)_(?P<suffixe>[^_]+)\.xlsx$')
+CONTEXTE = ('experience', 'perturbation', 'codec', 'profile', 'protocole', 'nombre_hotes')
+# Colonnes ajoutées par la version 2 du schéma et leur valeur pour les fichiers de la version 1
+AJOUTS_VERSION_2 = {'campagne': '', 'repetition': -1}
+
+
+def cle_perturbation(valeur):
+    # Les valeurs de perturbation sont des entiers dans toutes les expériences (24, 500, 15, ...)
+    valeur = float(valeur)
+    return int(valeur) if valeur.is_integer() else valeur
+
+
+def repetition_courante(repertoire='.'):
+    """(campagne, repetition) d'une phase 2 lancée dans <expérience>/repetitions/r<n>/, ('', -1) ailleurs.
+
+    La campagne est l'identifiant écrit par la phase 1 dans repetitions/campagne.txt ; à défaut (campagne
+    antérieure), le chemin du répertoire repetitions, stable d'une relance de la phase 2 à l'autre."""
+    repertoire = os.path.abspath(repertoire)
+    nom, parent = os.path.basename(repertoire), os.path.dirname(repertoire)
+    if os.path.basename(parent) != 'repetitions' or not re.fullmatch(r'r\d+', nom):
+        return '', -1
+    fichier = os.path.join(parent, 'campagne.txt')
+    campagne = ''
+    if os.path.exists(fichier):
+        with open(fichier) as f:
+            campagne = f.read().strip()
+    return campagne or parent, int(nom[1:])
+
+
+class RunResultats:
+    """Lignes d'une exécution, accumulées en morceaux de colonnes puis écrites d'un bloc."""
+
+    def __init__(self, repertoire, experience, perturbation, codec, profile, protocole, nombre_hotes, campagne='',
+                 repetition=-1):
+        self.repertoire = repertoire
+        self.run = f"{time.strftime('%Y%m%dT%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        self.horodatage = time.time()
+        self.contexte = {'campagne': campagne, 'repetition': int(repetition),
+                         'experience': experience, 'perturbation': perturbation, 'codec': codec,
+                         'profile': int(profile), 'protocole': protocole, 'nombre_hotes': int(nombre_hotes)}
+        # Morceaux (paire, metrique, valeurs de perturbation, temps_s, valeurs)
+        self.morceaux = []
+
+    def ajouter_metrique(self, metrique, resultats):
+        """resultats : {paire: {valeur de perturbation: valeur}}, comme les dictionnaires des collecteurs."""
+        for paire, valeurs in resultats.items():
+            if not valeurs:
+                continue
+            cles = sorted(valeurs)
+            self.morceaux.append((paire, metrique, np.array(cles, dtype=np.float64), np.full(len(cles), np.nan),
+                                  np.array([valeurs[cle] for cle in cles], dtype=np.float64)))
+
+    def ajouter_series(self, metrique, series):
+        """series : {paire: {valeur de perturbation: (temps_s, valeurs)}}, comme QoSMetricsCollector.series_metrique."""
+        for paire, series_par_valeur in series.items():
+            for valeur_perturbation, (temps, valeurs) in sorted(series_par_valeur.items()):
+                self.morceaux.append((paire, metrique, np.full(len(temps), valeur_perturbation, dtype=np.float64),
+                                      np.asarray(temps, dtype=np.float64), np.asarray(valeurs, dtype=np.float64)))
+
+    def colonnes(self):
+        longueurs = [len(morceau[2]) for morceau in self.morceaux]
+        total = sum(longueurs)
+
+        def repeter(valeurs):
+            return np.repeat(np.array(valeurs), longueurs) if valeurs else np.zeros(0, dtype=str)
+
+        colonnes = {
+            'run': np.full(total, self.run),
+            'horodatage': np.full(total, self.horodatage),
+            'paire': repeter([morceau[0] for morceau in self.morceaux]),
+            'metrique': repeter([morceau[1] for morceau in self.morceaux]),
+            'valeur_perturbation': np.concatenate([morceau[2] for morceau in self.morceaux]) if total else np.zeros(0),
+            'temps_s': np.concatenate([morceau[3] for morceau in self.morceaux]) if total else np.zeros(0),
+            'valeur': np.concatenate([morceau[4] for morceau in self.morceaux]) if total else np.zeros(0),
+        }
+        for nom, valeur in self.contexte.items():
+            colonnes[nom] = np.full(total, valeur)
+        return {nom: colonnes[nom].astype(type_colonne) for nom, type_colonne in SCHEMA}
+
+    def ecrire(self, partie='resultats'):
+        """Écrit les lignes accumulées depuis le dernier appel dans <run>_<partie>.npz ; renvoie le chemin."""
+        if not self.morceaux:
+            return None
+        os.makedirs(self.repertoire, exist_ok=True)
+        chemin = os.path.join(self.repertoire, f"{self.run}_{partie}.npz")
+        temporaire = os.path.join(self.repertoire, f".{self.run}_{partie}.npz.tmp")
+        with open(temporaire, 'wb') as f:
+            np.savez_compressed(f, version_schema=VERSION_SCHEMA, **self.colonnes())
+        os.replace(temporaire, chemin)
+        self.morceaux = []
+        return chemin
+
+
+class EntrepotResultats:
+    def __init__(self, racine=RACINE_RESULTATS):
+        self.racine = racine
+
+    def nouveau_run(self, experience, perturbation, codec, profile, protocole, nombre_hotes, campagne='', repetition=-1):
+        return RunResultats(os.path.join(self.racine, experience), experience, perturbation, codec, profile,
+                            protocole, nombre_hotes, campagne, repetition)
+
+    def fichiers(self):
+        return sorted(glob.glob(os.path.join(self.racine, '**', '*.npz'), recursive=True))
+
+    @staticmethod
+    def lire_fichier(chemin):
+        with np.load(chemin, allow_pickle=False) as donnees:
+            version = int(donnees['version_schema']) if 'version_schema' in donnees.files else None
+            if version not in (1, VERSION_SCHEMA):
+                raise ValueError(f"{chemin} : version de schéma {version}, attendue {VERSION_SCHEMA}")
+            colonnes = {nom: donnees[nom] for nom in COLONNES if nom in donnees.files}
+        lignes = len(colonnes['run'])
+        for nom, type_colonne in SCHEMA:
+            if nom not in colonnes:
+                colonnes[nom] = np.full(lignes, AJOUTS_VERSION_2[nom]).astype(type_colonne)
+        return colonnes
+
+    def parcourir(self, **filtres):
+        """Lignes filtrées de chaque fichier (une partie d'un run), un fichier à la fois, par ordre de nom."""
+        for chemin in self.fichiers():
+            colonnes = self.lire_fichier(chemin)
+            masque = np.ones(len(colonnes['run']), dtype=bool)
+            for nom, valeur in filtres.items():
+                if valeur is None:
+                    continue
+                valeurs = valeur if isinstance(valeur, (list, tuple, set)) else [valeur]
+                masque &= np.isin(colonnes[nom], list(valeurs))
+            yield {nom: colonne[masque] for nom, colonne in colonnes.items()}
+
+    def lire(self, **filtres):
+        """Toutes les lignes (dict colonne -> tableau), filtrées par égalité (ou appartenance à une liste)."""
+        morceaux = list(self.parcourir(**filtres))
+        if not morceaux:
+            return {nom: np.zeros(0, dtype=type_colonne) for nom, type_colonne in SCHEMA}
+        return {nom: np.concatenate([morceau[nom] for morceau in morceaux]) for nom in COLONNES}
+
+    def tableau(self, metrique, **filtres):
+        """{paire: {valeur de perturbation: valeur}} des valeurs moyennes ; le run le plus récent l'emporte."""
+        lignes = self.lire(metrique=metrique, **filtres)
+        resultats = {}
+        scalaires = np.isnan(lignes['temps_s'])
+        for index in np.flatnonzero(scalaires)[np.argsort(lignes['horodatage'][scalaires], kind='stable')]:
+            resultats.setdefault(str(lignes['paire'][index]), {})[cle_perturbation(lignes['valeur_perturbation'][index])] = float(lignes['valeur'][index])
+        return resultats
+
+    def series(self, metrique, **filtres):
+        """{paire: {valeur de perturbation: (temps_s, valeurs)}} du run le plus récent de chaque série."""
+        resultats = {}
+        for (_, _, _, _, _, paire), par_valeur in self.separer_series(self.lire(metrique=metrique, **filtres)).items():
+            resultats.setdefault(paire, {}).update(par_valeur)
+        return resultats
+
+    @staticmethod
+    def separer_series(lignes):
+        """{(metrique, perturbation, codec, profile, nombre_hotes, paire): {valeur de perturbation: (temps_s, valeurs)}}
+        des lignes de séries temporelles, en ne gardant que le run le plus récent de chaque série."""
+        groupes = {}
+        for index in np.flatnonzero(~np.isnan(lignes['temps_s'])):
+            cle = (str(lignes['metrique'][index]), str(lignes['perturbation'][index]), str(lignes['codec'][index]),
+                   int(lignes['profile'][index]), int(lignes['nombre_hotes'][index]), str(lignes['paire'][index]))
+            run = (lignes['horodatage'][index], str(lignes['run'][index]))
+            groupes.setdefault(cle, {}).setdefault(cle_perturbation(lignes['valeur_perturbation'][index]), {}).setdefault(run, []).append(index)
+        resultats = {}
+        for cle, par_valeur in groupes.items():
+            for valeur_perturbation, runs in par_valeur.items():
+                indices = np.array(runs[max(runs)])
+                indices = indices[np.argsort(lignes['temps_s'][indices], kind='stable')]
+                resultats.setdefault(cle, {})[valeur_perturbation] = (lignes['temps_s'][indices], lignes['valeur'][indices])
+        return resultats
+
+    def contextes(self, **filtres):
+        """Combinaisons distinctes (experience, perturbation, codec, profile, protocole, nombre_hotes)."""
+        lignes = self.lire(**filtres)
+        return sorted(set(zip(*(lignes[nom].tolist() for nom in CONTEXTE))))
+
+
+def importer_excel(entrepot, chemin, experience):
+    """Ajoute à l'entrepôt un classeur produit par l'ancien ExcelSaver (feuille active : perturbation x paires)."""
+    import openpyxl
+
+    correspondance = FICHIER_EXCEL.search(os.path.basename(chemin))
+    if not correspondance or correspondance['suffixe'] not in METRIQUE_PAR_SUFFIXE:
+        raise ValueError(f"Nom de classeur non reconnu : {chemin}")
+    classeur = openpyxl.load_workbook(chemin, read_only=True)
+    lignes = list(classeur.worksheets[0].values)
+    classeur.close()
+    paires = [paire for paire in lignes[0][1:] if paire]
+    resultats = {paire: {} for paire in paires}
+    for ligne in lignes[1:]:
+        if ligne[0] is None:
+            continue
+        for paire, valeur in zip(paires, ligne[1:]):
+            if isinstance(valeur, (int, float)):
+                resultats[paire][cle_perturbation(ligne[0])] = valeur
+    run = entrepot.nouveau_run(experience, correspondance['perturbation'], correspondance['codec'],
+                               correspondance['profile'], correspondance['protocole'], correspondance['nombre_hotes'])
+    run.ajouter_metrique(METRIQUE_PAR_SUFFIXE[correspondance['suffixe']], resultats)
+    return run.ecrire(f"import_{correspondance['suffixe']}")
+
+
+def exporter_excel(entrepot, experience, repertoire=None, graphique=None):
+    """Régénère les classeurs de l'expérience avec son ExcelSaver, à partir des runs les plus récents."""
+    import openpyxl
+    from openpyxl import Workbook
+    from openpyxl.chart import Reference, ScatterChart, Series
+    from openpyxl.drawing.image import Image
+    from experiences import EXPERIENCE_DEFAUT, RACINE, charger_classe
+    from traceur import Trace, tracer_lot
+
+    # ExcelSaver est le même dans toutes les expériences ; 01_bande_passante/02_une_video/002_h264 n'a pas de phase 2
+    chemin_classe = os.path.join(RACINE, experience, 'classe_2_experimentation.py')
+    if not os.path.exists(chemin_classe):
+        chemin_classe = os.path.join(EXPERIENCE_DEFAUT, 'classe_2_experimentation.py')
+    excel_saver = charger_classe(chemin_classe, 'ExcelSaver', openpyxl=openpyxl, Workbook=Workbook, Image=Image,
+                                 Reference=Reference, ScatterChart=ScatterChart, Series=Series, Trace=Trace,
+                                 tracer_lot=tracer_lot)
+    if graphique:
+        excel_saver.MODE_GRAPHIQUE = graphique
+    repertoire_courant = os.getcwd()
+    os.chdir(repertoire or os.path.join(RACINE, experience))
+    try:
+        for _, perturbation, codec, profile, protocole, nombre_hotes in entrepot.contextes(experience=experience):
+            filtres = dict(experience=experience, perturbation=perturbation, codec=codec, profile=profile,
+                           protocole=protocole, nombre_hotes=nombre_hotes)
+            for metrique, nom in NOMS_EXCEL.items():
+                tableau = entrepot.tableau(metrique, **filtres)
+                if tableau:
+                    excel_saver.save_metrics_to_excel(tableau, nom, codec, profile, perturbation, protocole, nombre_hotes,
+                                                      series=entrepot.series(metrique, **filtres))
+                    print(f"Classeur {metrique} exporté ({perturbation}, {codec}, {profile}, {nombre_hotes} hôtes).")
+    finally:
+        os.chdir(repertoire_courant)
+
+
+class Main:
+    @staticmethod
+    def main():
+        parser = argparse.ArgumentParser(description="Entrepôt de résultats en colonnes : résumé, export CSV/Excel, import.")
+        parser.add_argument('--racine', default=RACINE_RESULTATS, help="répertoire de l'entrepôt")
+        commandes = parser.add_subparsers(dest='commande', required=True)
+        commandes.add_parser('resume', help="nombre de lignes par expérience et par métrique")
+        export_csv = commandes.add_parser('csv', help="lignes filtrées au format CSV sur la sortie standard")
+        for nom in ('experience', 'perturbation', 'codec', 'metrique', 'paire'):
+            export_csv.add_argument(f'--{nom}')
+        export_excel = commandes.add_parser('excel', help="classeurs de l'expérience avec son ExcelSaver")
+        export_excel.add_argument('--experience', required=True, help="ex. 03_perte_paquet/02_une_video/01_h264")
+        export_excel.add_argument('--repertoire', help="répertoire de sortie (par défaut celui de l'expérience)")
+        export_excel.add_argument('--graphique', choices=['image', 'natif'],
+                                  help="figures matplotlib ou graphiques Excel natifs (ExcelSaver.MODE_GRAPHIQUE)")
+        importer = commandes.add_parser('importer', help="ajoute des classeurs de l'ancien ExcelSaver")
+        importer.add_argument('classeurs', nargs='+')
+        importer.add_argument('--experience', help="par défaut déduite du chemin (répertoire parent de excel_files_*)")
+        args = parser.parse_args()
+
+        entrepot = EntrepotResultats(args.racine)
+        if args.commande == 'resume':
+            lignes = entrepot.lire()
+            comptes = {}
+            for experience, metrique in zip(lignes['experience'].tolist(), lignes['metrique'].tolist()):
+                comptes[(experience, metrique)] = comptes.get((experience, metrique), 0) + 1
+            print(f"{len(entrepot.fichiers())} fichiers, {len(np.unique(lignes['run']))} runs, {len(lignes['run'])} lignes")
+            for (experience, metrique), nombre in sorted(comptes.items()):
+                print(f"{experience:45} {metrique:16} {nombre}")
+        elif args.commande == 'csv':
+            lignes = entrepot.lire(experience=args.experience, perturbation=args.perturbation, codec=args.codec,
+                                   metrique=args.metrique, paire=args.paire)
+            ecrivain = csv.writer(sys.stdout)
+            ecrivain.writerow(COLONNES)
+            ecrivain.writerows(zip(*(lignes[nom].tolist() for nom in COLONNES)))
+        elif args.commande == 'excel':
+            exporter_excel(entrepot, args.experience, args.repertoire, args.graphique)
+        else:
+            from experiences import RACINE
+            for classeur in args.classeurs:
+                experience = args.experience or os.path.relpath(
+                    os.path.dirname(os.path.dirname(os.path.abspath(classeur))), RACINE)
+                print(f"{classeur} -> {importer_excel(entrepot, classeur, experience)}")
+
+
+if __name__ == "__main__":
+    Main.main()
@@ -0,0 +1,141 @@
+"""Séries temporelles QoS d'une capture : débit, perte, latence et gigue par fenêtre (100 ms à 5 s).
+
+Un seul passage d'AnalyseurTCP (analyse_tcp.py) donne à la fois le résumé de la capture et les
+événements datés (paquets, segments de données, échantillons RTT) ; l'agrégation par fenêtre est
+ensuite vectorisée (np.bincount sur les indices de fenêtre). Mêmes définitions que analyse_tcp.py,
+fenêtre par fenêtre :
+    debit_mbps       octets des trames du flux / durée de la fenêtre
+    perte_pct        segments de données retransmis / segments de données
+    latence_ms       RTT moyen des segments acquittés dans la fenêtre (ceux du client s'il y en a)
+    gigue_ms         variation moyenne des inter-arrivées des segments de données du serveur
+
+Les séries sont stockées en colonnes dans <capture>.series_<fenetre>ms.npz, lues par
+QoSMetricsCollector (FENETRE_SERIES) et tracées par ExcelSaver. Le résumé est affiché au format de
+qos_script_calcul.sh (ligne « bitrate: ... ») : avec FENETRE_SERIES, QoSMetricsCollector y lit les
+moyennes au lieu de relire la capture avec le script bash.
+
+    python3 outils/series_qos.py h1_h2.pcapng --serveur 10.1.1.1 --client 10.1.1.2 --fenetre 0.5
+"""
+import argparse
+import os
+
+import numpy as np
+
+from analyse_tcp import PAUSE_MAX, AnalyseurTCP, ligne_bash
+
+FENETRE_MIN = 0.1
+FENETRE_MAX = 5.0
+COLONNES = ('temps_s', 'paquets', 'octets', 'debit_mbps', 'segments_donnees', 'retransmissions', 'perte_pct',
+            'latence_ms', 'gigue_ms')
+
+
+def chemin_series(capture, fenetre):
+    return f"{capture}.series_{round(fenetre * 1000)}ms.npz"
+
+
+def _moyenne(sommes, nombres):
+    return np.divide(sommes, nombres, out=np.zeros(len(sommes)), where=nombres > 0)
+
+
+def series_fenetrees(releve, fenetre):
+    """Colonnes par fenêtre (dict nom -> tableau numpy) à partir d'un ReleveTCP ; fenêtres vides comprises."""
+    if not FENETRE_MIN <= fenetre <= FENETRE_MAX:
+        raise ValueError(f"Fenêtre hors de [{FENETRE_MIN}, {FENETRE_MAX}] s : {fenetre}")
+    ts = np.frombuffer(releve.ts, dtype=np.float64)
+    if not len(ts):
+        return dict({nom: np.zeros(0, dtype=np.float32) for nom in COLONNES}, origine=0.0, fenetre_s=fenetre)
+    origine = ts[0]
+    nombre = int((ts[-1] - origine) // fenetre) + 1
+
+    def compter(instants, poids=None):
+        indices = ((instants - origine) // fenetre).astype(np.int64)
+        return np.bincount(indices, weights=poids, minlength=nombre)[:nombre]
+
+    paquets = compter(ts)
+    octets = compter(ts, np.frombuffer(releve.octets, dtype=np.int64))
+
+    ts_donnees = np.frombuffer(releve.ts_donnees, dtype=np.float64)
+    retransmis = np.frombuffer(releve.retransmis, dtype=np.int8).astype(np.float64)
+    segments = compter(ts_donnees)
+    retransmissions = compter(ts_donnees, retransmis)
+
+    # Même choix que AnalyseurTCP.resume : RTT des segments du client, sinon ceux du serveur
+    ts_rtt = np.frombuffer(releve.ts_rtt, dtype=np.float64)
+    rtt = np.frombuffer(releve.rtt, dtype=np.float64)
+    montant = np.frombuffer(releve.rtt_montant, dtype=np.int8).astype(bool)
+    if montant.any():
+        ts_rtt, rtt = ts_rtt[montant], rtt[montant]
+    latence = _moyenne(compter(ts_rtt, rtt), compter(ts_rtt))
+
+    # Gigue : |différence de deux inter-arrivées consécutives|, hors pauses entre segments HLS,
+    # datée à l'arrivée du troisième segment (comme le calcul séquentiel de analyse_tcp.py)
+    descendant = np.frombuffer(releve.descendant, dtype=np.int8).astype(bool)
+    arrivees = ts_donnees[descendant]
+    interarrivees = np.diff(arrivees)
+    valides = interarrivees <= PAUSE_MAX
+    paires = valides[1:] & valides[:-1]
+    gigues = np.abs(np.diff(interarrivees))[paires]
+    instants_gigue = arrivees[2:][paires]
+    gigue = _moyenne(compter(instants_gigue, gigues), compter(instants_gigue))
+
+    return {
+        'temps_s': (np.arange(nombre) * fenetre).astype(np.float32),
+        'paquets': paquets.astype(np.int32),
+        'octets': octets.astype(np.int64),
+        'debit_mbps': (octets * 8 / (fenetre * 1e6)).astype(np.float32),
+        'segments_donnees': segments.astype(np.int32),
+        'retransmissions': retransmissions.astype(np.int32),
+        'perte_pct': (100.0 * _moyenne(retransmissions, segments)).astype(np.float32),
+        'latence_ms': (1000 * latence).astype(np.float32),
+        'gigue_ms': (1000 * gigue).astype(np.float32),
+        'origine': origine,
+        'fenetre_s': fenetre,
+    }
+
+
+def calculer_series(capture, ip_serveur, ip_client, port=None, fenetre=1.0):
+    """(résumé de la capture, séries par fenêtre) en un seul passage d'AnalyseurTCP."""
+    analyseur = AnalyseurTCP(ip_serveur, ip_client, port, releve=True)
+    resume = analyseur.analyser(capture)
+    return resume, series_fenetrees(analyseur.releve, fenetre)
+
+
+def ecrire_series(chemin, series):
+    # Écriture atomique : un lecteur ne voit jamais un fichier .npz à moitié écrit
+    temporaire = chemin + '.tmp'
+    with open(temporaire, 'wb') as f:
+        np.savez_compressed(f, **series)
+    os.replace(temporaire, chemin)
+
+
+def lire_series(chemin):
+    with np.load(chemin) as series:
+        return {nom: series[nom] for nom in series.files}
+
+
+class Main:
+    @staticmethod
+    def main():
+        parser = argparse.ArgumentParser(description="Séries temporelles QoS par fenêtre d'une capture.")
+        parser.add_argument('capture', help="capture pcapng/pcap ou '-' pour l'entrée standard")
+        parser.add_argument('--serveur', required=True, help="adresse IP du serveur vidéo")
+        parser.add_argument('--client', required=True, help="adresse IP du client")
+        parser.add_argument('--port', type=int, help="port vidéo du serveur")
+        parser.add_argument('--fenetre', type=float, default=1.0,
+                            help=f"durée d'une fenêtre en secondes ({FENETRE_MIN} à {FENETRE_MAX})")
+        parser.add_argument('--sortie', help="fichier .npz (par défaut <capture>.series_<fenetre>ms.npz)")
+        args = parser.parse_args()
+        if not FENETRE_MIN <= args.fenetre <= FENETRE_MAX:
+            parser.error(f"--fenetre doit être comprise entre {FENETRE_MIN} et {FENETRE_MAX} s")
+        if args.capture == '-' and not args.sortie:
+            parser.error("--sortie est obligatoire quand la capture est lue sur l'entrée standard")
+
+        resume, series = calculer_series(args.capture, args.serveur, args.client, args.port, args.fenetre)
+        sortie = args.sortie or chemin_series(args.capture, args.fenetre)
+        ecrire_series(sortie, series)
+        print(ligne_bash(resume))
+        print(f"{len(series['temps_s'])} fenêtres de {args.fenetre} s écrites dans {sortie}")
+
+
+if __name__ == "__main__":
+    Main.main()
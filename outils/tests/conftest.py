@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Les outils s'importent entre eux par leur nom de fichier (from analyse_tcp import ...), comme lancés depuis outils/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,95 @@
+"""analyse_tcp.py face à la vérité terrain de generateur_pcapng.py, et qos_direct.py / qos_segments.py
+face à analyse_tcp.py (une seule définition des métriques)."""
+import pytest
+
+from analyse_tcp import AnalyseurTCP, ligne_bash
+from generateur_pcapng import PcapngWriter, SessionHLS, generer_capture
+from lecteur_pcapng import lire_paquets
+from qos_direct import AnalyseurDirect
+from qos_segments import CaptureSegmentee
+
+SERVEUR, CLIENT, PORT = '10.1.1.1', '10.1.1.2', 5000
+
+
+def capturer(tmp_path, **parametres):
+    chemin = str(tmp_path / 'h1_h2.pcapng')
+    verite = generer_capture(chemin, 1, 2, PORT, duree=20, **parametres)
+    return chemin, verite, AnalyseurTCP(SERVEUR, CLIENT).analyser(chemin)
+
+
+@pytest.mark.parametrize('parametres', [{}, {'delai_ms': 100, 'gigue_ms': 10}, {'delai_ms': 1000, 'gigue_ms': 100}])
+def test_sans_perte_aucune_retransmission(tmp_path, parametres):
+    # La gigue réordonne les segments : aucun ne doit être compté comme retransmis
+    _, verite, resume = capturer(tmp_path, **parametres)
+    assert verite['retransmissions'] == 0
+    assert resume['retransmissions'] == 0
+    assert resume['perte_pct'] == 0.0
+
+
+@pytest.mark.parametrize('parametres', [{'perte_pct': 2}, {'perte_pct': 5}, {'perte_pct': 15},
+                                        {'delai_ms': 50, 'gigue_ms': 5, 'perte_pct': 3}])
+def test_retransmissions_face_a_la_verite(tmp_path, parametres):
+    _, verite, resume = capturer(tmp_path, **parametres)
+    assert verite['retransmissions'] > 0
+    # Aucun faux positif ; les retransmissions manquées (réémission de même identifiant IP que la
+    # séquence maximale, par exemple) restent sous 2 % des retransmissions reçues
+    assert resume['retransmissions'] <= verite['retransmissions']
+    assert resume['retransmissions'] >= 0.98 * verite['retransmissions']
+
+
+@pytest.mark.parametrize('parametres', [{'perte_pct': 5}, {'delai_ms': 50, 'gigue_ms': 5, 'perte_pct': 3}])
+def test_latence_et_gigue_face_a_la_verite(tmp_path, parametres):
+    _, verite, resume = capturer(tmp_path, **parametres)
+    assert resume['latence_ms'] == pytest.approx(verite['latence_ms'], rel=1e-9, abs=1e-9)
+    assert resume['gigue_ms'] == pytest.approx(verite['gigue_ms'], rel=1e-6)
+
+
+def test_memes_lignes_pour_les_trois_analyseurs(tmp_path):
+    trames = []
+    SessionHLS(1, 2, PORT, delai_ms=50, gigue_ms=5, perte_pct=3, duree=20).generer(
+        lambda ts, trame: trames.append((ts, trame)))
+    chemin = str(tmp_path / 'h1_h2.pcapng')
+    with PcapngWriter(chemin) as writer:
+        for ts, trame in trames:
+            writer.ecrire(ts, trame)
+    attendue = ligne_bash(AnalyseurTCP(SERVEUR, CLIENT).analyser(chemin))
+
+    direct = AnalyseurDirect(SERVEUR, CLIENT, PORT)
+    for paquet in lire_paquets(chemin):
+        direct.ajouter(paquet)
+    assert direct.terminer() == attendue
+
+    # Anneau de 5 segments : l'état TCP doit suivre les raccords
+    capture = CaptureSegmentee(SERVEUR, CLIENT, PORT, travailleurs=2)
+    taille = len(trames) // 5 + 1
+    for numero in range(5):
+        segment = str(tmp_path / f'h1_h2_{numero:05d}_20240705120000.pcapng')
+        with PcapngWriter(segment) as writer:
+            for ts, trame in trames[numero * taille:(numero + 1) * taille]:
+                writer.ecrire(ts, trame)
+        capture.soumettre(segment)
+    assert capture.terminer() == attendue
+
+
+@pytest.mark.parametrize('parametres', [{'perte_pct': 15}, {'delai_ms': 1000, 'gigue_ms': 100, 'perte_pct': 5}])
+def test_segments_raccordes_comme_la_capture_entiere(tmp_path, parametres):
+    trames = []
+    SessionHLS(1, 2, PORT, duree=30, **parametres).generer(lambda ts, trame: trames.append((ts, trame)))
+    chemin = str(tmp_path / 'h1_h2.pcapng')
+    with PcapngWriter(chemin) as writer:
+        for ts, trame in trames:
+            writer.ecrire(ts, trame)
+    attendu = AnalyseurTCP(SERVEUR, CLIENT).analyser(chemin)
+
+    # Coupes à des rangs quelconques, au milieu des échanges ; avec 1 s de délai, l'état du travailleur
+    # ne rejoint pas toujours l'état réel au point de raccord et des connexions sont relues en série
+    coupes = [0, 1, 2, 997, 3001, 4500, 7777, len(trames)]
+    capture = CaptureSegmentee(SERVEUR, CLIENT, PORT, travailleurs=2)
+    for numero, (debut, fin) in enumerate(zip(coupes, coupes[1:])):
+        segment = str(tmp_path / f'h1_h2_{numero:05d}_20240705120000.pcapng')
+        with PcapngWriter(segment) as writer:
+            for ts, trame in trames[debut:fin]:
+                writer.ecrire(ts, trame)
+        capture.soumettre(segment)
+    capture.terminer()
+    assert capture.analyseur.resume() == attendu
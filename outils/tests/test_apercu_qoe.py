@@ -0,0 +1,42 @@
+"""Bornes de l'aperçu (apercu_qoe.bornes, marge_bornes) et fenêtres échantillonnées de qoe_numpy, sans ffmpeg."""
+import pytest
+
+from apercu_qoe import COLONNES_BORNES, bornes, marge_bornes
+from qoe_numpy import fenetres
+from regression import ecrire_resultats
+
+
+def detail(codec, profil, degradation, ecart_psnr, ecart_ssim, pas_images=5, reduction=2):
+    return {'codec': codec, 'profil': profil, 'degradation': degradation, 'pas_images': pas_images,
+            'reduction': reduction, 'fenetre_s': 2.0, 'psnr': 30.0, 'psnr_apercu': 30.0 + ecart_psnr,
+            'ecart_psnr': ecart_psnr, 'ssim': 0.9, 'ssim_apercu': 0.9 + ecart_ssim, 'ecart_ssim': ecart_ssim,
+            'duree_s': 4.0, 'duree_apercu_s': 1.0}
+
+
+def test_etendue_a_configuration_fixee(tmp_path):
+    # Biais de la réduction propre à chaque profil (5 dB en 240p, 9 dB en 720p) : il s'annule dans la
+    # différence de deux valeurs d'une même configuration, seule compte sa variation d'une dégradation à l'autre
+    details = [detail('h264', 240, 'debit', 5.0, 0.02), detail('h264', 240, 'gel', 5.3, 0.03),
+               detail('h264', 720, 'debit', 9.0, 0.04), detail('h264', 720, 'gel', 8.5, 0.04),
+               detail('h264', 240, 'debit', 0.1, -0.001, reduction=1)]
+    resultats = bornes(details)
+    assert [(r['pas_images'], r['reduction']) for r in resultats] == [(5, 1), (5, 2)]
+    assert resultats[1]['ecart_psnr_max'] == 9.0
+    assert resultats[1]['ecart_psnr_etendue'] == pytest.approx(0.5)
+    assert resultats[1]['ecart_ssim_etendue'] == pytest.approx(0.01)
+    assert resultats[1]['acceleration'] == 4.0
+    # Une seule comparaison : aucune différence mesurée
+    assert resultats[0]['ecart_psnr_etendue'] == 0.0
+
+    chemin = str(tmp_path / 'bornes.csv')
+    ecrire_resultats(resultats, chemin, COLONNES_BORNES)
+    assert marge_bornes(chemin, 'psnr', 5, 2) == pytest.approx(0.5)
+    with pytest.raises(ValueError):
+        marge_bornes(chemin, 'psnr', 10, 2)
+
+
+def test_fenetres():
+    # 2 s à 25 images/s, une fenêtre sur 5 : images 0-49, 250-299, ... ; la dernière est tronquée
+    assert fenetres(1000, 5, 50) == [(0, 50), (250, 300), (500, 550), (750, 800)]
+    assert fenetres(520, 5, 50) == [(0, 50), (250, 300), (500, 520)]
+    assert fenetres(30, 5, 50) == [(0, 30)]
@@ -0,0 +1,205 @@
+"""Classification des meters et cache des flux du contrôleur (d_controler_05_07_2024.py), sans Mininet ni OVS :
+ryu seulement."""
+import glob
+import importlib.util
+import os
+import struct
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('ryu.app.wsgi')
+
+from benchmark_controleur import FakeDatapath
+from experiences import RACINE
+
+CONTROLEURS = sorted(glob.glob(os.path.join(RACINE, '*', '*', '*', 'd_controler_05_07_2024.py')))
+TCP, UDP, ICMP = 6, 17, 1
+DEBUT = 1000.0
+
+
+@pytest.fixture(scope='module', params=CONTROLEURS, ids=lambda chemin: os.path.relpath(os.path.dirname(chemin), RACINE))
+def controleur(request):
+    spec = importlib.util.spec_from_file_location('controleur_test', request.param)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def classifieur(controleur):
+    return controleur.MeterClassifier.from_conf(SimpleNamespace(
+        **{f'{qos}_PORT': port for qos, port in controleur.QOS_DEFAULT_PORTS.items()}))
+
+
+def ancienne_classification(controleur, protocol, src_port, dst_port):
+    # QoS.get_meter_id avant la table précalculée : TCP seulement, classe = port // 1000 - 4
+    # (13000 levait KeyError, d'où range(5000, 13000) ici)
+    if protocol == TCP:
+        for port in (src_port, dst_port):
+            if port in range(5000, 13000):
+                return controleur.QOS_METER_IDS[f"QOS{(port // 1000) - 4}"]
+    return controleur.QOS_METER_IDS['BE']
+
+
+def test_ports_video_comme_avant(controleur, classifieur):
+    for qos, port in controleur.QOS_DEFAULT_PORTS.items():
+        meter = controleur.QOS_METER_IDS[qos]
+        assert classifieur.classify(TCP, port, 40002) == meter == ancienne_classification(controleur, TCP, port, 40002)
+        assert classifieur.classify(TCP, 40002, port) == meter == ancienne_classification(controleur, TCP, 40002, port)
+    assert classifieur.classify(TCP, 40001, 80) == ancienne_classification(controleur, TCP, 40001, 80)
+    assert classifieur.classify(TCP, 40001, 80) == controleur.QOS_METER_IDS['BE']
+
+
+def test_port_source_prioritaire(controleur, classifieur):
+    assert classifieur.classify(TCP, 6000, 5000) == controleur.QOS_METER_IDS['QOS2']
+    assert classifieur.classify(TCP, 40001, 5000) == controleur.QOS_METER_IDS['QOS1']
+
+
+def test_ports_exacts(controleur, classifieur):
+    # Un port éphémère entre 5000 et 13000 n'est plus rangé dans la classe de son millier
+    assert ancienne_classification(controleur, TCP, 5123, 80) == controleur.QOS_METER_IDS['QOS1']
+    assert classifieur.classify(TCP, 5123, 80) == controleur.QOS_METER_IDS['BE']
+    assert classifieur.classify(TCP, 13000, 80) == controleur.QOS_METER_IDS['BE']
+
+
+def test_protocoles(controleur, classifieur):
+    assert classifieur.classify(UDP, 7000, 40002) == controleur.QOS_METER_IDS['QOS3']
+    assert classifieur.classify(ICMP, 0, 0) == controleur.QOS_METER_IDS['BE']
+    assert classifieur.classify(ICMP, 7000, 7000) == controleur.QOS_METER_IDS['BE']
+
+
+def test_ports_configures(controleur):
+    ports = {f'{qos}_PORT': 20000 + numero for numero, qos in enumerate(controleur.QOS_DEFAULT_PORTS)}
+    classifieur = controleur.MeterClassifier.from_conf(SimpleNamespace(**ports))
+    assert classifieur.classify(TCP, 20000, 40002) == controleur.QOS_METER_IDS['QOS1']
+    assert classifieur.classify(TCP, 20007, 40002) == controleur.QOS_METER_IDS['QOS8']
+    assert classifieur.classify(TCP, 5000, 40002) == controleur.QOS_METER_IDS['BE']
+    assert classifieur.classify(TCP, 0, 65535) == controleur.QOS_METER_IDS['BE']
+
+
+@pytest.fixture
+def horloge(monkeypatch):
+    # Horloge monotone du contrôleur, avancée à la main pour les expirations
+    instant = [DEBUT]
+    monkeypatch.setattr('time.monotonic', lambda: instant[0])
+    return instant
+
+
+@pytest.fixture
+def flux(controleur, horloge):
+    datapath = FakeDatapath(1)
+    return controleur.FlowManager({1: datapath}), datapath
+
+
+def match_tcp(datapath, port_client):
+    return datapath.ofproto_parser.OFPMatch(in_port=2, eth_type=0x0800, ip_proto=TCP, ipv4_src='10.1.1.2',
+                                            ipv4_dst='10.1.1.1', tcp_src=port_client, tcp_dst=5000)
+
+
+def sortie(datapath, port=1):
+    return [datapath.ofproto_parser.OFPActionOutput(port)]
+
+
+def flow_mods(datapath):
+    return datapath.messages.get('FLOW_MOD', 0)
+
+
+def test_flux_deja_installe_non_renvoye(flux):
+    gestionnaire, datapath = flux
+    assert gestionnaire.add_flow(datapath, 1, match_tcp(datapath, 40002), sortie(datapath), meterid=5000)
+    assert not gestionnaire.add_flow(datapath, 1, match_tcp(datapath, 40002), sortie(datapath), meterid=5000)
+    assert flow_mods(datapath) == 1
+    # Autre match, autre priorité, autres instructions : nouveau FlowMod
+    assert gestionnaire.add_flow(datapath, 1, match_tcp(datapath, 40004), sortie(datapath), meterid=5000)
+    assert gestionnaire.add_flow(datapath, 2, match_tcp(datapath, 40002), sortie(datapath), meterid=5000)
+    assert gestionnaire.add_flow(datapath, 1, match_tcp(datapath, 40002), sortie(datapath), meterid=6000)
+    assert gestionnaire.add_flow(datapath, 1, match_tcp(datapath, 40002), sortie(datapath, 3), meterid=6000)
+    assert flow_mods(datapath) == 5
+
+
+def test_buffer_id_toujours_envoye(flux):
+    # Le FlowMod avec buffer_id libère le paquet en attente sur le switch
+    gestionnaire, datapath = flux
+    gestionnaire.add_flow(datapath, 1, match_tcp(datapath, 40002), sortie(datapath))
+    assert gestionnaire.add_flow(datapath, 1, match_tcp(datapath, 40002), sortie(datapath), buffer_id=7)
+    assert flow_mods(datapath) == 2
+
+
+def test_expiration(flux, horloge):
+    gestionnaire, datapath = flux
+    gestionnaire.add_flow(datapath, 1, match_tcp(datapath, 40002), sortie(datapath), idle=10, hard=30)
+    horloge[0] = DEBUT + 9.9
+    assert not gestionnaire.add_flow(datapath, 1, match_tcp(datapath, 40002), sortie(datapath), idle=10, hard=30)
+    # Au-delà de min(idle, hard), le switch a pu retirer le flux : il est réinstallé
+    horloge[0] = DEBUT + 10
+    assert gestionnaire.add_flow(datapath, 1, match_tcp(datapath, 40002), sortie(datapath), idle=10, hard=30)
+    assert flow_mods(datapath) == 2
+
+
+def test_sans_timeout_jamais_expire(flux, horloge):
+    gestionnaire, datapath = flux
+    gestionnaire.add_flow(datapath, 1, match_tcp(datapath, 40002), sortie(datapath))
+    horloge[0] = DEBUT + 1e6
+    assert not gestionnaire.add_flow(datapath, 1, match_tcp(datapath, 40002), sortie(datapath))
+
+
+def test_oubli(flux):
+    gestionnaire, datapath = flux
+    gestionnaire.add_flow(datapath, 1, match_tcp(datapath, 40002), sortie(datapath))
+    gestionnaire.forget_flow(datapath, 1, match_tcp(datapath, 40002))
+    assert gestionnaire.add_flow(datapath, 1, match_tcp(datapath, 40002), sortie(datapath))
+    gestionnaire.forget_datapath(datapath.id)
+    assert gestionnaire.add_flow(datapath, 1, match_tcp(datapath, 40002), sortie(datapath))
+    assert flow_mods(datapath) == 3
+
+
+def match_ordre_switch(datapath, match, premiers):
+    # Match tel que le renvoie OFPFlowRemoved : champs OXM dans l'ordre du switch (OVS place ipv4_src et
+    # ipv4_dst avant ip_proto), alors qu'un OFPMatch construit localement est trié par identifiant OXM
+    tampon = bytearray()
+    match.serialize(tampon, 0)
+    longueur = struct.unpack_from('!H', tampon, 2)[0]
+    champs, position = [], 4
+    while position < longueur:
+        taille = 4 + tampon[position + 3]
+        champs.append(bytes(tampon[position:position + taille]))
+        position += taille
+    noms = [nom for nom, _ in match.items()]
+    ordre = [noms.index(nom) for nom in premiers] + [i for i, nom in enumerate(noms) if nom not in premiers]
+    corps = b''.join(champs[i] for i in ordre)
+    brut = struct.pack('!HH', 1, 4 + len(corps)) + corps
+    brut += bytes(-len(brut) % 8)
+    return datapath.ofproto_parser.OFPMatch.parser(brut, 0)
+
+
+def test_oubli_match_dans_l_ordre_du_switch(flux):
+    gestionnaire, datapath = flux
+    gestionnaire.add_flow(datapath, 1, match_tcp(datapath, 40002), sortie(datapath), idle=10)
+    recu = match_ordre_switch(datapath, match_tcp(datapath, 40002), ['in_port', 'eth_type', 'ipv4_src', 'ipv4_dst'])
+    assert list(recu.items()) != list(match_tcp(datapath, 40002).items())
+    assert dict(recu.items()) == dict(match_tcp(datapath, 40002).items())
+    gestionnaire.forget_flow(datapath, 1, recu)
+    assert not gestionnaire.installed_flows
+    assert gestionnaire.add_flow(datapath, 1, match_tcp(datapath, 40002), sortie(datapath), idle=10)
+
+
+def test_suppression(flux):
+    gestionnaire, datapath = flux
+    parser = datapath.ofproto_parser
+    gestionnaire.add_flow(datapath, 1, match_tcp(datapath, 40002), sortie(datapath))
+    gestionnaire.add_flow(datapath, 1, parser.OFPMatch(in_port=3, eth_dst='00:00:00:00:00:04'), sortie(datapath))
+    gestionnaire.delete_flow(datapath, parser.OFPMatch(ipv4_src='10.1.1.2'))
+    # Seuls les flux dont le match contient celui de la suppression sont oubliés
+    assert gestionnaire.add_flow(datapath, 1, match_tcp(datapath, 40002), sortie(datapath))
+    assert not gestionnaire.add_flow(datapath, 1, parser.OFPMatch(in_port=3, eth_dst='00:00:00:00:00:04'), sortie(datapath))
+
+
+def test_purge_des_flux_expires(flux, horloge):
+    gestionnaire, datapath = flux
+    gestionnaire.PURGE_INTERVAL = 4
+    for port in range(40000, 40003):
+        gestionnaire.add_flow(datapath, 1, match_tcp(datapath, port), sortie(datapath), idle=5)
+    horloge[0] = DEBUT + 5
+    gestionnaire.add_flow(datapath, 1, match_tcp(datapath, 40010), sortie(datapath))
+    assert len(gestionnaire.installed_flows) == 1
@@ -0,0 +1,93 @@
+"""regression.ajuster sur des droites et des courbes connues, plusieurs groupes de longueurs différentes à la fois."""
+import numpy as np
+import pytest
+
+from regression import GRILLE_MILIEU, GRILLE_RAIDEUR, GRILLE_RUPTURE, ajuster, quantile_student
+
+
+def pile(*nuages):
+    # Comme regression.points : groupes complétés par des points masqués
+    longueur = max(len(x) for x, _ in nuages)
+    x, y = np.zeros((len(nuages), longueur)), np.zeros((len(nuages), longueur))
+    masque = np.zeros((len(nuages), longueur), dtype=bool)
+    for index, (abscisses, ordonnees) in enumerate(nuages):
+        x[index, :len(abscisses)], y[index, :len(abscisses)] = abscisses, ordonnees
+        masque[index, :len(abscisses)] = True
+        # Valeurs quelconques hors masque : elles ne doivent pas compter
+        x[index, len(abscisses):], y[index, len(abscisses):] = 1e3, -1e3
+    return x, y, masque
+
+
+def test_droites_exactes():
+    x1, x2 = np.array([0, 2, 3, 5, 10, 15.0]), np.array([24, 32, 48, 64.0])
+    resultat = ajuster(*pile((x1, 2 + 3 * x1), (x2, 40 - 0.25 * x2)), 'lineaire')
+    assert resultat['noms'] == ['ordonnee', 'pente']
+    assert resultat['points'].tolist() == [6, 4]
+    np.testing.assert_allclose(resultat['coefficients'], [[2, 3], [40, -0.25]], atol=1e-9)
+    np.testing.assert_allclose(resultat['r2'], 1.0)
+
+
+def test_droite_bruitee_comme_polyfit():
+    generateur = np.random.default_rng(0)
+    x = np.linspace(0, 15, 12)
+    y = 35 - 0.8 * x + generateur.normal(0, 0.5, len(x))
+    resultat = ajuster(*pile((x, y)), 'lineaire', niveau=0.95)
+    (pente, ordonnee), covariance = np.polyfit(x, y, 1, cov='unscaled')
+    np.testing.assert_allclose(resultat['coefficients'][0], [ordonnee, pente])
+    residus = y - (ordonnee + pente * x)
+    ecarts = np.sqrt(residus @ residus / (len(x) - 2) * np.diag(covariance))[::-1]
+    demi_largeur = quantile_student(0.95, len(x) - 2) * ecarts
+    np.testing.assert_allclose(resultat['ic_haut'][0] - resultat['coefficients'][0], demi_largeur)
+    np.testing.assert_allclose(resultat['r2'][0], 1 - residus @ residus / ((y - y.mean()) @ (y - y.mean())))
+
+
+def test_polynome_exact():
+    x = np.array([0, 2, 3, 5, 10, 15.0])
+    resultat = ajuster(*pile((x, 1 - 2 * x + 0.5 * x ** 2), (x[:4], 3 + x[:4] ** 2)), 'polynome', degre=2)
+    assert resultat['noms'] == ['x^0', 'x^1', 'x^2']
+    np.testing.assert_allclose(resultat['coefficients'], [[1, -2, 0.5], [3, 0, 1]], atol=1e-8)
+
+
+def test_logistique_sur_la_grille():
+    # Raideur et milieu pris sur la grille de candidats : la courbe est retrouvée exactement
+    x = np.linspace(0, 10, 11)
+    milieu, raideur = 10 * GRILLE_MILIEU[8], GRILLE_RAIDEUR[6] / 10
+    y = 20 + 15 / (1 + np.exp(-raideur * (x - milieu)))
+    resultat = ajuster(*pile((x, y)), 'logistique')
+    assert resultat['noms'] == ['bas', 'amplitude', 'raideur', 'milieu']
+    np.testing.assert_allclose(resultat['coefficients'][0], [20, 15, raideur, milieu], atol=1e-8)
+    np.testing.assert_allclose(resultat['r2'], 1.0)
+    # Pas d'intervalle de confiance pour les paramètres de la grille
+    assert np.isnan(resultat['ic_bas'][0, 2:]).all()
+
+
+def test_morceaux_sur_la_grille():
+    x = np.array([20, 50, 100, 200, 500, 1000.0])
+    rupture = 20 + 980 * GRILLE_RUPTURE[5]
+    y = 40 - 0.01 * x - 0.02 * np.maximum(0, x - rupture)
+    resultat = ajuster(*pile((x, y)), 'morceaux')
+    assert resultat['noms'] == ['ordonnee', 'pente', 'delta_pente', 'rupture']
+    np.testing.assert_allclose(resultat['coefficients'][0], [40, -0.01, -0.02, rupture], atol=1e-8)
+
+
+def test_trop_peu_de_points():
+    x = np.array([0, 5.0])
+    resultat = ajuster(*pile((x, 2 * x)), 'lineaire')
+    np.testing.assert_allclose(resultat['coefficients'][0], [0, 2], atol=1e-9)
+    assert np.isnan(resultat['r2_ajuste'][0]) and np.isnan(resultat['ic_bas'][0]).all()
+
+
+def test_metrique_constante():
+    x = np.array([0, 2, 3, 5.0])
+    assert np.isnan(ajuster(*pile((x, np.full(4, 30.0))), 'lineaire')['r2'][0])
+
+
+def test_modele_inconnu():
+    with pytest.raises(ValueError):
+        ajuster(*pile((np.arange(4.0), np.arange(4.0))), 'exponentiel')
+
+
+@pytest.mark.parametrize('ddl, attendu', [(1, 12.7062), (2, 4.3027), (3, 3.1824), (5, 2.5706), (10, 2.2281),
+                                          (30, 2.0423)])
+def test_quantile_student(ddl, attendu):
+    assert quantile_student(0.95, ddl) == pytest.approx(attendu, rel=2e-3)
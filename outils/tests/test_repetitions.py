@@ -0,0 +1,114 @@
+"""repetitions.MoyenneVariance (Welford) face à np.mean / np.var, son intervalle bootstrap, et le choix d'une mesure
+par répétition dans l'entrepôt."""
+import numpy as np
+import pytest
+
+from repetitions import MoyenneVariance, agreger
+from resultats import EntrepotResultats, repetition_courante
+
+
+def remplir(lots):
+    statistiques = MoyenneVariance()
+    for cles, valeurs in lots:
+        statistiques.ajouter(cles, valeurs)
+    return statistiques
+
+
+def test_welford_comme_numpy():
+    generateur = np.random.default_rng(0)
+    cles = [('loss', 2), ('loss', 5), ('delay', 100)]
+    attendus = {cle: [] for cle in cles}
+    lots = []
+    for _ in range(7):
+        # Un lot par run : 6 mesures de clés tirées au hasard, une clé pouvant revenir dans le lot
+        tirage = [cles[i] for i in generateur.integers(0, len(cles), 6)]
+        # Grand décalage : la variance par somme des carrés y perdrait ses chiffres, pas Welford
+        valeurs = generateur.normal(30, 5, len(tirage)) + 1e6
+        for cle, valeur in zip(tirage, valeurs):
+            attendus[cle].append(valeur)
+        lots.append((tirage, valeurs))
+    statistiques = remplir(lots)
+    for cle, valeurs in attendus.items():
+        point = statistiques.points[cle]
+        assert statistiques.n[point] == len(valeurs)
+        assert statistiques.echantillons[point] == valeurs
+        np.testing.assert_allclose(statistiques.moyenne[point], np.mean(valeurs), rtol=1e-14)
+        np.testing.assert_allclose(statistiques.ecart_type()[point] ** 2, np.var(valeurs, ddof=1), rtol=1e-9)
+
+
+def test_cle_repetee_dans_un_appel():
+    statistiques = remplir([(['a', 'a', 'b', 'a'], [1.0, 2.0, 10.0, 6.0])])
+    assert statistiques.n.tolist() == [3, 1]
+    np.testing.assert_allclose(statistiques.moyenne, [3.0, 10.0])
+    np.testing.assert_allclose(statistiques.ecart_type()[0] ** 2, np.var([1.0, 2.0, 6.0], ddof=1))
+
+
+def test_une_seule_repetition():
+    statistiques = remplir([(['a', 'b'], [1.0, 2.0]), (['a'], [3.0])])
+    assert np.isnan(statistiques.ecart_type()[1])
+    bas, haut = statistiques.bootstrap()
+    assert np.isnan(bas[1]) and np.isnan(haut[1])
+    assert bas[0] <= 2.0 <= haut[0]
+
+
+def test_bootstrap():
+    generateur = np.random.default_rng(1)
+    echantillons = {'a': generateur.normal(10, 1, 5), 'b': generateur.normal(50, 3, 8), 'c': np.full(4, 7.0)}
+    lots = [(list(echantillons), [valeurs[i] for valeurs in echantillons.values()]) for i in range(4)]
+    lots += [(['a'], [echantillons['a'][4]])] + [(['b'], [valeur]) for valeur in echantillons['b'][4:]]
+    statistiques = remplir(lots)
+    bas, haut = statistiques.bootstrap(niveau=0.95, tirages=4000, graine=3)
+    for cle, valeurs in echantillons.items():
+        point = statistiques.points[cle]
+        assert valeurs.min() <= bas[point] <= valeurs.mean() <= haut[point] <= valeurs.max()
+    assert bas[statistiques.points['c']] == haut[statistiques.points['c']] == 7.0
+    # Même graine, mêmes bornes ; niveau plus élevé, intervalle plus large
+    np.testing.assert_array_equal(statistiques.bootstrap(niveau=0.95, tirages=4000, graine=3)[0], bas)
+    bas_99, haut_99 = statistiques.bootstrap(niveau=0.99, tirages=4000, graine=3)
+    assert (haut_99 - bas_99 >= haut - bas).all()
+
+
+def ecrire_run(entrepot, valeur, horodatage, campagne='', repetition=-1, paire='h1_h2'):
+    run = entrepot.nouveau_run('03_perte_paquet/02_une_video/01_h264', 'loss', 'h264', 240, 'tcp', 2, campagne,
+                               repetition)
+    run.horodatage = horodatage
+    run.ajouter_metrique('bitrate', {paire: {5: valeur}})
+    return run.ecrire('qos')
+
+
+def test_une_mesure_par_repetition(tmp_path):
+    entrepot = EntrepotResultats(str(tmp_path))
+    # Phase 2 hors répétitions : ne compte pas
+    ecrire_run(entrepot, 100.0, 1.0)
+    ecrire_run(entrepot, 10.0, 2.0, 'c1', 0)
+    ecrire_run(entrepot, 11.0, 3.0, 'c1', 1)
+    # Phase 2 de r1 relancée : remplace la mesure précédente de r1
+    ecrire_run(entrepot, 14.0, 4.0, 'c1', 1)
+    ecrire_run(entrepot, 12.0, 5.0, 'c1', 2)
+    # Fichier de la version 1 du schéma (classeur importé avant l'ajout de campagne et repetition)
+    chemin = ecrire_run(entrepot, 200.0, 6.0)
+    with np.load(chemin) as donnees:
+        colonnes = {nom: donnees[nom] for nom in donnees.files if nom not in ('campagne', 'repetition')}
+    np.savez_compressed(chemin, **dict(colonnes, version_schema=1))
+    assert EntrepotResultats.lire_fichier(chemin)['repetition'].tolist() == [-1]
+
+    (resultat,) = agreger(entrepot)
+    assert resultat['repetitions'] == 3
+    assert resultat['moyenne'] == pytest.approx(12.0)
+    assert resultat['ecart_type'] == pytest.approx(np.std([10.0, 14.0, 12.0], ddof=1))
+
+    # Une deuxième campagne ajoute ses répétitions ; --campagne n'en garde qu'une
+    ecrire_run(entrepot, 20.0, 7.0, 'c2', 0)
+    assert agreger(entrepot)[0]['repetitions'] == 4
+    assert agreger(entrepot, campagne=['c2'])[0]['repetitions'] == 1
+
+
+def test_repetition_courante(tmp_path):
+    repetitions = tmp_path / 'repetitions'
+    (repetitions / 'r3').mkdir(parents=True)
+    (tmp_path / 'autre').mkdir()
+    assert repetition_courante(str(tmp_path / 'autre')) == ('', -1)
+    # Campagne antérieure à campagne.txt : le répertoire repetitions sert d'identifiant
+    assert repetition_courante(str(repetitions / 'r3')) == (str(repetitions), 3)
+    (repetitions / 'campagne.txt').write_text('20261019T101500\n')
+    assert repetition_courante(str(repetitions / 'r3')) == ('20261019T101500', 3)
@@ -0,0 +1,135 @@
+"""Tracé de figures PNG par lots, sans affichage : backend Agg, figures réutilisées, pool de processus.
+
+Chaque processus du pool garde une seule Figure/Axes (API objet de matplotlib, sans pyplot ni
+fenêtre) qu'il efface et redessine pour chaque tracé ; le style est commun à toutes les figures
+(STYLE). Un tracé (Trace) superpose autant de courbes que nécessaire, par exemple toutes les paires
+h1_h2 ... h15_h16 d'une expérience sur le même axe.
+
+Utilisé par ExcelSaver (classe_2_experimentation.py, MODE_GRAPHIQUE = "image") et, depuis
+l'entrepôt de résultats, pour toutes les figures d'une campagne :
+
+    python3 outils/traceur.py --sortie figures_240p --profile 240 --travailleurs 8 --series
+"""
+import argparse
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# courbes : [(libellé, abscisses, ordonnées[, bas, haut])], bas et haut donnant des barres d'erreur ;
+# marqueur : 'o' pour les valeurs par perturbation, None pour les séries
+Trace = namedtuple('Trace', ['chemin', 'titre', 'titre_x', 'titre_y', 'courbes', 'marqueur'])
+
+STYLE = {
+    'figure.figsize': (6.4, 4.8),
+    'figure.dpi': 100,
+    'axes.grid': True,
+    'grid.alpha': 0.3,
+    'axes.prop_cycle': matplotlib.cycler(color=matplotlib.colormaps['tab20'].colors),
+    'lines.linewidth': 1.2,
+    'lines.markersize': 4,
+    'legend.fontsize': 'small',
+    'axes.titlesize': 'medium',
+}
+# Figure réutilisée par le processus courant
+_figure = None
+
+
+def _axes():
+    global _figure
+    if _figure is None:
+        matplotlib.rcParams.update(STYLE)
+        _figure = Figure()
+        FigureCanvasAgg(_figure)
+        _figure.add_subplot()
+    axes = _figure.axes[0]
+    axes.clear()
+    return axes
+
+
+def tracer(trace):
+    axes = _axes()
+    for libelle, abscisses, ordonnees, *intervalle in trace.courbes:
+        if intervalle:
+            ordonnees = np.asarray(ordonnees)
+            bas, haut = (np.asarray(borne) for borne in intervalle)
+            axes.errorbar(abscisses, ordonnees, yerr=[np.maximum(0, ordonnees - bas), np.maximum(0, haut - ordonnees)],
+                          marker=trace.marqueur, capsize=3, label=libelle)
+        else:
+            axes.plot(abscisses, ordonnees, marker=trace.marqueur, label=libelle)
+    axes.set_title(trace.titre)
+    axes.set_xlabel(trace.titre_x)
+    axes.set_ylabel(trace.titre_y)
+    if len(trace.courbes) > 1:
+        axes.legend(ncol=2 if len(trace.courbes) > 8 else 1)
+    _figure.savefig(trace.chemin)
+    return trace.chemin
+
+
+def tracer_lot(traces, travailleurs=None):
+    """Trace toutes les figures, réparties sur travailleurs processus (tous les cœurs par défaut)."""
+    traces = list(traces)
+    travailleurs = min(travailleurs or os.cpu_count() or 1, len(traces))
+    if travailleurs <= 1:
+        return [tracer(trace) for trace in traces]
+    with ProcessPoolExecutor(travailleurs) as pool:
+        return list(pool.map(tracer, traces, chunksize=max(1, len(traces) // (4 * travailleurs))))
+
+
+def traces_campagne(lignes, repertoire, series=False):
+    """Figures d'une campagne depuis les colonnes de l'entrepôt : une figure par métrique et configuration,
+    toutes les paires superposées ; avec series, une figure par paire avec une courbe par valeur de perturbation."""
+    from rapport_campagne import agreger, ordre_colonne
+    from resultats import EntrepotResultats
+
+    traces = []
+    for metrique, par_perturbation in sorted(agreger(lignes).items()):
+        for perturbation, colonnes in sorted(par_perturbation.items()):
+            configurations = {}
+            for codec, profile, hotes, paire in sorted(colonnes, key=ordre_colonne):
+                configurations.setdefault((codec, profile, hotes), []).append(paire)
+            for (codec, profile, hotes), paires in sorted(configurations.items()):
+                courbes = [(paire, *zip(*sorted(colonnes[(codec, profile, hotes, paire)].items()))) for paire in paires]
+                traces.append(Trace(os.path.join(repertoire, f'{metrique}_{perturbation}_{codec}_{profile}p_hotes_{hotes}.png'),
+                                    f'{perturbation} : {metrique}, {codec} {profile}p, {hotes} hotes', perturbation, metrique,
+                                    courbes, 'o'))
+    if series:
+        fenetres = EntrepotResultats.separer_series(lignes)
+        for (metrique, perturbation, codec, profile, hotes, paire), par_valeur in sorted(fenetres.items()):
+            courbes = [(f'{perturbation} {valeur}', temps, valeurs) for valeur, (temps, valeurs) in sorted(par_valeur.items())]
+            traces.append(Trace(os.path.join(repertoire, f'serie_{metrique}_{perturbation}_{codec}_{profile}p_hotes_{hotes}_{paire}.png'),
+                                f'{perturbation} : {metrique}, {codec} {profile}p, {hotes} hotes, {paire}', 'temps (s)', metrique,
+                                courbes, None))
+    return traces
+
+
+class Main:
+    @staticmethod
+    def main():
+        from resultats import RACINE_RESULTATS, EntrepotResultats
+
+        parser = argparse.ArgumentParser(description="Figures PNG d'une campagne depuis l'entrepôt de résultats, en parallèle.")
+        parser.add_argument('--racine', default=RACINE_RESULTATS, help="répertoire de l'entrepôt")
+        parser.add_argument('--sortie', default='figures', help="répertoire des figures")
+        parser.add_argument('--profile', type=int, action='append', help="profil vidéo (répétable)")
+        parser.add_argument('--perturbation', action='append', help="bande_passante, delay, loss (répétable)")
+        parser.add_argument('--codec', action='append', help="h264, h265 (répétable)")
+        parser.add_argument('--series', action='store_true', help="ajoute les séries temporelles (une figure par paire)")
+        parser.add_argument('--travailleurs', type=int, help="processus de tracé (par défaut : nombre de cœurs)")
+        args = parser.parse_args()
+
+        lignes = EntrepotResultats(args.racine).lire(profile=args.profile, perturbation=args.perturbation, codec=args.codec)
+        os.makedirs(args.sortie, exist_ok=True)
+        traces = traces_campagne(lignes, args.sortie, args.series)
+        chemins = tracer_lot(traces, args.travailleurs)
+        print(f"{len(chemins)} figures écrites dans {args.sortie}")
+
+
+if __name__ == "__main__":
+    Main.main()